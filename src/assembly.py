@@ -0,0 +1,265 @@
+import asyncio
+import json
+import logging
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from metrics import METRICS
+from mp3frames import iter_frames
+from transcriptstore import try_index
+
+
+def chunk_index(name):
+    """Chunk number from a splitter file name such as 'episode-12.mp3', or None."""
+    match = re.search(r'-(\d+)$', Path(name).stem)
+    return int(match.group(1)) if match else None
+
+
+def mp3_duration_ms(path):
+    """Exact duration of an MP3 file in ms, from its frame headers."""
+    with open(path, 'rb') as f:
+        return sum(header.samples * 1000 / header.sample_rate for header, _ in iter_frames(f))
+
+
+def chunks_from_files(paths):
+    """
+    Build chunk records for split files on disk, ordered by chunk index, with
+    start offsets taken from the durations of the preceding chunks.
+    """
+    ordered = sorted(paths, key=lambda p: (chunk_index(p) is None, chunk_index(p) or 0, Path(p).name))
+    chunks = []
+    position_ms = 0.0
+    for number, path in enumerate(ordered, start=1):
+        duration_ms = mp3_duration_ms(path)
+        chunks.append({
+            'index': chunk_index(path) or number,
+            'name': Path(path).name,
+            'path': str(path),
+            'data': None,
+            'start_ms': position_ms,
+            'duration_ms': duration_ms,
+        })
+        position_ms += duration_ms
+    return chunks
+
+
+def format_timestamp(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def episode_seconds(chunk, seconds):
+    """
+    Map a time within a chunk's audio onto the episode. Chunks with stretches
+    left out carry an 'offsets' map of (chunk_ms, episode_ms) pairs.
+    """
+    position_ms = seconds * 1000
+    offset_ms = chunk.get('start_ms', 0)
+    for chunk_ms, episode_ms in chunk.get('offsets') or ():
+        if chunk_ms > position_ms:
+            break
+        offset_ms = episode_ms - chunk_ms
+    return (position_ms + offset_ms) / 1000
+
+
+def chunk_transcript(chunk, result):
+    """
+    Transcript of one chunk within the episode: its chunk record, its segments
+    rebased onto the episode, and its text. result is the API response
+    ({'text', 'segments'}) or None for a chunk that failed.
+    """
+    offset = chunk.get('start_ms', 0) / 1000
+    duration = chunk.get('duration_ms', 0) / 1000
+    record = {
+        'index': chunk['index'],
+        'name': chunk.get('name'),
+        'start': round(offset, 3),
+        'duration': round(duration, 3),
+        'status': 'transcribed' if result is not None else 'missing',
+    }
+
+    if result is None:
+        # Keep failed chunks visible instead of silently closing the gap
+        end = episode_seconds(chunk, duration)
+        return record, [], f"[missing transcript {format_timestamp(offset)} - {format_timestamp(end)}]"
+
+    segments = [
+        {
+            'chunk': chunk['index'],
+            'start': round(episode_seconds(chunk, segment.get('start', 0)), 3),
+            'end': round(episode_seconds(chunk, segment.get('end', 0)), 3),
+            'text': segment.get('text', '').strip(),
+        }
+        for segment in result.get('segments') or []
+    ]
+    return record, segments, result.get('text', '')
+
+
+def text_part(text):
+    """A chunk's text as it appears in the transcript file, which keeps chunks apart with blank lines."""
+    return f"\n\n\n{text}"
+
+
+def assemble(chunk_results):
+    """
+    Assemble transcription results into one episode transcript.
+    chunk_results is a list of (chunk, result) where result is the API response
+    ({'text', 'segments'}) or None for a chunk that failed. Chunks are ordered
+    by index and start offset, and segment times are rebased onto the episode,
+    including any audio the splitter left out.
+    """
+    with METRICS.span('assembly', chunks=len(chunk_results)):
+        ordered = sorted(chunk_results, key=lambda item: (item[0]['index'], item[0].get('start_ms', 0)))
+        chunks = []
+        segments = []
+        parts = []
+        for chunk, result in ordered:
+            record, chunk_segments, text = chunk_transcript(chunk, result)
+            chunks.append(record)
+            segments.extend(chunk_segments)
+            parts.append(text_part(text))
+
+        return {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'chunks': chunks,
+            'segments': segments,
+            'text': "".join(parts),
+        }
+
+
+def write_transcript(transcript, transcript_dir, episode=None):
+    """
+    Write the assembled transcript as JSON and plain text side by side.
+    Returns (json_path, text_path).
+    """
+    transcript_dir = Path(transcript_dir)
+    transcript_dir.mkdir(parents=True, exist_ok=True)
+    transcript['episode'] = episode
+    stem = f"transcript_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+    json_path = transcript_dir / f"{stem}.json"
+    text_path = transcript_dir / f"{stem}.txt"
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(transcript, f, ensure_ascii=False, indent=2)
+    with open(text_path, 'w', encoding='utf-8') as f:
+        f.write(transcript['text'])
+
+    missing = sum(1 for chunk in transcript['chunks'] if chunk['status'] == 'missing')
+    logging.info(f"Assembled transcript of {len(transcript['chunks'])} chunks "
+                 f"({missing} missing, {len(transcript['segments'])} segments): {json_path}")
+    return json_path, text_path
+
+
+class TranscriptWriter:
+    """
+    Writes an episode transcript while its chunks are still being transcribed.
+    Results may arrive in any order: a reorder buffer holds each one until
+    every earlier chunk is done, then its text is appended to the transcript
+    file, so the file always holds the transcript up to the first chunk still
+    in flight. segments() yields transcript segments in the same order as they
+    are written, for consumers that start before the last chunk is done.
+    The JSON transcript is written by close(). With a TranscriptStore, each
+    chunk is also indexed for search as it is written.
+    """
+
+    def __init__(self, transcript_dir, episode=None, first_index=1, store=None, source=None, run_id=None):
+        self.transcript_dir = Path(transcript_dir)
+        self.transcript_dir.mkdir(parents=True, exist_ok=True)
+        self.episode = episode
+        self.store = store
+        self.episode_id = None
+        if store is not None:
+            self.episode_id = try_index(store.begin_episode, source or episode, title=episode, run_id=run_id)
+        stem = f"transcript_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        self.json_path = self.transcript_dir / f"{stem}.json"
+        self.text_path = self.transcript_dir / f"{stem}.txt"
+        self.file = open(self.text_path, 'w', encoding='utf-8')
+        self.pending = {}
+        self.next_index = first_index
+        self.chunks = []
+        self.written_segments = []
+        # What segments() yields: the written segments, or the text of chunks transcribed without them
+        self.stream = []
+        self.parts = []
+        self.closed = False
+        self.updated = asyncio.Event()
+
+    def add(self, chunk, result):
+        """Take the result of one chunk (None if it failed) and write every chunk that is now in order."""
+        self.pending[chunk['index']] = (chunk, result)
+        ready = []
+        while self.next_index in self.pending:
+            ready.append(self.pending.pop(self.next_index))
+            self.next_index += 1
+        if ready:
+            self.write(ready)
+
+    def write(self, chunk_results):
+        with METRICS.span('assembly', chunks=len(chunk_results)):
+            for chunk, result in chunk_results:
+                record, segments, text = chunk_transcript(chunk, result)
+                self.chunks.append(record)
+                self.written_segments.extend(segments)
+                if self.episode_id is not None:
+                    try_index(self.store.add_chunk, self.episode_id, record, segments, text)
+                if result is not None and not segments:
+                    end = record['start'] + record['duration']
+                    segments = [{'chunk': record['index'], 'start': record['start'], 'end': end, 'text': part}
+                                for part in text.split("\n") if part.strip()]
+                self.stream.extend(segments)
+                self.parts.append(text_part(text))
+                self.file.write(self.parts[-1])
+            self.file.flush()
+        # Wake the segment readers waiting for more
+        self.updated.set()
+        self.updated = asyncio.Event()
+
+    async def segments(self):
+        """Yield transcript segments in order as they are written, until the writer is closed."""
+        position = 0
+        while True:
+            while position < len(self.stream):
+                yield self.stream[position]
+                position += 1
+            if self.closed:
+                return
+            await self.updated.wait()
+
+    def close(self):
+        """
+        Write the chunks still held back (after a gap that never filled) and
+        the JSON transcript. Returns (json_path, text_path).
+        """
+        if self.pending:
+            self.write([self.pending[index] for index in sorted(self.pending)])
+            self.pending = {}
+        self.file.close()
+        self.closed = True
+        self.updated.set()
+
+        transcript = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'chunks': self.chunks,
+            'segments': self.written_segments,
+            'text': "".join(self.parts),
+            'episode': self.episode,
+        }
+        with open(self.json_path, 'w', encoding='utf-8') as f:
+            json.dump(transcript, f, ensure_ascii=False, indent=2)
+        if self.episode_id is not None:
+            try_index(self.store.finish_episode, self.episode_id)
+
+        missing = sum(1 for chunk in self.chunks if chunk['status'] == 'missing')
+        logging.info(f"Assembled transcript of {len(self.chunks)} chunks "
+                     f"({missing} missing, {len(self.written_segments)} segments): {self.json_path}")
+        return self.json_path, self.text_path
+
+    def discard(self):
+        """Close without a transcript, removing the partial text file."""
+        if not self.file.closed:
+            self.file.close()
+        self.closed = True
+        self.updated.set()
+        if self.text_path.exists():
+            os.unlink(self.text_path)
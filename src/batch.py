@@ -0,0 +1,205 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from pathlib import Path
+from config import TARGET_SIZE_MB, BATCH_SPLIT_WORKERS
+from workspace import WORKSPACE_DIR
+
+# Stage modules are imported where episodes are processed, so expanding inputs
+# (collect_episodes, used by main.py --dry-run) stays cheap
+
+FEED_SUFFIXES = ('.rss', '.xml')
+
+
+def is_url(value):
+    return value.startswith(('http://', 'https://'))
+
+
+def episode_id(source):
+    """Stable, filesystem-safe id for an episode: readable name plus a short hash of its source."""
+    name = os.path.splitext(os.path.basename(source.rstrip('/').split('?')[0]))[0] or 'episode'
+    slug = re.sub(r'[^A-Za-z0-9_-]+', '-', name).strip('-')[:40] or 'episode'
+    return f"{slug}-{hashlib.sha1(source.encode('utf-8')).hexdigest()[:8]}"
+
+
+def read_feed(feed_path):
+    """Return the enclosure URLs of every item in an RSS feed file."""
+    root = ET.parse(feed_path).getroot()
+    urls = []
+    for item in root.iter('item'):
+        enclosure = item.find('enclosure')
+        if enclosure is not None and enclosure.get('url'):
+            urls.append(enclosure.get('url'))
+    return urls
+
+
+def collect_episodes(inputs):
+    """
+    Expand batch inputs into episode sources. Each input may be an MP3 path,
+    a URL, a directory of MP3 files, or an RSS feed file.
+    """
+    sources = []
+    for value in inputs:
+        value = value.strip().strip('"')
+        if is_url(value):
+            sources.append(value)
+            continue
+        path = Path(value)
+        if path.is_dir():
+            sources.extend(str(p) for p in sorted(path.glob('*.mp3')))
+        elif path.suffix.lower() in FEED_SUFFIXES:
+            sources.extend(read_feed(path))
+        elif path.exists():
+            sources.append(str(path))
+        else:
+            logging.error(f"Batch input not found, skipping: {value}")
+
+    episodes = []
+    seen = set()
+    for source in sources:
+        if source in seen:
+            continue
+        seen.add(source)
+        workdir = WORKSPACE_DIR / episode_id(source)
+        episodes.append({'id': workdir.name, 'source': source, 'workdir': workdir})
+    return episodes
+
+
+def split_episode(audio_path, chunk_dir, target_size_mb, profile_dir=None):
+    """
+    Split one episode in a worker process; returns its chunk records and the
+    metrics recorded in the worker, which the parent merges into its own.
+    """
+    from metrics import METRICS, profiled
+    from splitter import split_mp3
+    os.makedirs(chunk_dir, exist_ok=True)
+    METRICS.reset()
+    with profiled('split', profile_dir):
+        chunks = split_mp3(audio_path, target_size_mb, chunk_dir)
+    return chunks, METRICS.snapshot()
+
+
+async def prepare_episode(episode, client):
+    """Make the episode audio available locally; URLs are downloaded into its workdir."""
+    from downloader import download_file
+    if not is_url(episode['source']):
+        return episode['source']
+    original_dir = episode['workdir'] / "original"
+    original_dir.mkdir(parents=True, exist_ok=True)
+    destination = original_dir / (os.path.basename(episode['source'].split('?')[0]) or 'episode.mp3')
+    if await asyncio.to_thread(download_file, episode['source'], destination, session=client.requests_session):
+        return str(destination)
+    return None
+
+
+async def process_episode(episode, pool, scheduler, client, cache, target_size_mb, profile=False, store=None):
+    """
+    Split one episode in the process pool, then transcribe its chunks through
+    the shared scheduler. With a TranscriptStore, each chunk is indexed for
+    search as soon as it is transcribed.
+    """
+    from assembly import assemble, chunk_transcript, write_transcript
+    from metrics import METRICS
+    from transcript import schedule_chunk
+    from transcriptstore import try_index
+    from workspace import RunLock
+
+    # The lock keeps workspace cleanup away from the episode while it is processed
+    with RunLock(episode['workdir']):
+        loop = asyncio.get_running_loop()
+        audio_path = await prepare_episode(episode, client)
+        if audio_path is None:
+            logging.error(f"[{episode['id']}] Could not fetch {episode['source']}")
+            return None
+
+        chunks, split_metrics = await loop.run_in_executor(
+            pool, split_episode, audio_path, str(episode['workdir'] / "chunks"), target_size_mb,
+            episode['workdir'] / "profile" if profile else None
+        )
+        METRICS.merge(split_metrics, episode=episode['id'])
+        logging.info(f"[{episode['id']}] Split into {len(chunks)} chunks")
+
+        splitted_dir = episode['workdir'] / "splitted"
+        splitted_dir.mkdir(parents=True, exist_ok=True)
+        indexed = store is not None and try_index(store.begin_episode, episode['source'], title=episode['id']) is not None
+
+        async def transcribe(chunk):
+            entry = await schedule_chunk(scheduler, client.session, chunk, splitted_dir, cache,
+                                         key=lambda c: (episode['id'], c['index']))
+            if indexed and entry['state'] == 'done' and entry['result'][1]:
+                try_index(store.add_chunk, episode['id'], *chunk_transcript(chunk, entry['result'][1]))
+            return entry
+
+        entries = await asyncio.gather(*(transcribe(chunk) for chunk in chunks))
+
+        chunk_results = []
+        for chunk, entry in zip(chunks, entries):
+            if entry['state'] == 'done' and entry['result'][1]:
+                chunk_results.append((chunk, entry['result'][1]))
+            else:
+                logging.error(f"[{episode['id']}] Missing transcript for chunk {chunk['index']}: {entry['error']}")
+                chunk_results.append((chunk, None))
+
+        if all(result is None for _, result in chunk_results):
+            logging.error(f"[{episode['id']}] No successful transcriptions")
+            return None
+        if indexed:
+            try_index(store.finish_episode, episode['id'])
+        return write_transcript(assemble(chunk_results), episode['workdir'] / "transcript", episode=episode['id'])
+
+
+async def run_batch(inputs, target_size_mb=TARGET_SIZE_MB, split_workers=BATCH_SPLIT_WORKERS, profile=False):
+    """
+    Process many episodes without prompts. Episodes are split in parallel in a
+    process pool and all their chunks share one transcription scheduler.
+    Metrics of the whole batch are written to the workspace.
+    Returns {episode id: (json path, text path) or None}.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from cache import TranscriptCache
+    from httpclient import HttpClient
+    from metrics import METRICS
+    from scheduler import TranscriptionScheduler
+    from transcript import close_engines
+    from transcriptstore import open_store
+    from workspace import start_collection
+    episodes = collect_episodes(inputs)
+    if not episodes:
+        logging.error("No episodes found for batch run")
+        return {}
+
+    start_collection()
+    workers = split_workers or os.cpu_count() or 1
+    logging.info(f"Batch of {len(episodes)} episode(s), splitting with {workers} process(es)")
+
+    scheduler = TranscriptionScheduler()
+    store = open_store()
+    try:
+        with TranscriptCache() as cache, ProcessPoolExecutor(max_workers=workers) as pool:
+            cache.evict()
+            # One connection pool for every download and API call of the batch
+            async with HttpClient() as client:
+                outcomes = await asyncio.gather(
+                    *(process_episode(episode, pool, scheduler, client, cache, target_size_mb, profile, store)
+                      for episode in episodes),
+                    return_exceptions=True
+                )
+            logging.info(f"Transcript cache: {cache.hits} hits, {cache.misses} misses")
+    finally:
+        await asyncio.to_thread(close_engines)
+        if store is not None:
+            store.close()
+
+    results = {}
+    for episode, outcome in zip(episodes, outcomes):
+        if isinstance(outcome, Exception):
+            logging.error(f"[{episode['id']}] Failed: {str(outcome)}")
+            outcome = None
+        results[episode['id']] = outcome
+        logging.info(f"[{episode['id']}] {'Transcript: ' + str(outcome[0]) if outcome else 'failed'}")
+    METRICS.export(WORKSPACE_DIR, stem=f"metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    return results
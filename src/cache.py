@@ -0,0 +1,104 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from config import TRANSCRIPT_CACHE_MAX_MB, TRANSCRIPT_CACHE_MAX_AGE_DAYS
+
+# Cache lives next to the scripts, outside the run directories removed by workspace cleanup
+CACHE_PATH = Path(__file__).parent.resolve() / "cache" / "transcripts.sqlite"
+
+# Bytes read at a time when hashing chunk files
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def chunk_key(source, model, params=None):
+    """
+    Content address of a transcription: SHA-256 of the chunk audio plus the
+    model name and request parameters. source is a file path or bytes-like.
+    Reads and hashes the whole chunk; call it from a worker thread.
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    else:
+        with open(source, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+    digest.update(b'\0' + model.encode('utf-8'))
+    digest.update(b'\0' + json.dumps(params or {}, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """Persistent SQLite cache of transcription results with size and age eviction."""
+
+    def __init__(self, path=CACHE_PATH, max_mb=TRANSCRIPT_CACHE_MAX_MB, max_age_days=TRANSCRIPT_CACHE_MAX_AGE_DAYS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_age = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self.db = sqlite3.connect(str(self.path))
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS transcripts ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS transcripts_accessed ON transcripts (accessed)")
+        self.db.commit()
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        row = self.db.execute("SELECT value FROM transcripts WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.db.execute("UPDATE transcripts SET accessed = ? WHERE key = ?", (time.time(), key))
+        self.db.commit()
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        """Store a JSON-serialisable value under key."""
+        data = json.dumps(value)
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO transcripts (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+            (key, data, len(data.encode('utf-8')), now, now)
+        )
+        self.db.commit()
+
+    def evict(self):
+        """Drop entries older than max_age, then least recently used ones above max_bytes."""
+        removed = self.db.execute(
+            "DELETE FROM transcripts WHERE created < ?", (time.time() - self.max_age,)
+        ).rowcount
+
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+        if total > self.max_bytes:
+            rows = self.db.execute("SELECT key, size FROM transcripts ORDER BY accessed").fetchall()
+            stale = []
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                stale.append((key,))
+                total -= size
+            self.db.executemany("DELETE FROM transcripts WHERE key = ?", stale)
+            removed += len(stale)
+
+        self.db.commit()
+        if removed:
+            logging.info(f"Evicted {removed} transcript cache entries")
+        return removed
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,12 +1,23 @@
-import os
-from pathlib import Path
 import logging
 from datetime import datetime
+from pathlib import Path
+import workspace
+
+# Working directories of the standalone splitter.py and transcript.py scripts,
+# which write outside the run workspace
+ROOT_DIR = Path(__file__).parent.resolve()
+LEGACY_DIRS = [
+    ROOT_DIR / "transcript" / "splitted",
+    ROOT_DIR / "transcript" / "summary",
+    ROOT_DIR / "transcript" / "transcript",
+    ROOT_DIR / "podcast" / "original-podcast",
+    ROOT_DIR / "podcast" / "splitted-podcast",
+]
 
 def setup_logging():
     """Setup logging configuration."""
-    log_dir = Path('logs')
-    log_dir.mkdir(exist_ok=True)
+    log_dir = workspace.LOGS_DIR
+    log_dir.mkdir(parents=True, exist_ok=True)
     
     log_file = log_dir / f'cleanup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
     
@@ -25,17 +36,13 @@ def clean_directory(directory):
     try:
         directory = Path(directory)
         if not directory.exists():
-            logging.info(f"Directory doesn't exist, skipping: {directory}")
             return 0
         
         count = 0
         for file_path in directory.glob('*'):
-            if file_path.is_file():
-                # Check file extensions
-                if file_path.suffix.lower() in ['.txt', '.mp3', '.log']:
-                    file_path.unlink()
-                    #logging.info(f"Removed: {file_path}")
-                    count += 1
+            if file_path.is_file() and file_path.suffix.lower() in ['.txt', '.json', '.mp3', '.ogg', '.log']:
+                file_path.unlink()
+                count += 1
         
         return count
     except Exception as e:
@@ -43,42 +50,24 @@ def clean_directory(directory):
         return 0
 
 def main():
-    #log_file = setup_logging()
+    """
+    Remove old runs and logs; live and resumable runs are kept (see workspace.py).
+    The working directories of the standalone scripts are emptied.
+    """
     logging.info("=== Starting Directory Cleanup ===")
     
     try:
-        # Get the root directory (where the script is located)
-        root_dir = Path(__file__).parent.resolve()
-        
-        # Define directories to clean
-        directories = [
-            root_dir / "transcript" / "splitted",
-            root_dir / "transcript" / "summary",
-            root_dir / "transcript" / "transcript",
-            root_dir / "podcast" / "original-podcast",
-            root_dir / "podcast" / "splitted-podcast",
-            root_dir / "logs"
-        ]
-        
-        total_removed = 0
-        
-        # Clean each directory
-        for directory in directories:
-            #logging.info(f"\nCleaning directory: {directory}")
-            files_removed = clean_directory(directory)
-            total_removed += files_removed
-            #logging.info(f"Removed {files_removed} files from {directory}")
-        
-        #logging.info(f"\nCleanup Summary:")
-        logging.info(f"Total files removed: {total_removed}")
-        logging.info(f"Directories processed: {len(directories)}")
+        result = workspace.collect_garbage()
+        legacy_removed = sum(clean_directory(directory) for directory in LEGACY_DIRS)
+        logging.info(f"Total items removed: {result['removed'] + legacy_removed}")
+        logging.info(f"Live or resumable runs kept: {result['kept']}")
         
     except Exception as e:
         logging.error(f"Fatal error: {str(e)}")
     finally:
         logging.info("=== Directory Cleanup Completed ===")
         print("all cleaned.")
-        #logging.info(f"Cleanup log saved to: {log_file}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    setup_logging()
+    main()
@@ -2,8 +2,39 @@
 # Audio Processing Configuration
 #------------------------------------------------------------------------------
 # Maximum size in megabytes for each audio chunk when splitting MP3 files
-# Higher values mean fewer chunks but may impact processing performance
-TARGET_SIZE_MB = 1
+# None picks the chunk count from the episode's real duration and bitrate,
+# within the API limits below, to finish with the fewest requests; a number
+# additionally caps every chunk at that size
+TARGET_SIZE_MB = None
+
+# Move chunk boundaries to nearby pauses in speech instead of cutting mid-word
+# Requires ffmpeg and numpy; falls back to size-based cuts if unavailable
+SILENCE_AWARE_SPLIT = True
+
+# How many seconds before the size limit a cut may be moved to find a pause
+SPLIT_TOLERANCE_SECONDS = 10
+
+# Re-encode the audio for speech before it is split and uploaded, which cuts
+# upload bytes several times over; transcription does not need stereo or 44.1kHz
+# - None: upload the original audio
+# - 'mp3': mono, resampled, low-bitrate MP3, split on frame boundaries as usual
+# - 'opus': mono Ogg Opus, the smallest, cut by ffmpeg's segment muxer
+# Requires ffmpeg; falls back to the original audio if unavailable
+PREPROCESS_AUDIO = None
+PREPROCESS_SAMPLE_RATE = 16000
+PREPROCESS_MP3_BITRATE_KBPS = 32
+PREPROCESS_OPUS_BITRATE_KBPS = 24
+
+# Leave long stretches without speech (intros, music beds, dead air) out of
+# the audio sent for transcription; transcript timestamps still refer to the
+# original episode. Requires ffmpeg and numpy; nothing is skipped if unavailable
+VAD_TRIM = False
+
+# Only stretches without speech at least this long are skipped
+VAD_MIN_SKIP_SECONDS = 5
+
+# Audio kept next to speech on each side of a skipped stretch
+VAD_PADDING_SECONDS = 0.5
 
 #------------------------------------------------------------------------------
 # API Configuration
@@ -18,6 +49,180 @@ API_KEY = "YOUR_API_KEY"
 # - OpenRouter proxy: https://openrouter.ai/api/v1
 API_BASE = "ENDPOINT_URL/v1"
 
+# Limits of the transcription endpoint; chunks are planned to stay within them
+# and checked again before upload (whisper-1 accepts files of up to 25MB)
+# API_MAX_CHUNK_SECONDS caps the audio length of a chunk, None for no limit
+API_MAX_UPLOAD_MB = 25
+API_MAX_CHUNK_SECONDS = None
+
+# Cost model used to choose the chunk count: fixed time per request (upload
+# setup, queueing, connection) plus transcription time per second of audio
+REQUEST_OVERHEAD_SECONDS = 2.0
+TRANSCRIBE_REALTIME_FACTOR = 0.05
+
+# Maximum number of transcription requests in flight at the same time
+MAX_CONCURRENT_REQUESTS = 4
+
+# Maximum number of new transcription requests started per second
+REQUESTS_PER_SECOND = 2
+
+# How often a chunk is retried after a rate limit or transient error
+# Retries use exponential backoff with jitter and honour Retry-After
+MAX_RETRIES = 5
+RETRY_BACKOFF_SECONDS = 1
+RETRY_BACKOFF_MAX_SECONDS = 60
+
+# Transcripts are cached on disk by a hash of the chunk audio, so re-processing
+# an episode that was already transcribed costs no API calls
+# Oldest entries are evicted above the size limit or after the maximum age
+TRANSCRIPT_CACHE_MAX_MB = 200
+TRANSCRIPT_CACHE_MAX_AGE_DAYS = 90
+
+# Transcription engine
+# - 'http': the transcription API above
+# - 'local': faster-whisper on this machine's CPU, offline and without API cost
+#   (pip install faster-whisper); falls back to the API if it is not installed
+TRANSCRIPTION_ENGINE = 'http'
+
+# Local engine: model size or path ('tiny', 'base', 'small', 'medium',
+# 'large-v3'), weight quantization and decoding. int8 is the fastest on CPUs;
+# beam size 1 is greedy decoding, 5 is slower and slightly more accurate
+# LOCAL_LANGUAGE is a code such as 'en' or 'fa', None to detect it per chunk
+LOCAL_MODEL = 'base'
+LOCAL_COMPUTE_TYPE = 'int8'
+LOCAL_LANGUAGE = None
+LOCAL_BEAM_SIZE = 1
+
+# Local engine worker processes, each with its own copy of the model, and
+# threads per worker; None starts one worker per LOCAL_CPU_THREADS cores.
+# Keep MAX_CONCURRENT_REQUESTS at least as high to keep every worker busy
+LOCAL_WORKERS = None
+LOCAL_CPU_THREADS = 1
+
+# Number of split chunks (and finished transcripts) that may wait between
+# pipeline stages; keeps memory flat while splitting and transcription overlap
+PIPELINE_QUEUE_SIZE = 4
+
+# Number of processes used to split episodes in batch mode (main.py --batch)
+# None uses one process per CPU core
+BATCH_SPLIT_WORKERS = None
+
+#------------------------------------------------------------------------------
+# HTTP Client Configuration
+#------------------------------------------------------------------------------
+# One pool of kept-alive connections is shared by download, transcription and
+# summary requests, so each chunk does not pay for a new TCP/TLS handshake
+HTTP_MAX_CONNECTIONS = 32
+HTTP_MAX_CONNECTIONS_PER_HOST = 8
+
+# Seconds an idle connection is kept open for reuse
+HTTP_KEEPALIVE_SECONDS = 60
+
+# Seconds a resolved host name is cached
+HTTP_DNS_CACHE_SECONDS = 300
+
+# Seconds to wait for a connection and between received bytes of an API response
+HTTP_CONNECT_TIMEOUT = 10
+HTTP_READ_TIMEOUT = 300
+
+#------------------------------------------------------------------------------
+# Metrics Configuration
+#------------------------------------------------------------------------------
+# Serve live metrics in the Prometheus text format at http://127.0.0.1:<port>/metrics
+# while a run is in progress; None disables the endpoint
+# Every run also writes metrics.jsonl and metrics.prom next to its manifest
+METRICS_PORT = None
+
+# Most recent spans kept for metrics.jsonl; older ones are dropped but still
+# counted in the per-step totals, so the job server's memory stays bounded
+METRICS_MAX_SPANS = 100000
+
+#------------------------------------------------------------------------------
+# Job Server Configuration
+#------------------------------------------------------------------------------
+# Headless job server started with `python main.py --serve`: episodes are
+# submitted over a local HTTP/JSON API (or dropped into an inbox directory)
+# and queued in SQLite, so queued and interrupted jobs survive a restart
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+
+# Number of episodes processed at the same time; their chunks share the
+# transcription request limits above
+SERVER_WORKERS = 2
+
+# Directory watched for new MP3 files to queue, None to disable
+# Accepted files are moved into its "accepted" subdirectory
+SERVER_INBOX_DIR = None
+
+# Seconds between checks of the inbox directory
+SERVER_POLL_SECONDS = 2
+
+#------------------------------------------------------------------------------
+# Workspace Configuration
+#------------------------------------------------------------------------------
+# Every run keeps its audio, chunks, transcripts and summary in its own
+# directory under src/runs (src/workspace for batch runs). Old runs are
+# removed in the background; runs still in progress or resumable are kept.
+
+# Disk space for all run directories and logs; the least recently used
+# finished runs are removed first when it is exceeded
+WORKSPACE_MAX_MB = 2048
+
+# Finished runs and logs older than this are removed, None to keep them
+WORKSPACE_MAX_AGE_DAYS = 14
+
+# Runs that could be resumed (interrupted, or with failed chunks) but were not
+# touched for this long are removed too, None to keep them until resumed
+WORKSPACE_RESUMABLE_MAX_AGE_DAYS = 30
+
+# Seconds between cleanups while the job server is running
+WORKSPACE_GC_INTERVAL_SECONDS = 3600
+
+#------------------------------------------------------------------------------
+# Transcript Search Configuration
+#------------------------------------------------------------------------------
+# Keep every transcript in a full-text index (src/index/transcripts.sqlite),
+# updated as each chunk is transcribed, so past episodes stay searchable after
+# their run directories are cleaned up: python main.py --search "topic"
+TRANSCRIPT_INDEX = True
+
+# Number of hits returned by a search
+SEARCH_LIMIT = 20
+
+#------------------------------------------------------------------------------
+# Summary Configuration
+#------------------------------------------------------------------------------
+# Summarize in Python (map-reduce over transcript sections) and open the result,
+# instead of uploading the transcript and opening the web backend
+SUMMARIZE_LOCALLY = False
+
+# Chat model used for summaries, through the same API_BASE and API_KEY
+SUMMARY_MODEL = "gpt-4o"
+
+# Estimated tokens per transcript section summarized in one request
+# Long episodes are split into sections, summarized in parallel, then merged
+SUMMARY_SECTION_TOKENS = 6000
+
+# Maximum number of section summaries requested at the same time
+SUMMARY_MAX_WORKERS = 4
+
+# Maximum tokens generated per summary request
+SUMMARY_MAX_TOKENS = 4096
+
+#------------------------------------------------------------------------------
+# Download Configuration
+#------------------------------------------------------------------------------
+# Number of parallel HTTP Range requests used to download an episode
+# Servers without Range support are downloaded in a single stream
+DOWNLOAD_SEGMENTS = 4
+
+# Seconds to wait for a connection and between received bytes
+DOWNLOAD_CONNECT_TIMEOUT = 10
+DOWNLOAD_READ_TIMEOUT = 60
+
+# How often a failed download segment is retried before giving up
+DOWNLOAD_RETRIES = 3
+
 #------------------------------------------------------------------------------
 # FTP Server Configuration
 #------------------------------------------------------------------------------
@@ -38,6 +243,12 @@ FTP_PASSWORD = "FTP_PASSWORD"
 # Change only if you need a specific subdirectory
 FTP_DIRECTORY = "/"
 
+# Number of logged-in FTP sessions kept open for uploads
+FTP_POOL_SIZE = 2
+
+# Seconds to wait for the FTP server before giving up
+FTP_TIMEOUT = 30
+
 #------------------------------------------------------------------------------
 # Web URL Configuration
 #------------------------------------------------------------------------------
@@ -0,0 +1,272 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from tqdm import tqdm
+from config import DOWNLOAD_SEGMENTS, DOWNLOAD_CONNECT_TIMEOUT, DOWNLOAD_READ_TIMEOUT, DOWNLOAD_RETRIES
+from httpclient import create_requests_session
+from manifest import atomic_write_json
+from metrics import METRICS
+
+# Bytes read from the socket and written to disk at a time
+BLOCK_SIZE = 1024 * 1024
+# Files smaller than this are not worth splitting into ranges
+MIN_SEGMENT_SIZE = 2 * 1024 * 1024
+# How often (in bytes written per segment) the resume state is saved
+STATE_SAVE_INTERVAL = 8 * 1024 * 1024
+
+
+# Digest algorithms of Repr-Digest / Digest headers that downloads are checked against
+DIGEST_ALGORITHMS = {'sha-256': 'sha256', 'sha-512': 'sha512'}
+
+
+class RangeNotHonoured(Exception):
+    """The server answered a range request with the whole file or a different resource."""
+
+
+def representation_digest(headers):
+    """
+    The digest of the whole file announced by the server, as (hashlib
+    algorithm, digest bytes) from a Repr-Digest (RFC 9530) or Digest
+    (RFC 3230) header, or None. Both describe the full file, also in a 206.
+    """
+    for header, pattern in (('Repr-Digest', r'([\w-]+)=:([^:]+):'), ('Digest', r'([\w-]+)=([^,\s]+)')):
+        for algorithm, value in re.findall(pattern, headers.get(header, '')):
+            if algorithm.lower() in DIGEST_ALGORITHMS:
+                try:
+                    return DIGEST_ALGORITHMS[algorithm.lower()], base64.b64decode(value, validate=True)
+                except ValueError:
+                    continue
+    return None
+
+
+def probe(session, url, timeout):
+    """
+    Ask for the first byte to learn the size, validator, digest and Range
+    support. Returns (size, supports_ranges, validator, digest); size is 0
+    when unknown, digest None unless the server announces one.
+    """
+    response = session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=timeout)
+    try:
+        response.raise_for_status()
+        validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+        digest = representation_digest(response.headers)
+        match = re.match(r'bytes 0-0/(\d+)', response.headers.get('Content-Range', ''))
+        if response.status_code == 206 and match:
+            return int(match.group(1)), True, validator, digest
+        return int(response.headers.get('Content-Length', 0)), False, validator, digest
+    finally:
+        response.close()
+
+
+def verify_download(path, size, digest):
+    """Check a finished download against the size and, when the server announced one, the digest."""
+    if size and os.path.getsize(path) != size:
+        raise IOError(f"Incomplete download: expected {size} bytes, got {os.path.getsize(path)}")
+    if digest is None:
+        return
+    algorithm, expected = digest
+    hasher = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            hasher.update(block)
+    if hasher.digest() != expected:
+        raise IOError(f"Corrupt download: {algorithm} digest does not match the server's")
+
+
+def plan_segments(size, segments):
+    """Split [0, size) into byte ranges of roughly equal length."""
+    count = max(1, min(segments, size // MIN_SEGMENT_SIZE))
+    step = -(-size // count)
+    return [{'start': start, 'end': min(start + step, size) - 1, 'done': 0} for start in range(0, size, step)]
+
+
+def load_state(state_path, url, size, validator):
+    """Return saved segment state for an interrupted download of the same resource, or None."""
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get('size') != size or state.get('validator') != validator:
+        return None
+    # Without an ETag/Last-Modified validator only the exact same URL is trusted
+    if not validator and state.get('url') != url:
+        return None
+    return state
+
+
+def sync_segment(f, segment, written, save_state):
+    """
+    Flush and fsync the bytes written to the part file, then advance the
+    segment's resume offset past them and save it. A saved offset never
+    covers bytes that are not on disk.
+    """
+    f.flush()
+    os.fsync(f.fileno())
+    segment['done'] += written
+    save_state()
+
+
+def download_segment(session, url, part_path, segment, validator, timeout, progress, save_state):
+    """Fetch one byte range into its place in the preallocated part file, resuming from segment['done']."""
+    attempt = 0
+    while segment['start'] + segment['done'] <= segment['end']:
+        offset = segment['start'] + segment['done']
+        headers = {'Range': f"bytes={offset}-{segment['end']}"}
+        if validator:
+            # If the file changed on the server, If-Range makes it send 200 instead of a stale range
+            headers['If-Range'] = validator
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                if response.status_code != 206:
+                    raise RangeNotHonoured(f"expected 206 for range {offset}-{segment['end']}, got {response.status_code}")
+                with open(part_path, 'r+b') as f:
+                    f.seek(offset)
+                    written = 0
+                    try:
+                        for data in response.iter_content(BLOCK_SIZE):
+                            data = data[:segment['end'] + 1 - (offset + written)]
+                            f.write(data)
+                            written += len(data)
+                            progress(len(data))
+                            if written >= STATE_SAVE_INTERVAL:
+                                sync_segment(f, segment, written, save_state)
+                                offset += written
+                                written = 0
+                    finally:
+                        # Record what reached the disk, also when the connection drops
+                        sync_segment(f, segment, written, save_state)
+        except RangeNotHonoured:
+            raise
+        except requests.RequestException as e:
+            attempt += 1
+            if attempt > DOWNLOAD_RETRIES:
+                raise
+            logging.warning(f"Segment {segment['start']}-{segment['end']} failed ({str(e)}), retrying")
+            time.sleep(min(30, 2 ** attempt))
+
+
+def download_ranges(session, url, destination, size, validator, segments, timeout, progress_bar, digest=None):
+    """
+    Download in parallel byte ranges into a preallocated .part file that
+    survives interruptions, then check it against size and digest.
+    """
+    part_path = f"{destination}.part"
+    state_path = f"{destination}.part.json"
+    state = load_state(state_path, url, size, validator) if os.path.exists(part_path) else None
+    if state is None:
+        state = {'url': url, 'size': size, 'validator': validator, 'segments': plan_segments(size, segments)}
+        with open(part_path, 'wb') as f:
+            f.truncate(size)
+    else:
+        resumed = sum(s['done'] for s in state['segments'])
+        logging.info(f"Resuming download at {resumed / (1024 * 1024):.1f}MB of {size / (1024 * 1024):.1f}MB")
+        progress_bar.update(resumed)
+
+    lock = threading.Lock()
+
+    def progress(n):
+        with lock:
+            progress_bar.update(n)
+
+    def save_state():
+        with lock:
+            atomic_write_json(state_path, state)
+
+    save_state()
+    with ThreadPoolExecutor(max_workers=len(state['segments'])) as pool:
+        futures = [
+            pool.submit(download_segment, session, url, part_path, segment, validator, timeout, progress, save_state)
+            for segment in state['segments']
+        ]
+        for future in futures:
+            future.result()
+
+    # Integrity check: every byte of every range must have arrived, and match the server's digest
+    if sum(s['done'] for s in state['segments']) != size:
+        raise IOError(f"Incomplete download: expected {size} bytes")
+    try:
+        verify_download(part_path, size, digest)
+    except IOError:
+        # Resuming would keep the bad bytes; start over next time
+        os.remove(part_path)
+        os.remove(state_path)
+        raise
+    os.replace(part_path, destination)
+    os.remove(state_path)
+
+
+def download_stream(session, url, destination, size, timeout, progress_bar, digest=None):
+    """Single-stream fallback for servers without Range support."""
+    part_path = f"{destination}.part"
+    with session.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        with open(part_path, 'wb') as f:
+            for data in response.iter_content(BLOCK_SIZE):
+                f.write(data)
+                progress_bar.update(len(data))
+    try:
+        verify_download(part_path, size, digest)
+    except IOError:
+        os.remove(part_path)
+        raise
+    os.replace(part_path, destination)
+
+
+def download_file(url, destination, segments=DOWNLOAD_SEGMENTS, session=None):
+    """
+    Download a file from a URL to a specified destination with progress bar.
+    Uses parallel HTTP Range requests when the server supports them, resumes
+    an interrupted download from its .part file, and otherwise falls back to
+    a single stream. The file is checked against its size and, if the server
+    announces one, its digest. Pass the run's shared requests session to reuse
+    its pooled connections; otherwise a pool is created for this download.
+    """
+    timeout = (DOWNLOAD_CONNECT_TIMEOUT, DOWNLOAD_READ_TIMEOUT)
+    own_session = session is None
+    try:
+        if own_session:
+            session = create_requests_session(pool_size=segments)
+
+        size, supports_ranges, validator, digest = probe(session, url, timeout)
+        started = time.perf_counter()
+        with tqdm(
+            desc=os.path.basename(destination),
+            total=size,
+            unit='iB',
+            unit_scale=True,
+            unit_divisor=1024,
+        ) as progress_bar:
+            if supports_ranges and size > 0:
+                try:
+                    download_ranges(session, url, destination, size, validator, segments, timeout, progress_bar, digest)
+                except RangeNotHonoured as e:
+                    logging.warning(f"Range download not possible ({str(e)}), using a single stream")
+                    for leftover in (f"{destination}.part", f"{destination}.part.json"):
+                        if os.path.exists(leftover):
+                            os.remove(leftover)
+                    progress_bar.reset()
+                    download_stream(session, url, destination, size, timeout, progress_bar, digest)
+            else:
+                download_stream(session, url, destination, size, timeout, progress_bar, digest)
+        elapsed = time.perf_counter() - started
+
+        total = os.path.getsize(destination)
+        METRICS.record_span('download', started, started + elapsed, bytes=total, ranged=supports_ranges)
+        METRICS.count('download_bytes', total)
+        logging.info(f"Downloaded file from {url} to {destination} "
+                     f"({total / (1024 * 1024):.1f}MB at {total / (1024 * 1024) / max(elapsed, 1e-9):.2f}MB/s)")
+        return True
+    except Exception as e:
+        logging.error(f"Error downloading file: {str(e)}")
+        return False
+    finally:
+        if own_session and session is not None:
+            session.close()
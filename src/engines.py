@@ -0,0 +1,185 @@
+import asyncio
+import importlib.util
+import io
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import aiohttp
+from config import LOCAL_MODEL, LOCAL_COMPUTE_TYPE, LOCAL_WORKERS, LOCAL_CPU_THREADS, LOCAL_LANGUAGE, LOCAL_BEAM_SIZE
+from metrics import METRICS
+from scheduler import parse_retry_after
+from sizing import chunk_limit_error
+from upload import build_upload_form, chunk_source, log_upload_stats
+
+# Rate limits and transient server errors are retried by the scheduler
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TranscriptionError(Exception):
+    """A failed transcription request; `retryable` marks rate limits and transient errors."""
+
+    def __init__(self, message, status=None, retryable=False, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+def result_segments(segments):
+    return [
+        {'start': segment.get('start', 0), 'end': segment.get('end', 0), 'text': segment.get('text', '')}
+        for segment in segments or []
+    ]
+
+
+# An engine turns one chunk into {'text', 'segments'} with times relative to the chunk. Its model and params
+# are part of transcript cache keys; check(chunk) says why a chunk cannot be sent, or None
+class HttpEngine:
+    """
+    The transcription API: every chunk is uploaded to {API_BASE}/audio/transcriptions.
+    config is a dict with API_KEY, API_BASE, MODEL and RESPONSE_FORMAT, read on
+    every request so it can be changed at runtime.
+    """
+
+    name = 'http'
+
+    def __init__(self, config):
+        self.config = config
+
+    @property
+    def model(self):
+        return self.config['MODEL']
+
+    @property
+    def params(self):
+        return {'response_format': self.config['RESPONSE_FORMAT']}
+
+    def check(self, chunk):
+        # Oversized chunks would only be rejected after a full upload
+        return chunk_limit_error(chunk)
+
+    async def transcribe(self, session, chunk):
+        name, _ = chunk_source(chunk)
+        try:
+            with METRICS.span('api', chunk=name) as span:
+                form_data, file_payload = build_upload_form(chunk, {'model': self.model, **self.params})
+                async with session.post(
+                    f"{self.config['API_BASE']}/audio/transcriptions",
+                    data=form_data,
+                    headers={'Authorization': f'Bearer {self.config["API_KEY"]}'}
+                ) as response:
+                    span['status'] = response.status
+                    METRICS.count('api_responses', status=response.status)
+                    log_upload_stats(name, file_payload, time.perf_counter())
+                    if response.status == 200:
+                        result = await response.json()
+                        return {'text': result.get('text', ''), 'segments': result_segments(result.get('segments'))}
+
+                    error_text = await response.text()
+                    raise TranscriptionError(
+                        f"API error for {name} ({response.status}): {error_text}",
+                        status=response.status,
+                        retryable=response.status in RETRYABLE_STATUSES,
+                        retry_after=parse_retry_after(response.headers.get('Retry-After'))
+                    )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise TranscriptionError(f"Network error for {name}: {str(e)}", retryable=True)
+
+    def close(self):
+        pass
+
+
+# The model of a local engine worker process, loaded once by its initializer
+worker_model = None
+
+
+def load_worker_model(model, compute_type, cpu_threads):
+    global worker_model
+    from faster_whisper import WhisperModel
+    worker_model = WhisperModel(model, device='cpu', compute_type=compute_type, cpu_threads=cpu_threads)
+
+
+def transcribe_in_worker(source, language, beam_size):
+    """Transcribe one chunk (a path or the audio bytes) with the worker's model."""
+    if not isinstance(source, (str, os.PathLike)):
+        source = io.BytesIO(source)
+    segments, _ = worker_model.transcribe(source, language=language, beam_size=beam_size)
+    # Segments are decoded lazily; the list drives the whole transcription
+    segments = [{'start': round(s.start, 3), 'end': round(s.end, 3), 'text': s.text} for s in segments]
+    return {'text': "".join(segment['text'] for segment in segments).strip(), 'segments': segments}
+
+
+class LocalEngine:
+    """
+    Offline transcription on the CPU with faster-whisper (CTranslate2 with
+    int8 quantized weights by default). Chunks are transcribed in a process
+    pool sized to the cores, and every worker loads the model once and keeps
+    it for all the chunks it gets. Needs `pip install faster-whisper`.
+    """
+
+    name = 'local'
+
+    def __init__(self, model=LOCAL_MODEL, compute_type=LOCAL_COMPUTE_TYPE, workers=LOCAL_WORKERS,
+                 cpu_threads=LOCAL_CPU_THREADS, language=LOCAL_LANGUAGE, beam_size=LOCAL_BEAM_SIZE):
+        self.model_name = model
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.workers = workers or max(1, (os.cpu_count() or 1) // cpu_threads)
+        self.language = language
+        self.beam_size = beam_size
+        self.pool = None
+
+    @classmethod
+    def available(cls):
+        return importlib.util.find_spec('faster_whisper') is not None
+
+    @property
+    def model(self):
+        return f"faster-whisper-{self.model_name}-{self.compute_type}"
+
+    @property
+    def params(self):
+        return {'language': self.language, 'beam_size': self.beam_size}
+
+    def check(self, chunk):
+        return None
+
+    def start(self):
+        """Start the worker processes; each loads the model before its first chunk."""
+        if self.pool is None:
+            logging.info(f"Starting {self.workers} local transcription worker(s) with {self.model}, "
+                         f"{self.cpu_threads} thread(s) each")
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=load_worker_model,
+                initargs=(self.model_name, self.compute_type, self.cpu_threads)
+            )
+        return self
+
+    async def transcribe(self, session, chunk):
+        name, source = chunk_source(chunk)
+        if not isinstance(source, (str, os.PathLike)):
+            # Buffers are pickled to the worker; memoryviews cannot be
+            source = bytes(source)
+        self.start()
+        loop = asyncio.get_running_loop()
+        with METRICS.span('local_transcribe', chunk=name):
+            return await loop.run_in_executor(self.pool, transcribe_in_worker, source, self.language, self.beam_size)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+
+def create_engine(name, config):
+    """Create the engine called name; the local engine falls back to the API if faster-whisper is missing."""
+    if name == 'local':
+        if LocalEngine.available():
+            return LocalEngine()
+        logging.warning("faster-whisper is not installed (pip install faster-whisper), "
+                        "transcribing with the API instead")
+        return HttpEngine(config)
+    if name != 'http':
+        raise ValueError(f"Unknown transcription engine: {name}")
+    return HttpEngine(config)
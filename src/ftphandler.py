@@ -1,22 +1,200 @@
+import asyncio
 import ftplib
-from datetime import datetime
+import hashlib
+import logging
 import os
-from config import UPLOAD_BASE_URL
+import queue
+import threading
+import time
+from config import UPLOAD_BASE_URL, FTP_POOL_SIZE, FTP_TIMEOUT
+from metrics import METRICS
+
+# Bytes sent per write on the FTP data connection
+BLOCK_SIZE = 256 * 1024
+
+# Connection errors after which a session is dropped and the upload retried once
+CONNECTION_ERRORS = (OSError, EOFError, ftplib.error_temp, ftplib.error_reply)
+
+
+def content_name(file_path):
+    """Remote file name from a hash of the content, so identical transcripts share one file."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    file_extension = os.path.splitext(file_path)[1]
+    return f"transcript_{digest.hexdigest()[:16]}{file_extension}"
+
+
+def reply_code(error):
+    """The three-digit FTP reply code of an ftplib error."""
+    return str(error)[:3]
+
+
+def remote_size(ftp, name):
+    """
+    Size of a remote file in bytes: 0 if it does not exist, None if the
+    server does not support SIZE and the size is unknown.
+    """
+    if getattr(ftp, 'size_unsupported', False):
+        return None
+    try:
+        ftp.voidcmd('TYPE I')
+        return ftp.size(name)
+    except ftplib.error_perm as e:
+        # 550: no such file; 500/502/504: SIZE is not implemented by the server
+        if reply_code(e) == '550':
+            return 0
+        logging.info(f"FTP server does not support SIZE ({str(e)}), uploads are not resumed or checked")
+        ftp.size_unsupported = True
+        return None
+
+
+def store(ftp, file_path, name):
+    """
+    Upload file_path as name. A complete remote copy is skipped and a partial
+    one is resumed with REST + STOR, or APPE if the server refuses REST.
+    Without SIZE on the server the file is always uploaded in full.
+    Returns (action, bytes sent).
+    """
+    local_size = os.path.getsize(file_path)
+    existing = remote_size(ftp, name)
+    if existing and existing == local_size:
+        return 'skipped', 0
+
+    offset = existing if existing and existing < local_size else 0
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        if offset:
+            try:
+                ftp.storbinary(f'STOR {name}', f, BLOCK_SIZE, rest=offset)
+            except ftplib.error_perm:
+                f.seek(offset)
+                ftp.storbinary(f'APPE {name}', f, BLOCK_SIZE)
+        else:
+            ftp.storbinary(f'STOR {name}', f, BLOCK_SIZE)
+
+    if existing is not None:
+        uploaded = remote_size(ftp, name)
+        if uploaded is not None and uploaded != local_size:
+            raise IOError(f"Upload of {name} incomplete: {uploaded} of {local_size} bytes on server")
+    return ('resumed' if offset else 'uploaded'), local_size - offset
+
+
+class FtpPool:
+    """
+    Small pool of logged-in FTP sessions. Sessions are blocking and only used
+    from worker threads; an idle session that went stale is replaced.
+    """
+
+    def __init__(self, host, user, password, directory, size=FTP_POOL_SIZE, port=21):
+        self.host = host
+        self.user = user
+        self.password = password
+        self.directory = directory
+        self.port = port
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+        self.logins = 0
+
+    def connect(self):
+        ftp = ftplib.FTP(timeout=FTP_TIMEOUT)
+        ftp.connect(self.host, self.port)
+        ftp.login(user=self.user, passwd=self.password)
+        ftp.cwd(self.directory)
+        self.logins += 1
+        return ftp
+
+    def acquire(self):
+        self.slots.acquire()
+        try:
+            while True:
+                try:
+                    ftp = self.idle.get_nowait()
+                except queue.Empty:
+                    return self.connect()
+                try:
+                    ftp.voidcmd('NOOP')
+                    return ftp
+                except CONNECTION_ERRORS:
+                    ftp.close()
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def release(self, ftp, broken=False):
+        if broken:
+            ftp.close()
+        else:
+            self.idle.put(ftp)
+        self.slots.release()
+
+    def close(self):
+        while True:
+            try:
+                ftp = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                ftp.quit()
+            except Exception:
+                ftp.close()
+
+
+class FtpUploader:
+    """
+    Uploads transcripts off the event loop through a pool of FTP sessions.
+    Files are named by content hash, so uploading the same transcript again
+    is skipped and concurrent uploads never collide on a name.
+    """
+
+    def __init__(self, ftp_host, ftp_user, ftp_pass, ftp_dir, pool_size=FTP_POOL_SIZE, port=21):
+        self.pool = FtpPool(ftp_host, ftp_user, ftp_pass, ftp_dir, pool_size, port)
+        self.lock = threading.Lock()
+        self.stats = {'uploaded': 0, 'resumed': 0, 'skipped': 0, 'bytes': 0}
+
+    def upload_sync(self, file_path):
+        """Upload one file from the calling thread and return its public URL."""
+        name = content_name(file_path)
+        started = time.perf_counter()
+        for attempt in range(2):
+            ftp = self.pool.acquire()
+            try:
+                action, sent = store(ftp, file_path, name)
+            except CONNECTION_ERRORS as e:
+                self.pool.release(ftp, broken=True)
+                if attempt:
+                    raise
+                # A new session resumes from whatever reached the server
+                logging.warning(f"FTP upload of {name} interrupted ({str(e)}), retrying")
+                continue
+            except BaseException:
+                self.pool.release(ftp, broken=True)
+                raise
+            self.pool.release(ftp)
+            break
+
+        elapsed = time.perf_counter() - started
+        METRICS.record_span('ftp_upload', started, started + elapsed, action=action, bytes=sent)
+        METRICS.count('ftp_bytes', sent)
+        with self.lock:
+            self.stats[action] += 1
+            self.stats['bytes'] += sent
+        logging.info(f"FTP {action} {name}: {sent / 1024:.1f}KB in {elapsed:.2f}s")
+        return f"{UPLOAD_BASE_URL}{name}"
+
+    async def upload(self, file_path):
+        """Upload one file in a worker thread and return its public URL."""
+        return await asyncio.to_thread(self.upload_sync, file_path)
+
+    def close(self):
+        self.pool.close()
+
 
 def upload_file(file_path, ftp_host, ftp_user, ftp_pass, ftp_dir):
-    # Extract filename and generate new name with timestamp
-    original_filename = os.path.basename(file_path)
-    file_extension = os.path.splitext(original_filename)[1]
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    new_filename = f"transcript_{timestamp}{file_extension}"
-    
-    # Connect to FTP server and upload file
-    with ftplib.FTP(ftp_host) as ftp:
-        ftp.login(user=ftp_user, passwd=ftp_pass)
-        ftp.cwd(ftp_dir)
-        
-        with open(file_path, 'rb') as file:
-            ftp.storbinary(f'STOR {new_filename}', file)
-    
-    # Construct and return full URL
-    return f"{UPLOAD_BASE_URL}{new_filename}"
+    """Upload a single file with a one-off session and return its public URL."""
+    uploader = FtpUploader(ftp_host, ftp_user, ftp_pass, ftp_dir, pool_size=1)
+    try:
+        return uploader.upload_sync(file_path)
+    finally:
+        uploader.close()
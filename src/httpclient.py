@@ -0,0 +1,200 @@
+import logging
+import threading
+import time
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from config import (
+    HTTP_MAX_CONNECTIONS, HTTP_MAX_CONNECTIONS_PER_HOST, HTTP_KEEPALIVE_SECONDS,
+    HTTP_DNS_CACHE_SECONDS, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+)
+
+
+class ConnectionStats:
+    """
+    Counts requests and newly opened connections of one client. Every request
+    that did not open a connection reused a pooled one and skipped the TCP
+    (and for HTTPS the TLS) handshake.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.tls_requests = 0
+        self.connections = 0
+        self.tls_connections = 0
+        self.connect_seconds = 0.0
+        self.tls_connect_seconds = 0.0
+        self.dns_lookups = 0
+        self.dns_cache_hits = 0
+
+    def request(self, tls):
+        with self.lock:
+            self.requests += 1
+            self.tls_requests += tls
+
+    def connection(self, seconds, tls):
+        with self.lock:
+            self.connections += 1
+            self.connect_seconds += seconds
+            if tls:
+                self.tls_connections += 1
+                self.tls_connect_seconds += seconds
+
+    def dns(self, cached):
+        with self.lock:
+            if cached:
+                self.dns_cache_hits += 1
+            else:
+                self.dns_lookups += 1
+
+    def report(self):
+        """Connection reuse and the handshake time it saved, estimated from the measured connects."""
+        with self.lock:
+            reused = max(0, self.requests - self.connections)
+            tls_avoided = max(0, self.tls_requests - self.tls_connections)
+            connect = self.connect_seconds / self.connections if self.connections else 0.0
+            tls_connect = self.tls_connect_seconds / self.tls_connections if self.tls_connections else 0.0
+            return {
+                'requests': self.requests,
+                'connections': self.connections,
+                'reused': reused,
+                'reuse_ratio': round(reused / self.requests, 3) if self.requests else 0.0,
+                'avg_connect_ms': round(connect * 1000, 1),
+                'tls_handshakes': self.tls_connections,
+                'tls_handshakes_avoided': tls_avoided,
+                'avg_tls_connect_ms': round(tls_connect * 1000, 1),
+                'saved_seconds': round((reused - tls_avoided) * connect + tls_avoided * tls_connect, 3),
+                'dns_lookups': self.dns_lookups,
+                'dns_cache_hits': self.dns_cache_hits,
+            }
+
+
+def trace_config(stats):
+    """aiohttp trace hooks feeding ConnectionStats."""
+    config = aiohttp.TraceConfig()
+
+    async def on_request_start(session, context, params):
+        context.tls = params.url.scheme == 'https'
+        stats.request(context.tls)
+
+    async def on_connection_create_start(session, context, params):
+        context.connect_started = time.perf_counter()
+
+    async def on_connection_create_end(session, context, params):
+        # For HTTPS the connect time includes the TLS handshake
+        stats.connection(time.perf_counter() - context.connect_started, context.tls)
+
+    async def on_dns_resolvehost_end(session, context, params):
+        stats.dns(cached=False)
+
+    async def on_dns_cache_hit(session, context, params):
+        stats.dns(cached=True)
+
+    config.on_request_start.append(on_request_start)
+    config.on_connection_create_start.append(on_connection_create_start)
+    config.on_connection_create_end.append(on_connection_create_end)
+    config.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+    config.on_dns_cache_hit.append(on_dns_cache_hit)
+    return config
+
+
+class PooledAdapter(HTTPAdapter):
+    """requests adapter that records every request and times every new connection."""
+
+    def __init__(self, stats, **kwargs):
+        # Set before HTTPAdapter.__init__, which builds the pool manager
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        stats = self.stats
+
+        class TimedHTTPConnection(HTTPConnection):
+            def connect(self):
+                started = time.perf_counter()
+                super().connect()
+                stats.connection(time.perf_counter() - started, tls=False)
+
+        class TimedHTTPSConnection(HTTPSConnection):
+            def connect(self):
+                started = time.perf_counter()
+                super().connect()
+                stats.connection(time.perf_counter() - started, tls=True)
+
+        class TimedHTTPConnectionPool(HTTPConnectionPool):
+            ConnectionCls = TimedHTTPConnection
+
+        class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+            ConnectionCls = TimedHTTPSConnection
+
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        self.stats.request(request.url.startswith('https://'))
+        return super().send(request, **kwargs)
+
+
+def create_requests_session(stats=None, pool_size=HTTP_MAX_CONNECTIONS_PER_HOST):
+    """Blocking session with keep-alive connection pools of pool_size per host."""
+    session = requests.Session()
+    adapter = PooledAdapter(stats or ConnectionStats(), pool_connections=HTTP_MAX_CONNECTIONS, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class HttpClient:
+    """
+    Pooled HTTP clients for one run, shared by download, transcription and summary:
+    `session` (aiohttp) for the API calls and `requests_session` for blocking
+    downloads. Connections are kept alive and reused, DNS answers are cached,
+    and reuse is logged when the client is closed.
+    """
+
+    def __init__(self, ssl=None):
+        self.stats = {'api': ConnectionStats(), 'download': ConnectionStats()}
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_MAX_CONNECTIONS,
+            limit_per_host=HTTP_MAX_CONNECTIONS_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_SECONDS,
+            ttl_dns_cache=HTTP_DNS_CACHE_SECONDS,
+            ssl=ssl,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=None, connect=HTTP_CONNECT_TIMEOUT, sock_read=HTTP_READ_TIMEOUT),
+            trace_configs=[trace_config(self.stats['api'])],
+        )
+        self.requests_session = create_requests_session(self.stats['download'])
+
+    def report(self):
+        return {name: stats.report() for name, stats in self.stats.items()}
+
+    def log_stats(self):
+        for name, report in self.report().items():
+            if not report['requests']:
+                continue
+            logging.info(
+                f"HTTP {name}: {report['requests']} requests over {report['connections']} connections "
+                f"({report['reuse_ratio']:.0%} reused, {report['tls_handshakes_avoided']} TLS handshakes avoided, "
+                f"~{report['saved_seconds']:.2f}s connection setup saved, "
+                f"{report['dns_cache_hits']} DNS cache hits)"
+            )
+
+    async def close(self):
+        await self.session.close()
+        self.requests_session.close()
+        self.log_stats()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
@@ -1,77 +1,34 @@
-import asyncio
+import argparse
 import logging
-from pathlib import Path
-import subprocess
-import aiohttp
-from datetime import datetime
-import shutil
-import os
-import webbrowser
-from ftphandler import upload_file
-import requests
-from tqdm import tqdm
-from splitter import process_directory, setup_logging
-from transcript import main as transcript_main
-from config import SUMMARY_API_URL, FTP_HOST, FTP_USER, FTP_PASSWORD, FTP_DIRECTORY, SUMMARY_UPLOADED_TEXT_FILE
+from config import METRICS_PORT, SUMMARIZE_LOCALLY, FTP_HOST, FTP_USER, FTP_PASSWORD, FTP_DIRECTORY, SUMMARY_UPLOADED_TEXT_FILE
 
-# Configuration
-CONFIG = {
-    'SUMMARY_API_URL': SUMMARY_API_URL,
-}
+VERSION = "1.0.0"
 
-async def send_to_summary_api(transcript_content):
-    """Send transcript to summary API and get response."""
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                CONFIG['SUMMARY_API_URL'],
-                json={'text': transcript_content},
-                headers={'Content-Type': 'application/json'}
-            ) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    if 'response' in result:
-                        return result['response']
-                    elif 'error' in result:
-                        logging.error(f"API error: {result['error']}")
-                        return None
-                    return None
-                else:
-                    error_text = await response.text()
-                    logging.error(f"API error: {error_text}")
-                    return None
-    except Exception as e:
-        logging.error(f"Error sending to summary API: {str(e)}")
-        return None
+# Pipeline stages (aiohttp, requests, numpy and the engines) are imported by the
+# entry point that needs them, so --version and --dry-run start without them
 
-def get_latest_transcript():
-    """Get the most recent transcript file content."""
+async def send_to_summary_api(session, segments, prompt=None, cache=None):
+    """
+    Summarize transcript segments with the map-reduce summarizer and return the
+    summary. segments is a list, or the async iterator of a transcript that is
+    still being written, in which case sections are summarized as they fill.
+    """
+    from cache import TranscriptCache
+    from summarizer import Summarizer
     try:
-        script_dir = Path(__file__).parent.resolve()
-        transcript_dir = script_dir / "transcript" / "transcript"
-        
-        # Get all transcript files
-        transcript_files = list(transcript_dir.glob("transcript_*.txt"))
-        
-        if not transcript_files:
-            logging.error("No transcript files found")
-            return None
-        
-        # Get the latest file
-        latest_file = max(transcript_files, key=lambda x: x.stat().st_mtime)
-        
-        # Read content
-        with open(latest_file, 'r', encoding='utf-8') as f:
-            return f.read()
+        if cache is not None:
+            return await Summarizer(session, cache).summarize(segments, prompt)
+        with TranscriptCache() as cache:
+            return await Summarizer(session, cache).summarize(segments, prompt)
     except Exception as e:
-        logging.error(f"Error reading latest transcript: {str(e)}")
+        logging.error(f"Error sending to summary API: {str(e)}")
         return None
 
-async def save_summary(summary_text):
+async def save_summary(summary_text, summary_file):
     """Save summary to a file and open it."""
+    import subprocess
     try:
-        script_dir = Path(__file__).parent.resolve()
-        summary_file = script_dir / "transcript" / "summary" / "summary.txt"
+        summary_file.parent.mkdir(parents=True, exist_ok=True)
         
         # Save summary with UTF-8 encoding
         with open(summary_file, 'w', encoding='utf-8') as f:
@@ -85,116 +42,181 @@ async def save_summary(summary_text):
         logging.error(f"Error saving summary: {str(e)}")
         return False
 
-def download_file(url, destination):
-    """Download a file from a URL to a specified destination with progress bar."""
-    try:
-        response = requests.get(url, stream=True)
-        total_size = int(response.headers.get('content-length', 0))
-        block_size = 1024  # 1 KB
+def finish_run(manifest):
+    """Mark a run done once every chunk is transcribed; a run with failed chunks is kept for --resume."""
+    if manifest.step('transcribe'):
+        manifest.finish()
+    else:
+        logging.warning(f"Some chunks were not transcribed, retry them with: python main.py --resume {manifest.run_id}")
 
-        with open(destination, 'wb') as file, tqdm(
-            desc=os.path.basename(destination),
-            total=total_size,
-            unit='iB',
-            unit_scale=True,
-            unit_divisor=1024,
-        ) as progress_bar:
-            for data in response.iter_content(block_size):
-                size = file.write(data)
-                progress_bar.update(size)
+def read_audio_input():
+    """Prompt for the episode to process; returns the path or URL as typed, pasted or dragged in."""
+    print("Please enter the path of the local MP3 file or the URL of an MP3 file:")
+    return input().strip().strip('"')  # Remove quotes if present
 
-        logging.info(f"Downloaded file from {url} to {destination}")
-        return True
-    except Exception as e:
-        logging.error(f"Error downloading file: {str(e)}")
-        return False
-
-async def main():
+async def main(resume=None, profile=False):
+    import asyncio
+    import json
+    import os
+    import subprocess
+    import webbrowser
+    from pathlib import Path
+    import metrics
+    from assembly import TranscriptWriter
+    from cache import TranscriptCache
+    from downloader import download_file
+    from ftphandler import FtpUploader
+    from httpclient import HttpClient
+    from manifest import RunManifest
+    from metrics import METRICS
+    from pipeline import run_pipeline
+    from splitter import setup_logging
+    from summarizer import segments_from_text
+    from transcript import close_engines
+    from transcriptstore import open_store
+    from workspace import RunLock, start_collection
+    
     # Setup logging
     log_file = setup_logging()
     logging.info("=== Starting Podcast Processing Pipeline ===")
     
+    # Connections are pooled for the whole run: download, transcription, summary and FTP upload
+    client = HttpClient()
+    uploader = FtpUploader(FTP_HOST, FTP_USER, FTP_PASSWORD, FTP_DIRECTORY)
+    metrics_server = metrics.serve(METRICS_PORT) if METRICS_PORT else None
+    manifest = None
+    run_lock = None
     try:
-        # Delete older MP3 and TXT files in directory
-        import cleaner
-        cleaner.main()
+        # Old runs and logs are cleaned up in the background while this run starts
+        start_collection()
         
+        if resume:
+            # Continue an interrupted run; finished work is kept, so nothing is cleaned
+            manifest = RunManifest.load(resume)
+            audio_input = manifest.data['input']
+            logging.info(f"Resuming run {manifest.run_id}: chunks {manifest.summary()}")
+        else:
+            # Ask user to input the audio file path or URL
+            audio_input = read_audio_input()
+            
+            manifest = RunManifest.create(audio_input)
+            logging.info(f"Run id: {manifest.run_id} (resume with: python main.py --resume {manifest.run_id})")
         
-        # Get the directory of the Python script
-        script_dir = Path(__file__).parent.resolve()
-        
-        # Ask user to input the audio file path or URL
-        print("Please enter the path of the local MP3 file or the URL of an MP3 file:")
-        
-       
-        
-        audio_input = input().strip().strip('"')  # Remove quotes if present
-        
+        # Everything this run writes goes into its own directory, locked while the run is live
+        run_lock = RunLock(manifest.run_dir).acquire()
+        run_dir = manifest.run_dir
+        manifest.add_artifact(log_file)
         
+        fetched = manifest.step('fetch')
+        if fetched and Path(fetched['audio_path']).exists():
+            new_audio_path = Path(fetched['audio_path'])
+            logging.info(f"Using previously fetched audio: {new_audio_path}")
         
         # Determine if input is a URL or local path
-        if audio_input.startswith(('http://', 'https://')):
+        elif audio_input.startswith(('http://', 'https://')):
             # It's a URL, download the file
-            original_podcast_dir = script_dir / "podcast" / "original-podcast"
+            original_podcast_dir = run_dir / "original"
             original_podcast_dir.mkdir(parents=True, exist_ok=True)
             file_name = os.path.basename(audio_input)
             new_audio_path = original_podcast_dir / file_name
             
             print(f"Downloading {file_name}...")
-            if download_file(audio_input, new_audio_path):
+            if download_file(audio_input, new_audio_path, session=client.requests_session):
                 print(f"Download completed: {new_audio_path}")
             else:
                 print("Failed to download audio file")
+                # Marked failed so workspace cleanup can remove it
+                manifest.finish('failed')
                 return
         else:
-            # It's a local path
-            audio_file = Path(audio_input)
-            if not audio_file.exists():
+            # It's a local path, read in place: chunks are cut from the file mapped into memory
+            new_audio_path = Path(audio_input).resolve()
+            if not new_audio_path.is_file():
                 logging.error(f"File not found: {audio_input}")
+                manifest.finish('failed')
                 return
-            
-            # Copy the file to the original-podcast directory
-            original_podcast_dir = script_dir / "podcast" / "original-podcast"
-            original_podcast_dir.mkdir(parents=True, exist_ok=True)
-            new_audio_path = original_podcast_dir / audio_file.name
-            shutil.copy2(audio_file, new_audio_path)
-            logging.info(f"Copied audio file to: {new_audio_path}")
+            logging.info(f"Using audio file in place: {new_audio_path}")
+        manifest.complete_step('fetch', audio_path=str(new_audio_path))
         
-        # 1. Run splitter.py functionality
-        logging.info("Step 1: Splitting MP3 files")
-        input_dir = str(original_podcast_dir)
-        output_dir = str(script_dir / "podcast" / "splitted-podcast")
-        process_directory(input_dir, output_dir)
-        
-        # 2. Run transcript.py functionality
-        logging.info("Step 2: Generating transcripts")
-        await transcript_main()
-        
-        # 3. Get the latest transcript
-        logging.info("Step 3: Reading latest transcript")
-        transcript_content = get_latest_transcript()
+        # 1-2. Split and transcribe concurrently; each chunk is transcribed as soon as it is cut
+        # and the transcript file is written in order as chunks finish
+        summary_text = None
+        transcribed = manifest.step('transcribe')
+        if transcribed and Path(transcribed['text']).exists():
+            logging.info("Step 1-2: Already transcribed in this run, skipping")
+            transcript_paths = (Path(transcribed['json']), Path(transcribed['text']))
+        else:
+            logging.info("Step 1-2: Splitting and transcribing")
+            with TranscriptCache() as cache:
+                cache.evict()
+                # Every chunk is also indexed for search as it is written
+                store = open_store()
+                writer = TranscriptWriter(run_dir / "transcript", episode=new_audio_path.stem, store=store,
+                                          source=audio_input, run_id=manifest.run_id)
+                # Local summaries start on the first sections while later chunks are still transcribed
+                summary_task = None
+                if SUMMARIZE_LOCALLY:
+                    summary_task = asyncio.create_task(send_to_summary_api(client.session, writer.segments(), cache=cache))
+                try:
+                    transcript_paths = await run_pipeline(
+                        new_audio_path,
+                        run_dir / "splitted",
+                        run_dir / "transcript",
+                        client.session,
+                        cache,
+                        manifest=manifest,
+                        profile_dir=manifest.run_dir / "profile" if profile else None,
+                        writer=writer
+                    )
+                    if summary_task is not None and transcript_paths:
+                        summary_text = await summary_task
+                finally:
+                    if summary_task is not None:
+                        summary_task.cancel()
+                    if store is not None:
+                        store.close()
+                logging.info(f"Transcript cache: {cache.hits} hits, {cache.misses} misses")
         
-        if transcript_content:
-            # Save the full transcript
-            full_transcript_file = script_dir / "transcript" / "transcript" / "full_transcript.txt"
-            with open(full_transcript_file, 'w', encoding='utf-8') as f:
-                f.write(transcript_content)
+        # 3. The full transcript is the file the pipeline wrote; nothing is read back or copied
+        if transcript_paths:
+            full_transcript_file = transcript_paths[1]
             
             # Always summarize (as per your last version)
             summarize = 'yes'
             
-            if summarize == 'yes':
-                # Upload the full transcript to FTP
-                fileurl = upload_file(str(full_transcript_file), FTP_HOST, FTP_USER, FTP_PASSWORD, FTP_DIRECTORY)
+            if summarize == 'yes' and SUMMARIZE_LOCALLY:
+                # Summarize here with the map-reduce summarizer instead of the web backend
+                if summary_text is None:
+                    logging.info("Step 3: Summarizing transcript")
+                    with open(transcript_paths[0], 'r', encoding='utf-8') as f:
+                        transcript = json.load(f)
+                    segments = transcript.get('segments') or segments_from_text(transcript['text'])
+                    summary_text = await send_to_summary_api(client.session, segments)
+                if summary_text:
+                    await save_summary(summary_text, run_dir / "summary.txt")
+                    finish_run(manifest)
+            elif summarize == 'yes':
+                # Upload the full transcript to FTP, unless this run already uploaded it complete
+                uploaded = manifest.step('upload')
+                if uploaded:
+                    fileurl = uploaded['url']
+                else:
+                    # Uploads run in a worker thread so the event loop is never blocked
+                    fileurl = await uploader.upload(str(full_transcript_file))
+                    # A transcript with failed chunks is uploaded as it is; resuming uploads the completed one
+                    if manifest.step('transcribe'):
+                        manifest.complete_step('upload', url=fileurl)
                 
                 # Open the browser with the summary website
                 summary_url = f"{SUMMARY_UPLOADED_TEXT_FILE}{fileurl}"
                 webbrowser.open(summary_url)
                 logging.info(f"Opened summary website: {summary_url}")
+                finish_run(manifest)
             else:
                 # Only show the full transcript in notepad
                 subprocess.Popen(['notepad.exe', str(full_transcript_file)])
                 logging.info(f"Opened full transcript in Notepad: {full_transcript_file}")
+                finish_run(manifest)
         else:
             logging.error("No transcript content found")
 
@@ -202,7 +224,144 @@ async def main():
     except Exception as e:
         logging.error(f"Pipeline error: {str(e)}")
     finally:
+        await client.close()
+        await asyncio.to_thread(uploader.close)
+        await asyncio.to_thread(close_engines)
+        if manifest is not None:
+            METRICS.export(manifest.run_dir)
+        if run_lock is not None:
+            run_lock.release()
+        if metrics_server is not None:
+            metrics_server.shutdown()
         logging.info("=== Podcast Processing Pipeline Completed ===")
 
+async def serve_main(port=None):
+    """Headless entry point: run the job server until interrupted."""
+    from server import JobServer
+    from splitter import setup_logging
+    setup_logging()
+    logging.info("=== Starting Job Server ===")
+    server = JobServer(port=port) if port else JobServer()
+    try:
+        await server.run()
+    finally:
+        logging.info("=== Job Server Stopped ===")
+
+async def batch_main(inputs, profile=False):
+    """Non-interactive entry point: process every episode in inputs."""
+    from batch import run_batch
+    from splitter import setup_logging
+    setup_logging()
+    logging.info("=== Starting Batch Processing ===")
+    try:
+        results = await run_batch(inputs, profile=profile)
+        done = sum(1 for paths in results.values() if paths)
+        logging.info(f"Batch finished: {done} of {len(results)} episodes transcribed")
+    except Exception as e:
+        logging.error(f"Batch error: {str(e)}")
+    finally:
+        logging.info("=== Batch Processing Completed ===")
+
+def dry_run(inputs, batch=False):
+    """
+    Show what a run would do with inputs, without downloading, transcribing or
+    writing anything: each episode, its chunk plan and where its results go.
+    Only the MP3 frame headers of local files are read.
+    """
+    import importlib.util
+    from batch import collect_episodes, is_url
+    from config import TRANSCRIPTION_ENGINE, PREPROCESS_AUDIO, VAD_TRIM
+    from manifest import RUNS_DIR
+    from preprocess import BITRATES_KBPS, resolve_mode
+    from sizing import plan_chunks
+    
+    engine = TRANSCRIPTION_ENGINE
+    if engine == 'local' and importlib.util.find_spec('faster_whisper') is None:
+        engine = "http (faster-whisper is not installed)"
+    preprocess = resolve_mode(PREPROCESS_AUDIO)
+    print(f"Engine: {engine}, preprocessing: {preprocess or 'off'}, VAD trim: {'on' if VAD_TRIM else 'off'}, "
+          f"summary: {'local' if SUMMARIZE_LOCALLY else 'web backend'}")
+    
+    episodes = collect_episodes(inputs)
+    if not episodes:
+        print("No episodes found")
+        return
+    for episode in episodes:
+        output = episode['workdir'] if batch else RUNS_DIR / "<run id>"
+        print(f"\n{episode['source']}\n  output: {output}")
+        if is_url(episode['source']):
+            print("  remote episode: downloaded first, chunk plan not known yet")
+            continue
+        try:
+            plan = plan_chunks(episode['source'], bitrate_kbps=BITRATES_KBPS.get(preprocess))
+        except Exception as e:
+            print(f"  cannot plan chunks: {str(e)}")
+            continue
+        print(f"  {plan['duration_seconds'] / 60:.1f} min at {plan['bitrate_kbps']:.0f} kbps, "
+              f"{plan['chunks']} chunk(s) of at most {plan['target_bytes'] / (1024 * 1024):.2f}MB, "
+              f"estimated {plan['estimated_seconds']:.0f}s to transcribe")
+        if VAD_TRIM:
+            print("  (before skipping non-speech stretches)")
+
+def search_main(query):
+    """Print the transcript segments matching query, across every indexed episode."""
+    from transcriptstore import STORE_PATH, TranscriptStore, print_hits
+    if not STORE_PATH.exists():
+        print("No transcripts have been indexed yet")
+        return
+    with TranscriptStore() as store:
+        print_hits(store.search(query))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Split, transcribe and summarize podcast episodes")
+    parser.add_argument(
+        '--batch', nargs='+', metavar='INPUT',
+        help="process episodes without prompts; each INPUT is an MP3 path, URL, directory or RSS feed file"
+    )
+    parser.add_argument(
+        '--resume', metavar='RUN_ID',
+        help="continue an interrupted run, redoing only missing or failed chunks"
+    )
+    parser.add_argument(
+        '--profile', action='store_true',
+        help="also write cProfile and tracemalloc snapshots of the split stage"
+    )
+    parser.add_argument(
+        '--serve', action='store_true',
+        help="run the headless job server: queue episodes over a local HTTP API or an inbox directory"
+    )
+    parser.add_argument(
+        '--port', type=int,
+        help="port of the job server (default: SERVER_PORT in config.py)"
+    )
+    parser.add_argument(
+        '--dry-run', action='store_true',
+        help="show the episodes, chunk plans and output locations without processing anything"
+    )
+    parser.add_argument(
+        '--search', metavar='QUERY',
+        help="search the transcripts of all processed episodes and print episodes and timestamps"
+    )
+    parser.add_argument('--version', action='version', version=f"%(prog)s {VERSION}")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    if args.search is not None:
+        search_main(args.search)
+    elif args.dry_run:
+        if args.batch:
+            dry_run(args.batch, batch=True)
+        else:
+            dry_run([read_audio_input()])
+    else:
+        import asyncio
+        if args.serve:
+            try:
+                asyncio.run(serve_main(port=args.port))
+            except KeyboardInterrupt:
+                pass
+        elif args.batch:
+            asyncio.run(batch_main(args.batch, profile=args.profile))
+        else:
+            asyncio.run(main(resume=args.resume, profile=args.profile))
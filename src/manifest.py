@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+
+# Every run gets a directory here for its manifest, per-chunk results and artifacts
+RUNS_DIR = Path(__file__).parent.resolve() / "runs"
+
+
+def atomic_write_json(path, data):
+    """Write JSON to path so readers only ever see the old or the new complete file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def chunk_checksum(chunk):
+    """SHA-256 of a chunk's audio, from memory or from its file; blocking, keep it off the event loop."""
+    digest = hashlib.sha256()
+    if chunk.get('data') is not None:
+        digest.update(chunk['data'])
+    else:
+        with open(chunk['path'], 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class RunManifest:
+    """
+    Checkpoint of one pipeline run: the episode, every chunk with its state
+    (split / transcribed / failed), output paths and checksums, plus the
+    outcome of each pipeline step. Saved atomically after every change.
+    """
+
+    def __init__(self, path, data):
+        self.path = Path(path)
+        self.data = data
+        self.lock = threading.Lock()
+
+    @property
+    def run_id(self):
+        return self.data['run_id']
+
+    @property
+    def run_dir(self):
+        return self.path.parent
+
+    @classmethod
+    def create(cls, source, runs_dir=RUNS_DIR):
+        name = os.path.splitext(os.path.basename(source.rstrip('/').split('?')[0]))[0]
+        slug = re.sub(r'[^A-Za-z0-9_-]+', '-', name).strip('-')[:40] or 'episode'
+        run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}-{slug}"
+        data = {
+            'run_id': run_id,
+            'episode': slug,
+            'input': source,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'steps': {},
+            'chunks': {},
+        }
+        manifest = cls(Path(runs_dir) / run_id / "manifest.json", data)
+        manifest.save()
+        return manifest
+
+    @classmethod
+    def load(cls, run_id, runs_dir=RUNS_DIR):
+        path = Path(runs_dir) / run_id / "manifest.json"
+        if not path.exists():
+            raise FileNotFoundError(f"No run manifest for run id {run_id}")
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(path, json.load(f))
+
+    def save(self):
+        with self.lock:
+            self.data['updated'] = datetime.now().isoformat(timespec='seconds')
+            atomic_write_json(self.path, self.data)
+
+    def step(self, name):
+        """Return the recorded outcome of a pipeline step, or None if it has not completed."""
+        return self.data['steps'].get(name)
+
+    def complete_step(self, name, **fields):
+        with self.lock:
+            self.data['steps'][name] = {'completed': datetime.now().isoformat(timespec='seconds'), **fields}
+        self.save()
+
+    def add_artifact(self, path):
+        """Attach a file outside the run directory (such as its log) so cleanup removes it with the run."""
+        with self.lock:
+            artifacts = self.data.setdefault('artifacts', [])
+            if str(path) not in artifacts:
+                artifacts.append(str(path))
+        self.save()
+
+    def finish(self, state='done'):
+        """Mark the run as finished; it can no longer be resumed and may be cleaned up."""
+        with self.lock:
+            self.data['finished'] = {'state': state, 'at': datetime.now().isoformat(timespec='seconds')}
+        self.save()
+
+    def record_chunk(self, chunk):
+        """
+        Record a freshly split chunk. A chunk already transcribed with the same
+        checksum keeps its state, so resumed runs skip it. Hashes the chunk,
+        so it is called from the splitter thread.
+        """
+        checksum = chunk_checksum(chunk)
+        key = str(chunk['index'])
+        with self.lock:
+            entry = self.data['chunks'].get(key)
+            if entry is None or entry.get('checksum') != checksum:
+                entry = {'state': 'split', 'checksum': checksum}
+                self.data['chunks'][key] = entry
+            entry.update({
+                'name': chunk.get('name'),
+                'start_ms': chunk.get('start_ms'),
+                'duration_ms': chunk.get('duration_ms'),
+                'size': chunk.get('size'),
+                'offsets': chunk.get('offsets'),
+            })
+        self.save()
+        return entry
+
+    def completed_result(self, chunk):
+        """Return the saved transcription result of a chunk that was already transcribed, or None."""
+        entry = self.data['chunks'].get(str(chunk['index']))
+        if not entry or entry['state'] != 'transcribed':
+            return None
+        output = Path(entry['output'])
+        if not output.exists():
+            return None
+        content = output.read_bytes()
+        if hashlib.sha256(content).hexdigest() != entry.get('output_checksum'):
+            return None
+        return json.loads(content.decode('utf-8'))
+
+    def mark_transcribed(self, chunk, result):
+        output = self.run_dir / "chunks" / f"{chunk['index']}.json"
+        atomic_write_json(output, result)
+        with self.lock:
+            entry = self.data['chunks'][str(chunk['index'])]
+            entry.update({
+                'state': 'transcribed',
+                'output': str(output),
+                'output_checksum': hashlib.sha256(output.read_bytes()).hexdigest(),
+                'error': None,
+            })
+        self.save()
+
+    def mark_failed(self, chunk, error):
+        with self.lock:
+            entry = self.data['chunks'][str(chunk['index'])]
+            entry.update({'state': 'failed', 'error': error})
+        self.save()
+
+    def summary(self):
+        states = {}
+        for entry in self.data['chunks'].values():
+            states[entry['state']] = states.get(entry['state'], 0) + 1
+        return states
@@ -0,0 +1,212 @@
+import cProfile
+import json
+import logging
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from config import METRICS_MAX_SPANS
+
+# Prefix of every exported Prometheus metric
+PROMETHEUS_PREFIX = 'podcast'
+
+
+class Metrics:
+    """
+    Spans (timed pipeline steps, per chunk where it applies) and counters of
+    one process. Thread-safe, so the splitter thread and the event loop can
+    both record into it. Per-step totals are kept as spans are recorded; only
+    the most recent max_spans spans themselves are kept.
+    """
+
+    def __init__(self, max_spans=METRICS_MAX_SPANS):
+        self.lock = threading.Lock()
+        self.max_spans = max_spans
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.origin = time.perf_counter()
+            self.started = time.time()
+            self.spans = deque(maxlen=self.max_spans)
+            self.totals = {}
+            self.counters = {}
+
+    def add_total(self, name, count, seconds, max_seconds):
+        entry = self.totals.setdefault(name, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+        entry['count'] += count
+        entry['seconds'] += seconds
+        entry['max_seconds'] = max(entry['max_seconds'], max_seconds)
+
+    def record_span(self, name, start, end, **labels):
+        """Record a finished span; start and end are time.perf_counter() values."""
+        with self.lock:
+            self.spans.append({'name': name, 'start': start - self.origin, 'duration': end - start, **labels})
+            self.add_total(name, 1, end - start, end - start)
+
+    @contextmanager
+    def span(self, name, **labels):
+        """Time the block as a span. Yields the labels dict so the block can add to it."""
+        start = time.perf_counter()
+        try:
+            yield labels
+        except BaseException:
+            labels.setdefault('status', 'error')
+            raise
+        finally:
+            self.record_span(name, start, time.perf_counter(), **labels)
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def snapshot(self):
+        """Picklable copy of the recorded metrics, for handing back from a worker process."""
+        with self.lock:
+            return {'origin': self.origin, 'spans': list(self.spans), 'counters': dict(self.counters),
+                    'totals': {name: dict(entry) for name, entry in self.totals.items()}}
+
+    def merge(self, snapshot, **labels):
+        """Add the metrics of a snapshot (e.g. from a worker process), with extra labels on its spans."""
+        with self.lock:
+            # perf_counter is a system-wide monotonic clock, so offsets carry across processes
+            shift = snapshot['origin'] - self.origin
+            for span in snapshot['spans']:
+                self.spans.append({**span, 'start': span['start'] + shift, **labels})
+            for name, entry in snapshot['totals'].items():
+                self.add_total(name, entry['count'], entry['seconds'], entry['max_seconds'])
+            for key, value in snapshot['counters'].items():
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def summary(self):
+        """Count, total and maximum duration of the spans of each name, including dropped ones."""
+        with self.lock:
+            return {name: dict(entry) for name, entry in self.totals.items()}
+
+    def prometheus(self):
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {PROMETHEUS_PREFIX}_span_seconds Time spent in each pipeline step",
+            f"# TYPE {PROMETHEUS_PREFIX}_span_seconds summary",
+        ]
+        summary = self.summary()
+        for name, entry in summary.items():
+            lines.append(f'{PROMETHEUS_PREFIX}_span_seconds_sum{{span="{name}"}} {entry["seconds"]:.6f}')
+            lines.append(f'{PROMETHEUS_PREFIX}_span_seconds_count{{span="{name}"}} {entry["count"]}')
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_span_seconds_max gauge")
+        for name, entry in summary.items():
+            lines.append(f'{PROMETHEUS_PREFIX}_span_seconds_max{{span="{name}"}} {entry["max_seconds"]:.6f}')
+
+        with self.lock:
+            counters = sorted(self.counters.items())
+        declared = set()
+        for (name, labels), value in counters:
+            metric = f"{PROMETHEUS_PREFIX}_{name}_total"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            label_text = ",".join(f'{key}="{label}"' for key, label in labels)
+            lines.append(f"{metric}{{{label_text}}} {value}" if label_text else f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_jsonl(self, path):
+        """Write every span and counter as one JSON object per line."""
+        with self.lock:
+            spans = list(self.spans)
+            counters = sorted(self.counters.items())
+        with open(path, 'w', encoding='utf-8') as f:
+            for span in spans:
+                f.write(json.dumps({'type': 'span', **span}, ensure_ascii=False) + "\n")
+            for (name, labels), value in counters:
+                f.write(json.dumps({'type': 'counter', 'name': name, 'value': value, **dict(labels)}) + "\n")
+
+    def export(self, directory, stem='metrics'):
+        """
+        Write <stem>.jsonl and <stem>.prom to directory and log the time spent
+        per step. Returns (jsonl path, prom path).
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        jsonl_path = directory / f"{stem}.jsonl"
+        prom_path = directory / f"{stem}.prom"
+        self.write_jsonl(jsonl_path)
+        prom_path.write_text(self.prometheus(), encoding='utf-8')
+
+        for name, entry in sorted(self.summary().items(), key=lambda item: -item[1]['seconds']):
+            logging.info(f"Metrics {name}: {entry['count']} span(s), {entry['seconds']:.2f}s total, "
+                         f"{entry['max_seconds']:.2f}s max")
+        logging.info(f"Metrics written to {jsonl_path}")
+        return jsonl_path, prom_path
+
+
+# Process-wide registry every stage records into
+METRICS = Metrics()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.metrics.prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(port, metrics=METRICS):
+    """Serve metrics at http://localhost:<port>/metrics in a background thread; returns the server."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+    server.daemon_threads = True
+    server.metrics = metrics
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f"Serving metrics at http://127.0.0.1:{server.server_address[1]}/metrics")
+    return server
+
+
+@contextmanager
+def profiled(name, directory):
+    """
+    Profile the calling thread with cProfile and trace allocations with
+    tracemalloc while the block runs, writing <name>.prof and
+    <name>.tracemalloc to directory. Does nothing without a directory.
+    """
+    if directory is None:
+        yield
+        return
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start(25)
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        if not was_tracing:
+            tracemalloc.stop()
+
+        profile.dump_stats(directory / f"{name}.prof")
+        snapshot.dump(str(directory / f"{name}.tracemalloc"))
+        logging.info(f"Profile of {name}: peak traced memory {peak / (1024 * 1024):.1f}MB, "
+                     f"written to {directory / name}.prof / .tracemalloc")
+        for stat in snapshot.statistics('lineno')[:5]:
+            logging.info(f"  {stat.size / 1024:.0f}KB in {stat.count} block(s) at {stat.traceback[0]}")
+        stats = pstats.Stats(profile).sort_stats('cumulative')
+        for function in stats.fcn_list[:8]:
+            own, cumulative = stats.stats[function][2:4]
+            logging.info(f"  {cumulative:.2f}s cumulative ({own:.2f}s own) in {pstats.func_std_string(function)}")
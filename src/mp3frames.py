@@ -0,0 +1,167 @@
+import logging
+from collections import namedtuple
+
+# Read size used when streaming frames from a file object
+BLOCK_SIZE = 64 * 1024
+
+# Bitrates in kbps, indexed by the 4-bit bitrate field of the frame header
+BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+# Sample rates in Hz, indexed by the 2-bit sample rate field
+SAMPLE_RATES = {
+    1: [44100, 48000, 32000],    # MPEG-1
+    2: [22050, 24000, 16000],    # MPEG-2
+    25: [11025, 12000, 8000],    # MPEG-2.5
+}
+
+FrameHeader = namedtuple(
+    'FrameHeader',
+    ['version', 'layer', 'bitrate', 'sample_rate', 'samples', 'length', 'channels']
+)
+
+
+def parse_header(data, offset=0):
+    """
+    Parse the 4-byte MPEG audio frame header at offset.
+    Returns a FrameHeader, or None if the bytes are not a valid header.
+    """
+    if len(data) - offset < 4:
+        return None
+    b0, b1, b2, b3 = data[offset], data[offset + 1], data[offset + 2], data[offset + 3]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version_bits = (b1 >> 3) & 0x03
+    layer_bits = (b1 >> 1) & 0x03
+    bitrate_index = (b2 >> 4) & 0x0F
+    sample_rate_index = (b2 >> 2) & 0x03
+    padding = (b2 >> 1) & 0x01
+    channel_mode = (b3 >> 6) & 0x03
+
+    # Reserved values and free-format streams cannot be split by header alone
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    version = {0: 25, 2: 2, 3: 1}[version_bits]
+    layer = 4 - layer_bits
+    bitrate = BITRATES[(1 if version == 1 else 2, layer)][bitrate_index]
+    sample_rate = SAMPLE_RATES[version][sample_rate_index]
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate * 1000 // sample_rate + padding) * 4
+    elif layer == 2 or version == 1:
+        samples = 1152
+        length = 144 * bitrate * 1000 // sample_rate + padding
+    else:
+        samples = 576
+        length = 72 * bitrate * 1000 // sample_rate + padding
+
+    channels = 1 if channel_mode == 3 else 2
+    return FrameHeader(version, layer, bitrate, sample_rate, samples, length, channels)
+
+
+def id3v2_size(data):
+    """Return the total size of a leading ID3v2 tag, or 0 if there is none."""
+    if len(data) < 10 or data[:3] != b'ID3':
+        return 0
+    size = 0
+    for b in data[6:10]:
+        size = (size << 7) | (b & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def is_vbr_info_frame(frame, header):
+    """Check whether a frame is a Xing/Info/VBRI header rather than audio."""
+    if header.layer != 3:
+        return False
+    if header.version == 1:
+        side_info = 17 if header.channels == 1 else 32
+    else:
+        side_info = 9 if header.channels == 1 else 17
+    tag = bytes(frame[4 + side_info:8 + side_info])
+    return tag in (b'Xing', b'Info') or bytes(frame[36:40]) == b'VBRI'
+
+
+def iter_frames(stream, block_size=BLOCK_SIZE):
+    """
+    Yield (header, frame_bytes) for every audio frame in a binary stream.
+    Only a small read buffer is kept in memory, regardless of stream length.
+    Leading ID3v2 tags, the Xing/Info frame and trailing junk are skipped.
+    """
+    for header, frame, _ in iter_frame_offsets(stream, block_size):
+        yield header, frame
+
+
+def iter_frame_offsets(stream, block_size=BLOCK_SIZE):
+    """
+    Like iter_frames, but yield (header, frame_bytes, offset) with the
+    frame's byte offset in the stream, so callers can refer to the audio
+    in the file instead of keeping the frames.
+    """
+    buf = stream.read(block_size)
+    pos = 0
+    # Stream offset of buf[0]
+    base = 0
+    eof = not buf
+
+    def fill(needed):
+        nonlocal buf, pos, base, eof
+        while len(buf) - pos < needed and not eof:
+            data = stream.read(max(block_size, needed))
+            if not data:
+                eof = True
+                break
+            buf = buf[pos:] + data
+            base += pos
+            pos = 0
+        return len(buf) - pos >= needed
+
+    # Skip an ID3v2 tag at the start of the stream
+    if fill(10):
+        skip = id3v2_size(buf[pos:pos + 10])
+        while skip > 0 and fill(1):
+            step = min(skip, len(buf) - pos)
+            pos += step
+            skip -= step
+
+    first = True
+    skipped = 0
+    while fill(4):
+        header = parse_header(buf, pos)
+        if header is None:
+            # Lost sync: step forward one byte and look for the next header
+            pos += 1
+            skipped += 1
+            continue
+
+        if not fill(header.length):
+            break
+
+        # After a resync, confirm the next header as well to avoid false syncs
+        if skipped and fill(header.length + 4) and parse_header(buf, pos + header.length) is None:
+            pos += 1
+            skipped += 1
+            continue
+
+        offset = base + pos
+        frame = buf[pos:pos + header.length]
+        pos += header.length
+        if skipped:
+            logging.debug(f"Skipped {skipped} bytes of non-audio data")
+            skipped = 0
+
+        if first:
+            first = False
+            if is_vbr_info_frame(frame, header):
+                continue
+
+        yield header, frame, offset
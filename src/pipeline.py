@@ -0,0 +1,243 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+from pathlib import Path
+from config import TARGET_SIZE_MB, MAX_CONCURRENT_REQUESTS, PIPELINE_QUEUE_SIZE
+from splitter import iter_chunks
+from scheduler import TranscriptionScheduler
+from transcript import schedule_chunk
+from assembly import TranscriptWriter
+from metrics import profiled
+
+# How often the splitter thread, while waiting for room in the queue, checks whether the run has failed
+STOP_POLL_SECONDS = 0.2
+
+
+class StageTimer:
+    """Record when each pipeline stage was first and last active, relative to the run start."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.stages = {}
+
+    def mark(self, stage, start, end):
+        entry = self.stages.setdefault(stage, {'first_start': start, 'last_end': end, 'busy': 0.0, 'items': 0})
+        entry['first_start'] = min(entry['first_start'], start)
+        entry['last_end'] = max(entry['last_end'], end)
+        entry['busy'] += end - start
+        entry['items'] += 1
+
+    def now(self):
+        return time.perf_counter() - self.origin
+
+    def report(self):
+        """Log each stage's active window and how much of it overlapped with splitting."""
+        wall = self.now()
+        split = self.stages.get('split')
+        for stage, entry in self.stages.items():
+            line = (f"Stage {stage}: {entry['first_start']:.2f}s -> {entry['last_end']:.2f}s, "
+                    f"busy {entry['busy']:.2f}s over {entry['items']} item(s)")
+            if split and stage != 'split':
+                overlap = max(0.0, min(split['last_end'], entry['last_end']) - max(split['first_start'], entry['first_start']))
+                line += f", overlaps split by {overlap:.2f}s"
+            logging.info(line)
+        logging.info(f"Pipeline wall time: {wall:.2f}s")
+        return {'wall': wall, 'stages': self.stages}
+
+
+def drain(queue):
+    """Drop everything waiting in the queue, so that put_nowait cannot block."""
+    while not queue.empty():
+        queue.get_nowait()
+
+
+async def produce_chunks(audio_path, queue, timer, target_size_mb, manifest=None, profile_dir=None, stop=None):
+    """
+    Run the splitter in a worker thread and queue each chunk as soon as it is cut.
+    With profile_dir, the splitter thread is profiled with cProfile and tracemalloc.
+    Setting stop (a threading.Event) ends splitting early, for when nothing
+    takes chunks off the queue any more.
+    """
+    loop = asyncio.get_running_loop()
+    stop = stop or threading.Event()
+
+    def split():
+        with profiled('split', profile_dir):
+            started = timer.now()
+            for chunk in iter_chunks(audio_path, target_size_mb):
+                if stop.is_set():
+                    return
+                if manifest is not None:
+                    manifest.record_chunk(chunk)
+                timer.mark('split', started, timer.now())
+                # Blocks the splitter thread while the queue is full, so memory stays bounded
+                queued = asyncio.run_coroutine_threadsafe(queue.put(chunk), loop)
+                while True:
+                    try:
+                        queued.result(timeout=STOP_POLL_SECONDS)
+                        break
+                    except concurrent.futures.TimeoutError:
+                        if stop.is_set():
+                            queued.cancel()
+                            return
+                started = timer.now()
+
+    try:
+        await loop.run_in_executor(None, split)
+    finally:
+        if stop.is_set():
+            drain(queue)
+            queue.put_nowait(None)
+        else:
+            await queue.put(None)
+
+
+async def transcribe_chunks(queue, results, scheduler, session, splitted_dir, cache, timer, manifest=None, episode=None):
+    """
+    Take chunks off the queue and transcribe them through the shared scheduler.
+    episode keeps the scheduler keys of concurrent episodes apart.
+    """
+    while True:
+        chunk = await queue.get()
+        if chunk is None:
+            # Let the other workers see the end of the stream too
+            await queue.put(None)
+            return
+
+        # Chunks finished by an earlier attempt of this run are not sent again
+        # Checkpoint files are read, hashed and written in worker threads, off the event loop
+        saved = await asyncio.to_thread(manifest.completed_result, chunk) if manifest is not None else None
+        if saved is not None:
+            logging.info(f"Chunk {chunk['index']} already transcribed in run {manifest.run_id}, skipping")
+            chunk['data'] = None
+            await results.put((chunk, {'state': 'done', 'result': (chunk['name'], saved), 'error': None}))
+            continue
+
+        started = timer.now()
+        entry = await schedule_chunk(scheduler, session, chunk, splitted_dir, cache, key=lambda c: (episode, c['index']))
+        timer.mark('transcribe', started, timer.now())
+        if manifest is not None:
+            if entry['state'] == 'done' and entry['result'][1]:
+                await asyncio.to_thread(manifest.mark_transcribed, chunk, entry['result'][1])
+            else:
+                await asyncio.to_thread(manifest.mark_failed, chunk, entry['error'] or "empty transcript")
+        # Drop the audio as soon as it has been sent
+        chunk['data'] = None
+        await results.put((chunk, entry))
+
+
+async def assemble_transcript(results, writer, timer):
+    """
+    Hand transcription results to the writer as they arrive, which appends
+    them to the transcript in chunk order; failed chunks are kept as gaps.
+    Returns the indexes of the failed chunks and the number of chunks.
+    """
+    failed = []
+    count = 0
+    while True:
+        item = await results.get()
+        if item is None:
+            break
+        started = timer.now()
+        chunk, entry = item
+        count += 1
+        if entry['state'] == 'done' and entry['result'][1]:
+            writer.add(chunk, entry['result'][1])
+        else:
+            logging.error(f"Missing transcript for chunk {chunk['index']}: {entry['error']}")
+            failed.append(chunk['index'])
+            writer.add(chunk, None)
+        timer.mark('assemble', started, timer.now())
+    return sorted(failed), count
+
+
+async def end_results(transcribers, results):
+    """Tell the assembler that no more results are coming once every transcriber has finished."""
+    await asyncio.wait(transcribers)
+    await results.put(None)
+
+
+def first_error(tasks):
+    """The exception raised by the first of the finished tasks that failed, or None."""
+    for task in tasks:
+        if task.done() and not task.cancelled() and task.exception() is not None:
+            return task.exception()
+    return None
+
+
+async def run_pipeline(audio_path, splitted_dir, transcript_dir, session, cache=None,
+                       target_size_mb=TARGET_SIZE_MB, queue_size=PIPELINE_QUEUE_SIZE,
+                       workers=MAX_CONCURRENT_REQUESTS, manifest=None, profile_dir=None, scheduler=None, writer=None):
+    """
+    Split, transcribe and assemble one episode concurrently. Chunks flow through
+    bounded queues, so transcription starts with the first chunk and memory stays
+    flat. With a run manifest, every chunk is checkpointed and chunks already
+    transcribed by an earlier attempt are reused. profile_dir enables split
+    stage profiling. A scheduler shared between concurrent episodes keeps their
+    requests within one set of limits. The transcript is written in order as
+    chunks finish; pass a TranscriptWriter to read its segments() while the
+    pipeline runs. Returns the (json, text) paths of the transcript, or None
+    if nothing was transcribed. If a transcriber or the assembler fails, the
+    other stages are stopped and its error is raised.
+    """
+    timer = StageTimer()
+    splitted_dir.mkdir(parents=True, exist_ok=True)
+    transcript_dir.mkdir(parents=True, exist_ok=True)
+
+    chunks = asyncio.Queue(maxsize=queue_size)
+    results = asyncio.Queue(maxsize=queue_size)
+    scheduler = scheduler or TranscriptionScheduler()
+    episode = manifest.run_id if manifest is not None else str(audio_path)
+    writer = writer or TranscriptWriter(transcript_dir, episode=Path(audio_path).stem)
+    stop = threading.Event()
+
+    producer = asyncio.create_task(produce_chunks(audio_path, chunks, timer, target_size_mb, manifest, profile_dir, stop))
+    transcribers = [
+        asyncio.create_task(transcribe_chunks(chunks, results, scheduler, session, splitted_dir, cache, timer,
+                                              manifest, episode))
+        for _ in range(workers)
+    ]
+    consumers = transcribers + [
+        asyncio.create_task(end_results(transcribers, results)),
+        asyncio.create_task(assemble_transcript(results, writer, timer)),
+    ]
+    try:
+        await asyncio.wait(consumers, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        # After a failure (or if the run is cancelled) nothing drains the queues any more:
+        # stop the splitter rather than leave it blocked on a full queue
+        if not all(task.done() for task in consumers) or first_error(consumers) is not None:
+            stop.set()
+            for task in consumers:
+                task.cancel()
+        await asyncio.gather(producer, *consumers, return_exceptions=True)
+        # A long-lived shared scheduler must not keep every finished episode's results
+        for key in [key for key in scheduler.results if key[0] == episode]:
+            del scheduler.results[key]
+        if stop.is_set():
+            writer.discard()
+
+    error = first_error(consumers)
+    if error is not None:
+        raise error
+    failed, count = consumers[-1].result()
+    # Even if splitting failed part way, what was transcribed is kept
+    started = timer.now()
+    paths = writer.close() if len(failed) < count else writer.discard()
+    timer.mark('assemble', started, timer.now())
+    # Raises the splitter's error, if any, now that the transcript is written
+    await producer
+
+    if failed:
+        logging.warning(f"{len(failed)} chunk(s) could not be transcribed: {failed}")
+    if paths is None:
+        timer.report()
+        logging.warning("No successful transcriptions to combine")
+        return None
+
+    if manifest is not None and not failed:
+        manifest.complete_step('transcribe', json=str(paths[0]), text=str(paths[1]))
+    timer.report()
+    return paths
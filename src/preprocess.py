@@ -0,0 +1,126 @@
+import csv
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from config import (
+    PREPROCESS_AUDIO, PREPROCESS_SAMPLE_RATE, PREPROCESS_MP3_BITRATE_KBPS, PREPROCESS_OPUS_BITRATE_KBPS
+)
+
+# Encoder arguments of each preprocessing mode; every mode downmixes to mono and resamples
+ENCODERS = {
+    'mp3': ['-codec:a', 'libmp3lame', '-b:a', f"{PREPROCESS_MP3_BITRATE_KBPS}k", '-f', 'mp3'],
+    'opus': ['-codec:a', 'libopus', '-b:a', f"{PREPROCESS_OPUS_BITRATE_KBPS}k", '-application', 'voip'],
+}
+
+# Encoded bitrate of each mode, used to size the chunks before any audio is encoded
+BITRATES_KBPS = {
+    'mp3': PREPROCESS_MP3_BITRATE_KBPS,
+    'opus': PREPROCESS_OPUS_BITRATE_KBPS,
+}
+
+
+def resolve_mode(mode=PREPROCESS_AUDIO):
+    """Return the preprocessing mode to use, or None if it is off or ffmpeg is missing."""
+    if not mode:
+        return None
+    if mode not in ENCODERS:
+        raise ValueError(f"Unknown preprocessing mode: {mode} (expected one of {', '.join(ENCODERS)})")
+    if shutil.which('ffmpeg') is None:
+        logging.warning(f"ffmpeg not found, uploading the original audio instead of {mode} preprocessing")
+        return None
+    return mode
+
+
+def encoder_command(file_path, mode, skips=()):
+    """ffmpeg command encoding file_path in a preprocessing mode, leaving out skips ((start_ms, end_ms) stretches)."""
+    command = ['ffmpeg', '-v', 'error', '-nostdin', '-i', str(file_path), '-vn', '-map_metadata', '-1']
+    if skips:
+        skipped = "+".join(f"between(t,{start / 1000:.3f},{end / 1000:.3f})" for start, end in skips)
+        # Timestamps are rewritten so the kept audio plays back to back
+        command += ['-af', f"aselect='not({skipped})',asetpts=N/SR/TB"]
+    return command + ['-ac', '1', '-ar', str(PREPROCESS_SAMPLE_RATE), *ENCODERS[mode]]
+
+
+class EncodedStream:
+    """
+    Context manager that runs ffmpeg to re-encode a file as low-bitrate mono
+    MP3 and exposes the encoded bytes as a readable stream. Decoded PCM only
+    ever exists inside ffmpeg's own buffers.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.process = None
+        self.stderr = None
+
+    def __enter__(self):
+        # stderr goes to a temp file so a chatty encoder can never block on a full pipe
+        self.stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            encoder_command(self.file_path, 'mp3') + ['pipe:1'],
+            stdout=subprocess.PIPE, stderr=self.stderr
+        )
+        return self.process.stdout
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.process.kill()
+        self.process.stdout.close()
+        returncode = self.process.wait()
+        self.stderr.seek(0)
+        message = self.stderr.read().decode(errors='replace').strip()
+        self.stderr.close()
+        if exc_type is None and returncode != 0:
+            raise RuntimeError(f"ffmpeg failed to encode {self.file_path}: {message}")
+        return False
+
+
+def iter_opus_segments(file_path, cut_points, output_dir=None, skips=()):
+    """
+    Encode a file to mono Ogg Opus with ffmpeg's segment muxer, cutting at
+    cut_points (ms). Yields (index, path, start_ms, end_ms) as soon as each
+    segment file is finished. Without output_dir, segments go to a temporary
+    directory that is removed once the caller has read them. With skips, the
+    audio in those stretches is left out and cut points and segment times
+    are in the shortened audio.
+    """
+    file_name = os.path.splitext(os.path.basename(file_path))[0]
+    work_dir = output_dir or tempfile.mkdtemp(prefix='opus-')
+    command = encoder_command(file_path, 'opus', skips) + [
+        '-f', 'segment', '-segment_format', 'ogg', '-reset_timestamps', '1', '-segment_start_number', '1',
+        # The segment list is written to stdout one line per finished segment
+        '-segment_list', 'pipe:1', '-segment_list_type', 'csv',
+    ]
+    if cut_points:
+        command += ['-segment_times', ",".join(f"{cut / 1000:.3f}" for cut in cut_points)]
+    else:
+        # One segment for the whole file
+        command += ['-segment_time', str(10 ** 7)]
+    # The muxer expands % sequences in the whole path, so a literal % is doubled
+    command.append(os.path.join(work_dir, file_name).replace('%', '%%') + "-%d.ogg")
+
+    stderr = tempfile.TemporaryFile()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr, text=True)
+    finished = False
+    try:
+        for index, row in enumerate(csv.reader(process.stdout), start=1):
+            name, start, end = row[0], float(row[1]), float(row[2])
+            path = os.path.join(work_dir, name)
+            yield index, path, start * 1000, end * 1000
+            if output_dir is None:
+                os.remove(path)
+        finished = True
+    finally:
+        if not finished:
+            process.kill()
+        process.stdout.close()
+        returncode = process.wait()
+        stderr.seek(0)
+        message = stderr.read().decode(errors='replace').strip()
+        stderr.close()
+        if output_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        if finished and returncode != 0:
+            raise RuntimeError(f"ffmpeg failed to encode {file_path}: {message}")
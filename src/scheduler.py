@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from config import MAX_CONCURRENT_REQUESTS, REQUESTS_PER_SECOND, MAX_RETRIES, RETRY_BACKOFF_SECONDS, RETRY_BACKOFF_MAX_SECONDS
+from metrics import METRICS
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (seconds or HTTP date) into seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Token bucket that paces request starts to `rate` per second with bursts of `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class TranscriptionScheduler:
+    """
+    Run one async job per chunk with a cap on in-flight requests, token-bucket
+    pacing and retries. Jobs signal a retryable failure by raising an exception
+    with a true `retryable` attribute and an optional `retry_after` in seconds.
+    """
+
+    def __init__(self, max_in_flight=MAX_CONCURRENT_REQUESTS, rate=REQUESTS_PER_SECOND,
+                 max_retries=MAX_RETRIES, backoff=RETRY_BACKOFF_SECONDS, backoff_max=RETRY_BACKOFF_MAX_SECONDS):
+        self.max_in_flight = max_in_flight
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.bucket = TokenBucket(rate)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.resume_at = 0.0
+        self.results = {}
+        self.stats = {'requests': 0, 'retries': 0, 'rate_limited': 0}
+
+    def backoff_delay(self, attempt):
+        """Exponential backoff with full jitter for the given attempt number."""
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** (attempt - 1)))
+
+    async def wait_for_slot(self):
+        # A Retry-After from any request pauses every new request until it expires
+        delay = self.resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self.bucket.acquire()
+
+    async def submit(self, item, job, key=None):
+        """
+        Run job(item) until it succeeds or fails for good, sharing the
+        concurrency cap with every other submitted item. Returns its result entry.
+        """
+        key = item if key is None else key(item)
+        self.results[key] = {'state': 'pending', 'attempts': 0, 'result': None, 'error': None}
+        await self.run_one(key, item, job)
+        return self.results[key]
+
+    def complete(self, item, result, key=None):
+        """
+        Record item as done with result without running a job, for items
+        answered without a request (such as cache hits). Returns its result entry.
+        """
+        key = item if key is None else key(item)
+        self.results[key] = {'state': 'done', 'attempts': 0, 'result': result, 'error': None}
+        return self.results[key]
+
+    async def run_one(self, key, item, job):
+        entry = self.results[key]
+        while True:
+            entry['attempts'] += 1
+            async with self.semaphore:
+                await self.wait_for_slot()
+                self.stats['requests'] += 1
+                METRICS.count('requests')
+                try:
+                    entry['result'] = await job(item)
+                    entry['state'] = 'done'
+                    return
+                except Exception as e:
+                    entry['error'] = str(e)
+                    retryable = getattr(e, 'retryable', False)
+                    retry_after = getattr(e, 'retry_after', None)
+
+            if not retryable or entry['attempts'] > self.max_retries:
+                entry['state'] = 'failed'
+                METRICS.count('failures')
+                logging.error(f"Giving up on {key} after {entry['attempts']} attempt(s): {entry['error']}")
+                return
+
+            delay = self.backoff_delay(entry['attempts'])
+            if retry_after is not None:
+                self.stats['rate_limited'] += 1
+                METRICS.count('rate_limited')
+                delay = max(delay, retry_after)
+                self.resume_at = max(self.resume_at, time.monotonic() + retry_after)
+            self.stats['retries'] += 1
+            METRICS.count('retries')
+            logging.warning(f"Retrying {key} in {delay:.1f}s (attempt {entry['attempts']}): {entry['error']}")
+            await asyncio.sleep(delay)
+
+    async def run(self, items, job, key=None):
+        """
+        Run job(item) for every item and wait until each one has either
+        succeeded or failed for good. Results are tracked under key(item),
+        the item itself by default. Returns {key: result entry}.
+        """
+        await asyncio.gather(*(self.submit(item, job, key) for item in items))
+        return self.report()
+
+    def report(self):
+        """Log how the items run so far went; returns {key: result entry}."""
+        failed = [k for k, entry in self.results.items() if entry['state'] == 'failed']
+        logging.info(f"Scheduler finished: {len(self.results) - len(failed)} succeeded, {len(failed)} failed, "
+                     f"{self.stats['requests']} requests, {self.stats['retries']} retries")
+        return self.results
@@ -0,0 +1,465 @@
+import asyncio
+import json
+import logging
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+from config import (
+    SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SERVER_INBOX_DIR, SERVER_POLL_SECONDS,
+    WORKSPACE_GC_INTERVAL_SECONDS, SEARCH_LIMIT, SUMMARIZE_LOCALLY, FTP_HOST, FTP_USER, FTP_PASSWORD, FTP_DIRECTORY, SUMMARY_UPLOADED_TEXT_FILE
+)
+from assembly import TranscriptWriter
+from cache import TranscriptCache
+from downloader import download_file
+from ftphandler import FtpUploader
+from httpclient import HttpClient
+from manifest import RUNS_DIR, RunManifest
+from metrics import METRICS
+from pipeline import run_pipeline
+from scheduler import TranscriptionScheduler
+from summarizer import Summarizer, segments_from_text
+from transcript import close_engines
+from transcriptstore import open_store
+from workspace import RunLock, collect_garbage
+
+# The queue lives with the run manifests; workspace cleanup only removes run directories
+JOBS_PATH = RUNS_DIR / "jobs.sqlite"
+
+# Largest request body accepted by the API
+MAX_BODY_BYTES = 64 * 1024
+
+JOB_FIELDS = ('id', 'source', 'summarize', 'state', 'stage', 'run_id', 'created', 'started', 'finished',
+              'attempts', 'error', 'transcript', 'summary', 'summary_url')
+
+
+class JobQueue:
+    """
+    Durable job queue in SQLite. Jobs move from queued to running to done,
+    failed or cancelled. Jobs left running by a stopped server are queued
+    again on start and resume from their run manifest.
+    """
+
+    def __init__(self, path=JOBS_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        # Shared by the API threads and the event loop, always under the lock
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, source TEXT NOT NULL, summarize INTEGER NOT NULL,"
+            " state TEXT NOT NULL, stage TEXT, run_id TEXT,"
+            " created REAL NOT NULL, started REAL, finished REAL, attempts INTEGER NOT NULL DEFAULT 0,"
+            " error TEXT, transcript TEXT, summary TEXT, summary_url TEXT)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created)")
+        self.db.commit()
+
+    def submit(self, source, summarize=True):
+        job_id = uuid.uuid4().hex[:12]
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO jobs (id, source, summarize, state, created) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, source, int(bool(summarize)), time.time())
+            )
+            self.db.commit()
+        logging.info(f"Job {job_id} queued: {source}")
+        return job_id
+
+    def claim(self):
+        """Mark the oldest queued job as running and return it, or None if the queue is empty."""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT id FROM jobs WHERE state = 'queued' ORDER BY created LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self.db.execute(
+                "UPDATE jobs SET state = 'running', started = ?, attempts = attempts + 1 WHERE id = ?",
+                (time.time(), row['id'])
+            )
+            self.db.commit()
+        return self.get(row['id'])
+
+    def update(self, job_id, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self.lock:
+            self.db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            self.db.commit()
+
+    def cancel(self, job_id):
+        """Cancel a job that has not started; returns whether it was cancelled."""
+        with self.lock:
+            cancelled = self.db.execute(
+                "UPDATE jobs SET state = 'cancelled', finished = ? WHERE id = ? AND state = 'queued'",
+                (time.time(), job_id)
+            ).rowcount
+            self.db.commit()
+        return bool(cancelled)
+
+    def requeue_interrupted(self):
+        with self.lock:
+            count = self.db.execute("UPDATE jobs SET state = 'queued' WHERE state = 'running'").rowcount
+            self.db.commit()
+        if count:
+            logging.info(f"Re-queued {count} job(s) interrupted by the last shutdown")
+        return count
+
+    def get(self, job_id):
+        with self.lock:
+            row = self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list(self, state=None, limit=50):
+        query = "SELECT * FROM jobs"
+        params = []
+        if state:
+            query += " WHERE state = ?"
+            params.append(state)
+        query += " ORDER BY created DESC LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            return [dict(row) for row in self.db.execute(query, params)]
+
+    def counts(self):
+        with self.lock:
+            return {row['state']: row['count']
+                    for row in self.db.execute("SELECT state, COUNT(*) AS count FROM jobs GROUP BY state")}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def job_progress(job):
+    """Chunk progress of a job from its run manifest: chunks known so far and their states."""
+    if not job.get('run_id'):
+        return None
+    path = RUNS_DIR / job['run_id'] / "manifest.json"
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            chunks = json.load(f)['chunks']
+    except (OSError, ValueError, KeyError):
+        return None
+    states = {}
+    for entry in chunks.values():
+        states[entry['state']] = states.get(entry['state'], 0) + 1
+    return {'chunks': len(chunks), **states}
+
+
+def job_status(job):
+    status = {field: job[field] for field in JOB_FIELDS}
+    status['summarize'] = bool(job['summarize'])
+    if job['state'] == 'running':
+        status['progress'] = job_progress(job)
+    return status
+
+
+# API: POST /jobs, GET /jobs, GET /jobs/<id>[/transcript|/summary], DELETE /jobs/<id>,
+# GET /search?q=<query>, GET /health and GET /metrics; see the README
+class JobHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logging.debug(f"API {self.address_string()} {format % args}")
+
+    def send_json(self, status, payload):
+        self.send_body(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json')
+
+    def send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', f"{content_type}; charset=utf-8")
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def route(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        return parts, parse_qs(url.query)
+
+    def do_GET(self):
+        queue = self.server.jobs
+        parts, query = self.route()
+        if parts == ['health']:
+            self.send_json(200, {'status': 'ok', 'workers': self.server.workers, 'jobs': queue.counts()})
+        elif parts == ['metrics']:
+            self.send_body(200, METRICS.prometheus().encode('utf-8'), 'text/plain; version=0.0.4')
+        elif parts == ['search']:
+            if self.server.store is None:
+                self.send_json(404, {'error': "Transcript index is disabled"})
+                return
+            try:
+                limit = int(query.get('limit', [str(SEARCH_LIMIT)])[0])
+            except ValueError:
+                self.send_json(400, {'error': "limit must be a number"})
+                return
+            text = query.get('q', [''])[0].strip()
+            if not text:
+                self.send_json(400, {'error': "q is required"})
+                return
+            self.send_json(200, {'hits': self.server.store.search(text, limit, query.get('episode', [None])[0])})
+        elif parts == ['jobs']:
+            state = query.get('state', [None])[0]
+            try:
+                limit = int(query.get('limit', ['50'])[0])
+            except ValueError:
+                self.send_json(400, {'error': "limit must be a number"})
+                return
+            self.send_json(200, {'jobs': [job_status(job) for job in queue.list(state, limit)]})
+        elif len(parts) in (2, 3) and parts[0] == 'jobs':
+            job = queue.get(parts[1])
+            if job is None:
+                self.send_json(404, {'error': f"No job {parts[1]}"})
+            elif len(parts) == 2:
+                self.send_json(200, job_status(job))
+            elif parts[2] in ('transcript', 'summary') and job.get(parts[2]) and Path(job[parts[2]]).exists():
+                self.send_body(200, Path(job[parts[2]]).read_bytes(), 'text/plain')
+            else:
+                self.send_json(404, {'error': f"No {parts[2]} for job {parts[1]} ({job['state']})"})
+        else:
+            self.send_json(404, {'error': "Not found"})
+
+    def do_POST(self):
+        parts, _ = self.route()
+        if parts != ['jobs']:
+            self.send_json(404, {'error': "Not found"})
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        if length > MAX_BODY_BYTES:
+            self.send_json(413, {'error': "Request body too large"})
+            return
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+            source = request['source'].strip().strip('"')
+        except (ValueError, KeyError, AttributeError, TypeError):
+            self.send_json(400, {'error': 'Expected a JSON body with a "source" path or URL'})
+            return
+        if not source.startswith(('http://', 'https://')) and not Path(source).is_file():
+            self.send_json(400, {'error': f"File not found: {source}"})
+            return
+        job_id = self.server.jobs.submit(source, request.get('summarize', True))
+        self.server.notify()
+        self.send_json(202, job_status(self.server.jobs.get(job_id)))
+
+    def do_DELETE(self):
+        parts, _ = self.route()
+        if len(parts) != 2 or parts[0] != 'jobs':
+            self.send_json(404, {'error': "Not found"})
+        elif self.server.jobs.cancel(parts[1]):
+            self.send_json(200, job_status(self.server.jobs.get(parts[1])))
+        else:
+            self.send_json(409, {'error': f"Job {parts[1]} is not queued"})
+
+
+class JobServer:
+    """
+    Runs the HTTP API in a background thread and SERVER_WORKERS async workers
+    on the event loop. All workers share one HTTP client, one transcript
+    cache and one transcription scheduler, so the API limits hold across jobs.
+    """
+
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT, workers=SERVER_WORKERS,
+                 inbox_dir=SERVER_INBOX_DIR, jobs_path=JOBS_PATH):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.inbox_dir = Path(inbox_dir) if inbox_dir else None
+        self.jobs = JobQueue(jobs_path)
+        self.wakeup = None
+        self.loop = None
+        self.httpd = None
+        self.client = None
+        self.cache = None
+        self.store = None
+        self.scheduler = None
+        self.uploader = None
+
+    def notify(self):
+        """Wake an idle worker; safe to call from the API threads."""
+        self.loop.call_soon_threadsafe(self.wakeup.set)
+
+    def start_api(self):
+        self.httpd = ThreadingHTTPServer((self.host, self.port), JobHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.jobs = self.jobs
+        self.httpd.store = self.store
+        self.httpd.workers = self.workers
+        self.httpd.notify = self.notify
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        host, port = self.httpd.server_address
+        logging.info(f"Job server listening on http://{host}:{port} with {self.workers} worker(s)")
+
+    async def fetch(self, job, manifest):
+        """Local files are used in place; URLs are downloaded into the run directory."""
+        fetched = manifest.step('fetch')
+        if fetched and Path(fetched['audio_path']).exists():
+            return Path(fetched['audio_path'])
+        source = job['source']
+        if source.startswith(('http://', 'https://')):
+            destination = manifest.run_dir / "original" / (Path(urlparse(source).path).name or 'episode.mp3')
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            if not await asyncio.to_thread(download_file, source, destination, session=self.client.requests_session):
+                raise RuntimeError(f"Download failed: {source}")
+            audio_path = destination
+        else:
+            audio_path = Path(source)
+            if not audio_path.is_file():
+                raise FileNotFoundError(f"File not found: {source}")
+        manifest.complete_step('fetch', audio_path=str(audio_path))
+        return audio_path
+
+    async def summarize(self, job, manifest, transcript_paths):
+        """Summarize locally into the run directory, or upload for the web summary like main.py does."""
+        if SUMMARIZE_LOCALLY:
+            summary_path = manifest.run_dir / "summary.txt"
+            if not summary_path.exists():
+                with open(transcript_paths[0], 'r', encoding='utf-8') as f:
+                    transcript = json.load(f)
+                segments = transcript.get('segments') or segments_from_text(transcript['text'])
+                summary = await Summarizer(self.client.session, self.cache).summarize(segments)
+                if summary is None:
+                    return {}
+                summary_path.write_text(summary, encoding='utf-8')
+            return {'summary': str(summary_path)}
+
+        uploaded = manifest.step('upload')
+        if uploaded:
+            url = uploaded['url']
+        else:
+            url = await self.uploader.upload(str(transcript_paths[1]))
+            # Only a complete transcript's upload is reused by a resumed run
+            if manifest.step('transcribe'):
+                manifest.complete_step('upload', url=url)
+        return {'summary_url': f"{SUMMARY_UPLOADED_TEXT_FILE}{url}"}
+
+    async def run_job(self, job):
+        manifest = RunManifest.load(job['run_id']) if job['run_id'] else RunManifest.create(job['source'])
+        self.jobs.update(job['id'], run_id=manifest.run_id, stage='fetch')
+        with RunLock(manifest.run_dir):
+            try:
+                fields = await self.run_steps(job, manifest)
+            except Exception:
+                # Failed jobs are not retried, so their run is not kept for resuming
+                manifest.finish('failed')
+                raise
+            # A transcript with failed chunks leaves the run open for main.py --resume
+            if manifest.step('transcribe'):
+                manifest.finish()
+        return fields
+
+    async def run_steps(self, job, manifest):
+        audio_path = await self.fetch(job, manifest)
+
+        self.jobs.update(job['id'], stage='transcribe')
+        transcribed = manifest.step('transcribe')
+        if transcribed and Path(transcribed['text']).exists():
+            transcript_paths = (Path(transcribed['json']), Path(transcribed['text']))
+        else:
+            # Chunks are indexed for search as they are written, shared with the API's /search
+            writer = TranscriptWriter(manifest.run_dir / "transcript", episode=audio_path.stem, store=self.store,
+                                      source=job['source'], run_id=manifest.run_id)
+            transcript_paths = await run_pipeline(
+                audio_path, manifest.run_dir / "splitted", manifest.run_dir / "transcript",
+                self.client.session, self.cache, manifest=manifest, scheduler=self.scheduler, writer=writer
+            )
+        if not transcript_paths:
+            raise RuntimeError("No chunks could be transcribed")
+        fields = {'transcript': str(transcript_paths[1])}
+
+        if job['summarize']:
+            self.jobs.update(job['id'], stage='summarize', **fields)
+            fields.update(await self.summarize(job, manifest, transcript_paths))
+        return fields
+
+    async def worker(self, number):
+        while True:
+            job = self.jobs.claim()
+            if job is None:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), SERVER_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            logging.info(f"Worker {number} started job {job['id']}: {job['source']}")
+            started = time.perf_counter()
+            try:
+                fields = await self.run_job(job)
+                self.jobs.update(job['id'], state='done', stage=None, finished=time.time(), error=None, **fields)
+                METRICS.count('jobs', state='done')
+                logging.info(f"Job {job['id']} done in {time.perf_counter() - started:.1f}s")
+            except asyncio.CancelledError:
+                # Left running, so the next start re-queues and resumes it
+                raise
+            except Exception as e:
+                self.jobs.update(job['id'], state='failed', finished=time.time(), error=str(e))
+                METRICS.count('jobs', state='failed')
+                logging.error(f"Job {job['id']} failed: {str(e)}")
+
+    async def watch_inbox(self):
+        """Queue MP3 files dropped into the inbox once their size has stopped changing."""
+        accepted_dir = self.inbox_dir / "accepted"
+        accepted_dir.mkdir(parents=True, exist_ok=True)
+        sizes = {}
+        while True:
+            for path in sorted(self.inbox_dir.glob('*.mp3')):
+                size = path.stat().st_size
+                if sizes.get(path) != size:
+                    # Still being copied in, or new; check again on the next pass
+                    sizes[path] = size
+                    continue
+                del sizes[path]
+                destination = accepted_dir / f"{uuid.uuid4().hex[:8]}-{path.name}"
+                shutil.move(str(path), destination)
+                self.jobs.submit(str(destination))
+                self.wakeup.set()
+            await asyncio.sleep(SERVER_POLL_SECONDS)
+
+    async def collect_garbage(self):
+        """Clean up old runs and logs now and then; runs of queued and running jobs are kept."""
+        while True:
+            await asyncio.to_thread(collect_garbage)
+            await asyncio.sleep(WORKSPACE_GC_INTERVAL_SECONDS)
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.jobs.requeue_interrupted()
+        self.client = HttpClient()
+        self.cache = TranscriptCache()
+        self.cache.evict()
+        self.store = open_store()
+        self.scheduler = TranscriptionScheduler()
+        # One pool of FTP sessions for every job's upload; sessions are only opened when needed
+        self.uploader = FtpUploader(FTP_HOST, FTP_USER, FTP_PASSWORD, FTP_DIRECTORY)
+        self.start_api()
+        tasks = [asyncio.create_task(self.worker(i + 1)) for i in range(self.workers)]
+        tasks.append(asyncio.create_task(self.collect_garbage()))
+        if self.inbox_dir:
+            logging.info(f"Watching {self.inbox_dir} for new episodes")
+            tasks.append(asyncio.create_task(self.watch_inbox()))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            await self.client.close()
+            await asyncio.to_thread(self.uploader.close)
+            await asyncio.to_thread(close_engines)
+            self.cache.close()
+            if self.store is not None:
+                self.store.close()
+            self.jobs.close()
+            logging.info("Job server stopped")
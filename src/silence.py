@@ -0,0 +1,139 @@
+import logging
+import subprocess
+import numpy as np
+from metrics import METRICS
+
+# Decoding parameters for the analysis stream; speech energy does not need more
+ANALYSIS_SAMPLE_RATE = 8000
+# Length of one envelope frame in milliseconds
+FRAME_MS = 20
+# Seconds of decoded audio read from ffmpeg per window
+WINDOW_SECONDS = 30
+# Gaps are found on an energy curve smoothed over this many milliseconds
+SMOOTHING_MS = 300
+# Envelope frames at or below this percentile are treated as silence
+SILENCE_PERCENTILE = 15
+# Fraction of the planned chunk duration used, leaving room for bitrate
+# variation; the splitter still enforces the exact size
+SIZE_HEADROOM = 0.97
+
+
+def iter_pcm_windows(file_path, sample_rate=ANALYSIS_SAMPLE_RATE, window_seconds=WINDOW_SECONDS):
+    """
+    Decode an audio file with ffmpeg and yield mono float32 sample windows.
+    Only one window is held in memory at a time.
+    """
+    command = [
+        'ffmpeg', '-v', 'error', '-nostdin', '-i', str(file_path),
+        '-f', 's16le', '-ac', '1', '-ar', str(sample_rate), '-'
+    ]
+    window_bytes = sample_rate * window_seconds * 2
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            data = process.stdout.read(window_bytes)
+            if not data:
+                break
+            # Drop a trailing odd byte so the buffer maps onto int16 samples
+            data = data[:len(data) - len(data) % 2]
+            yield np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read().decode(errors='replace').strip()
+        process.stderr.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to decode {file_path}: {stderr}")
+
+
+def iter_pcm_frames(file_path, sample_rate=ANALYSIS_SAMPLE_RATE, frame_ms=FRAME_MS):
+    """
+    Decode an audio file in streamed windows and yield its samples as 2D
+    float32 arrays with one frame_ms frame per row. A trailing partial frame
+    comes last, as a single shorter row.
+    """
+    frame_len = sample_rate * frame_ms // 1000
+    leftover = np.zeros(0, dtype=np.float32)
+
+    for window in iter_pcm_windows(file_path, sample_rate):
+        samples = np.concatenate((leftover, window))
+        usable = len(samples) - len(samples) % frame_len
+        if usable:
+            yield samples[:usable].reshape(-1, frame_len)
+        leftover = samples[usable:]
+
+    if len(leftover):
+        yield leftover.reshape(1, -1)
+
+
+def frame_rms(frames):
+    """RMS energy of every row of a frame array."""
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def rms_envelope(file_path, frame_ms=FRAME_MS, sample_rate=ANALYSIS_SAMPLE_RATE):
+    """Compute the RMS energy of every frame_ms frame of an audio file."""
+    parts = [frame_rms(frames) for frames in iter_pcm_frames(file_path, sample_rate, frame_ms)]
+    if not parts:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(parts)
+
+
+def plan_cuts(envelope, max_chunk_ms, tolerance_ms, frame_ms=FRAME_MS):
+    """
+    Plan cut points (in ms) so no chunk is longer than max_chunk_ms.
+    Each cut is placed in the quietest stretch near the latest allowed
+    position, looking back at most tolerance_ms. Cuts only ever move
+    earlier, so every chunk stays within the size budget.
+    """
+    total_frames = len(envelope)
+    max_frames = max(1, int(max_chunk_ms // frame_ms))
+    tolerance_frames = min(max_frames - 1, int(tolerance_ms // frame_ms))
+    if total_frames <= max_frames:
+        return []
+
+    smooth_frames = max(1, SMOOTHING_MS // frame_ms)
+    kernel = np.ones(smooth_frames, dtype=np.float32) / smooth_frames
+    smoothed = np.convolve(envelope, kernel, mode='same')
+    threshold = np.percentile(envelope, SILENCE_PERCENTILE)
+
+    cuts = []
+    position = 0
+    while total_frames - position > max_frames:
+        nominal = position + max_frames
+        lo = nominal - tolerance_frames
+        window = smoothed[lo:nominal + 1]
+
+        # Cut in the middle of the quiet run closest to the nominal cut;
+        # without any quiet run, fall back to the quietest frame
+        quiet = np.flatnonzero(window <= threshold)
+        if len(quiet):
+            breaks = np.flatnonzero(np.diff(quiet) != 1)
+            run_start = quiet[breaks[-1] + 1] if len(breaks) else quiet[0]
+            offset = (run_start + quiet[-1]) // 2
+        else:
+            offset = int(np.argmin(window))
+
+        position = max(lo + int(offset), position + 1)
+        cuts.append(position * frame_ms)
+
+    return cuts
+
+
+def plan_silence_cuts(file_path, chunk_ms, tolerance_ms, envelope=None):
+    """
+    Decode file_path once and return silence-aligned cut points in ms for
+    chunks of at most chunk_ms of audio. An envelope that was already
+    computed (e.g. by the voice activity detection) saves the decode.
+    """
+    if envelope is None:
+        with METRICS.span('decode'):
+            envelope = rms_envelope(file_path)
+    duration_ms = len(envelope) * FRAME_MS
+    if duration_ms == 0:
+        return []
+
+    max_chunk_ms = chunk_ms * SIZE_HEADROOM
+    with METRICS.span('split_plan', audio_seconds=round(duration_ms / 1000)):
+        cuts = plan_cuts(envelope, max_chunk_ms, tolerance_ms)
+    logging.info(f"Planned {len(cuts)} silence-aligned cuts over {duration_ms / 1000:.0f}s of audio")
+    return cuts
@@ -0,0 +1,124 @@
+import logging
+import math
+import os
+from config import (
+    TARGET_SIZE_MB, SPLIT_TOLERANCE_SECONDS, MAX_CONCURRENT_REQUESTS, API_MAX_UPLOAD_MB,
+    API_MAX_CHUNK_SECONDS, REQUEST_OVERHEAD_SECONDS, TRANSCRIBE_REALTIME_FACTOR
+)
+from mp3frames import iter_frames
+
+# Share of the API upload limit a chunk may use; the rest covers the multipart
+# envelope and bitrate variation between the plan and the actual cut
+UPLOAD_SIZE_MARGIN = 0.95
+
+# Chunks are not made shorter than this just to keep more workers busy
+MIN_CHUNK_SECONDS = 60
+
+# A chunk count within this share of the fastest estimate is preferred if it needs fewer requests
+PLAN_TOLERANCE = 0.10
+
+
+def probe_mp3(file_path):
+    """Read the real duration, audio byte count and average bitrate of an MP3 from its frame headers."""
+    audio_bytes = 0
+    duration = 0.0
+    with open(file_path, 'rb') as f:
+        for header, _ in iter_frames(f):
+            audio_bytes += header.length
+            duration += header.samples / header.sample_rate
+    if duration == 0:
+        raise ValueError(f"No MPEG audio frames found in {file_path}")
+    return {
+        'duration_seconds': duration,
+        'audio_bytes': audio_bytes,
+        'bitrate_kbps': audio_bytes * 8 / duration / 1000,
+    }
+
+
+def max_chunk_bytes(target_size_mb=TARGET_SIZE_MB):
+    """Largest chunk allowed: the API upload limit less the margin, or a smaller configured cap."""
+    limit = API_MAX_UPLOAD_MB * 1024 * 1024 * UPLOAD_SIZE_MARGIN
+    if target_size_mb:
+        limit = min(limit, target_size_mb * 1024 * 1024)
+    return int(limit)
+
+
+def estimate_wall_seconds(chunks, duration_seconds, workers):
+    """Transcription wall time for an episode cut into `chunks` equal parts sent `workers` at a time."""
+    per_request = REQUEST_OVERHEAD_SECONDS + duration_seconds / chunks * TRANSCRIBE_REALTIME_FACTOR
+    return math.ceil(chunks / workers) * per_request
+
+
+def plan_chunks(file_path, target_size_mb=TARGET_SIZE_MB, workers=MAX_CONCURRENT_REQUESTS,
+                tolerance_seconds=SPLIT_TOLERANCE_SECONDS, bitrate_kbps=None, skipped_seconds=0):
+    """
+    Choose the number and size of chunks for an episode. Every chunk stays
+    within the API's upload size and duration limits (and target_size_mb if
+    set); among the counts that do, the one with the lowest estimated wall
+    time wins, preferring fewer requests when the gain is small. Returns the
+    plan as a dict with 'target_bytes' and 'chunk_ms' for the splitter.
+    bitrate_kbps sizes the chunks for audio that is re-encoded before upload,
+    and skipped_seconds is audio left out by the voice activity detection.
+    """
+    probe = probe_mp3(file_path)
+    duration = probe['duration_seconds']
+    audio_bytes = probe['audio_bytes']
+    if bitrate_kbps:
+        audio_bytes = int(duration * bitrate_kbps * 1000 / 8)
+    if skipped_seconds:
+        kept = max(duration - skipped_seconds, 1.0)
+        audio_bytes = int(audio_bytes * kept / duration)
+        duration = kept
+    byte_rate = audio_bytes / duration
+    limit_bytes = max_chunk_bytes(target_size_mb)
+
+    # Silence-aware cuts may land up to tolerance_seconds early, so leave room for that
+    slack = byte_rate * tolerance_seconds
+    fewest = math.ceil(audio_bytes / max(limit_bytes - slack, limit_bytes / 2))
+    if API_MAX_CHUNK_SECONDS:
+        fewest = max(fewest, math.ceil(duration / max(API_MAX_CHUNK_SECONDS - tolerance_seconds,
+                                                      API_MAX_CHUNK_SECONDS / 2)))
+
+    # Beyond one extra round of workers, more chunks only add requests
+    most = max(fewest, min(fewest + workers - 1, int(duration // MIN_CHUNK_SECONDS)))
+    estimates = {n: estimate_wall_seconds(n, duration, workers) for n in range(fewest, most + 1)}
+    fastest = min(estimates.values())
+    chunks = min(n for n, seconds in estimates.items() if seconds <= fastest * (1 + PLAN_TOLERANCE))
+    target_bytes = min(limit_bytes, int(audio_bytes / chunks + slack))
+    if API_MAX_CHUNK_SECONDS:
+        target_bytes = min(target_bytes, int(byte_rate * API_MAX_CHUNK_SECONDS))
+
+    plan = {
+        'chunks': chunks,
+        'target_bytes': target_bytes,
+        'chunk_ms': target_bytes / byte_rate * 1000,
+        'duration_seconds': round(duration, 3),
+        'bitrate_kbps': round(bitrate_kbps or probe['bitrate_kbps'], 1),
+        'estimated_seconds': round(estimates[chunks], 1),
+    }
+    logging.info(f"Chunk plan: {chunks} chunk(s) of at most {target_bytes / (1024 * 1024):.2f}MB for "
+                 f"{duration / 60:.1f} min at {plan['bitrate_kbps']:.0f} kbps "
+                 f"(estimated {plan['estimated_seconds']:.0f}s with {workers} worker(s))")
+    return plan
+
+
+def chunk_limit_error(chunk):
+    """
+    Return why the API would reject a chunk (a path or splitter chunk dict)
+    for its size or duration, or None if it is within the limits.
+    """
+    duration_ms = None
+    if isinstance(chunk, dict):
+        duration_ms = chunk.get('duration_ms')
+        if chunk.get('data') is not None:
+            name, size = chunk['name'], len(chunk['data'])
+        else:
+            name, size = chunk['name'], os.path.getsize(chunk['path'])
+    else:
+        name, size = os.path.basename(chunk), os.path.getsize(chunk)
+
+    if size > API_MAX_UPLOAD_MB * 1024 * 1024:
+        return f"Chunk {name} is {size / (1024 * 1024):.2f}MB, over the {API_MAX_UPLOAD_MB}MB upload limit"
+    if API_MAX_CHUNK_SECONDS and duration_ms and duration_ms / 1000 > API_MAX_CHUNK_SECONDS:
+        return f"Chunk {name} is {duration_ms / 1000:.0f}s long, over the {API_MAX_CHUNK_SECONDS}s duration limit"
+    return None
@@ -1,20 +1,24 @@
 import os
-from pydub import AudioSegment
-import math
 import logging
+import mmap
 from datetime import datetime
-from pathlib import Path
-import shutil
-from config import TARGET_SIZE_MB
+import time
+from config import TARGET_SIZE_MB, SILENCE_AWARE_SPLIT, SPLIT_TOLERANCE_SECONDS, PREPROCESS_AUDIO, VAD_TRIM
+from metrics import METRICS
+from mp3frames import iter_frame_offsets
+from preprocess import BITRATES_KBPS, EncodedStream, iter_opus_segments, resolve_mode
+from silence import plan_silence_cuts
+from sizing import plan_chunks
+from vad import detect_non_speech, episode_ms, episode_offsets, frame_features, trim_envelope, trimmed_ms
+from workspace import LOGS_DIR
 
 def setup_logging():
     """
     Setup logging configuration
     """
-    if not os.path.exists('logs'):
-        os.makedirs('logs')
+    LOGS_DIR.mkdir(parents=True, exist_ok=True)
     
-    log_filename = f'logs/mp3_splitter_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
+    log_filename = LOGS_DIR / f'mp3_splitter_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
     
     logging.basicConfig(
         level=logging.INFO,
@@ -27,54 +31,236 @@ def setup_logging():
     
     return log_filename
 
-def split_mp3(file_path, target_size_mb=TARGET_SIZE_MB, output_dir=None):
+def plan_cut_points(file_path, chunk_ms, tolerance_seconds=SPLIT_TOLERANCE_SECONDS, envelope=None, skips=()):
     """
-    Split an MP3 file into chunks of approximately target_size_mb each
+    Plan silence-aligned cut points for a file, or return an empty list
+    if the audio cannot be analysed (cuts then fall back to size only).
+    With skips, cuts are planned on the audio that is kept and returned in
+    the episode's timeline.
     """
-    file_size = os.path.getsize(file_path) / (1024 * 1024)
-    logging.info(f"Processing file: {file_path} (size: {file_size:.2f}MB)")
+    try:
+        if skips and envelope is not None:
+            cuts = plan_silence_cuts(file_path, chunk_ms, tolerance_seconds * 1000, trim_envelope(envelope, skips))
+            return [episode_ms(cut, skips) for cut in cuts]
+        return plan_silence_cuts(file_path, chunk_ms, tolerance_seconds * 1000, envelope)
+    except Exception as e:
+        logging.warning(f"Silence analysis failed, splitting by size only: {str(e)}")
+        return []
+
+def find_skips(file_path):
+    """
+    Decode a file once for voice activity detection. Returns the frame
+    features (reused by the silence analysis) and the stretches without
+    speech to skip, or (None, []) if the audio cannot be analysed.
+    """
+    try:
+        with METRICS.span('decode'):
+            features = frame_features(file_path)
+        return features, detect_non_speech(file_path, features)
+    except Exception as e:
+        logging.warning(f"Voice activity detection failed, sending all audio: {str(e)}")
+        return None, []
+
+def iter_chunks(file_path, target_size_mb=TARGET_SIZE_MB, output_dir=None,
+                silence_aware=SILENCE_AWARE_SPLIT, cut_points=None, preprocess=PREPROCESS_AUDIO, vad=VAD_TRIM):
+    """
+    Yield chunks of an MP3 file as soon as each one is complete, sized by
+    sizing.plan_chunks and never larger than target_size_mb if it is set.
+    Chunks are written to output_dir, or kept in memory under 'data' when
+    output_dir is None so they can be uploaded without a temp file.
+    preprocess ('mp3' or 'opus') re-encodes the audio for speech on the way.
+    With vad, long stretches without speech are left out; such chunks carry
+    an 'offsets' map from their own timeline to the episode's.
+    """
+    preprocess = resolve_mode(preprocess)
+    features, skips = find_skips(file_path) if vad else (None, [])
+    skipped_seconds = sum(end - start for start, end in skips) / 1000
+    plan = plan_chunks(file_path, target_size_mb, bitrate_kbps=BITRATES_KBPS.get(preprocess),
+                       skipped_seconds=skipped_seconds)
+    if cut_points is None:
+        envelope = features[0] if features is not None else None
+        cut_points = plan_cut_points(file_path, plan['chunk_ms'], envelope=envelope, skips=skips) if silence_aware else []
     
-    if file_size <= target_size_mb:
-        logging.info(f"File is smaller than {target_size_mb}MB, skipping split")
-        return
+    if preprocess == 'opus':
+        if cut_points:
+            cut_points = [trimmed_ms(cut, skips) for cut in cut_points]
+        else:
+            # Opus cannot be cut by size on the way, so fall back to equal durations
+            chunk_ms = plan['duration_seconds'] * 1000 / plan['chunks']
+            cut_points = [i * chunk_ms for i in range(1, plan['chunks'])]
+        chunks = iter_opus_chunks(file_path, cut_points, output_dir, skips)
+    else:
+        chunks = iter_frame_chunks(file_path, plan['target_bytes'], output_dir, cut_points, preprocess == 'mp3', skips)
+    yield from chunks
     
-    try:
-        # Load the audio file
-        logging.info(f"Loading audio file: {file_path}")
-        audio = AudioSegment.from_mp3(file_path)
-        
-        # Calculate total duration and size ratio
-        total_duration = len(audio)
-        num_chunks = math.ceil(file_size / target_size_mb)
-        ms_per_chunk = total_duration // num_chunks
-        
-        logging.info(f"Will split into {num_chunks} parts of approximately {target_size_mb}MB each")
-        
-        # Generate new filenames and split the audio
-        file_name = os.path.splitext(os.path.basename(file_path))[0]
-        extension = os.path.splitext(file_path)[1]
-        
-        for i in range(num_chunks):
-            start_ms = i * ms_per_chunk
-            
-            # For the last chunk, take all remaining audio
-            if i == num_chunks - 1:
-                end_ms = total_duration
+    if skips:
+        logging.info(f"Skipped {skipped_seconds:.0f}s without speech in {len(skips)} stretch(es) of {file_path}")
+        METRICS.count('vad_skipped_seconds', round(skipped_seconds, 3))
+
+def iter_opus_chunks(file_path, cut_points, output_dir=None, skips=()):
+    """
+    Yield Ogg Opus chunks cut at cut_points (ms of the audio left after skips)
+    as ffmpeg finishes each one.
+    """
+    started = time.perf_counter()
+    for index, path, start_ms, end_ms in iter_opus_segments(file_path, cut_points, output_dir, skips):
+        chunk = {
+            'index': index,
+            'name': os.path.basename(path),
+            'path': path if output_dir is not None else None,
+            'data': None,
+            'start_ms': episode_ms(start_ms, skips),
+            'duration_ms': end_ms - start_ms,
+            'size': os.path.getsize(path),
+        }
+        if skips:
+            chunk['offsets'] = episode_offsets(start_ms, end_ms, skips)
+        if output_dir is None:
+            # The segment file is removed as soon as the next one is requested
+            with open(path, 'rb') as f:
+                chunk['data'] = f.read()
+        logging.info(f"Chunk {index} size: {chunk['size'] / (1024 * 1024):.2f}MB")
+        METRICS.record_span('export', started, time.perf_counter(), chunk=index, bytes=chunk['size'])
+        METRICS.count('export_bytes', chunk['size'])
+        yield chunk
+        started = time.perf_counter()
+
+def map_range(f, start, end):
+    """
+    Map bytes start..end of an open file read-only and return them as a
+    memoryview. The mapping is released with the last view of it.
+    """
+    aligned = start - start % mmap.ALLOCATIONGRANULARITY
+    mapped = mmap.mmap(f.fileno(), end - aligned, access=mmap.ACCESS_READ, offset=aligned)
+    return memoryview(mapped)[start - aligned:]
+
+def iter_frame_chunks(file_path, target_bytes, output_dir=None, cut_points=(), encoded=False, skips=()):
+    """
+    Cut an MP3 stream into chunks of at most target_bytes on frame boundaries,
+    also starting a new chunk at each cut point (ms). With encoded, the frames
+    come from ffmpeg re-encoding the file as low-bitrate mono MP3. Frames
+    inside skips ((start_ms, end_ms) stretches) are dropped.
+    In-memory chunks of the original file are memoryviews of the file mapped
+    into memory, so their audio is never copied; only chunks that span a
+    skipped stretch are joined into bytes.
+    """
+    file_name = os.path.splitext(os.path.basename(file_path))[0]
+    extension = '.mp3' if encoded else os.path.splitext(file_path)[1]
+    mapped = output_dir is None and not encoded
+    next_cut = 0
+    next_skip = 0
+    
+    chunk = None
+    chunk_file = None
+    # Byte ranges of the file in a mapped chunk, merged while frames are contiguous
+    spans = []
+    position_ms = 0.0
+    chunk_started = 0.0
+    # A cut point passed inside a skipped stretch starts a new chunk at the next kept frame
+    cut_pending = False
+    after_gap = False
+    
+    def finish_chunk():
+        if chunk_file is not None:
+            chunk_file.close()
+        elif mapped:
+            if len(spans) == 1:
+                chunk['data'] = map_range(source, *spans[0])
             else:
-                end_ms = (i + 1) * ms_per_chunk
-            
-            chunk = audio[start_ms:end_ms]
-            chunk_path = os.path.join(output_dir, f"{file_name}-{i+1}{extension}")
-            
-            # Export the chunk
-            logging.info(f"Exporting chunk {i+1}/{num_chunks} to {chunk_path}")
-            chunk.export(chunk_path, format="mp3")
+                chunk['data'] = b"".join(map_range(source, start, end) for start, end in spans)
+        else:
+            chunk['data'] = bytes(chunk['data'])
+        logging.info(f"Chunk {chunk['index']} size: {chunk['size'] / (1024 * 1024):.2f}MB")
+        # Time spent cutting and writing this chunk, without the consumer's time between chunks
+        METRICS.record_span('export', chunk_started, time.perf_counter(), chunk=chunk['index'], bytes=chunk['size'])
+        METRICS.count('export_bytes', chunk['size'])
+        return chunk
+    
+    try:
+        with (EncodedStream(file_path) if encoded else open(file_path, 'rb')) as source:
+            for header, frame, offset in iter_frame_offsets(source):
+                frame_ms = header.samples * 1000 / header.sample_rate
+                while next_cut < len(cut_points) and position_ms >= cut_points[next_cut]:
+                    next_cut += 1
+                    cut_pending = True
+                while next_skip < len(skips) and position_ms >= skips[next_skip][1]:
+                    next_skip += 1
+                if next_skip < len(skips) and position_ms >= skips[next_skip][0]:
+                    position_ms += frame_ms
+                    after_gap = True
+                    continue
+                
+                # Start a new chunk at a planned cut or when the next frame would exceed the target
+                if chunk is None or cut_pending or chunk['size'] + header.length > target_bytes:
+                    index = 1
+                    if chunk is not None:
+                        index = chunk['index'] + 1
+                        yield finish_chunk()
+                    chunk_started = time.perf_counter()
+                    name = f"{file_name}-{index}{extension}"
+                    chunk = {
+                        'index': index,
+                        'name': name,
+                        'path': None,
+                        'data': None,
+                        'start_ms': position_ms,
+                        'duration_ms': 0.0,
+                        'size': 0,
+                    }
+                    if skips:
+                        chunk['offsets'] = [(0.0, position_ms)]
+                    if output_dir is not None:
+                        chunk['path'] = os.path.join(output_dir, name)
+                        logging.info(f"Exporting chunk {index} to {chunk['path']}")
+                        chunk_file = open(chunk['path'], 'wb')
+                    elif mapped:
+                        spans = []
+                    else:
+                        chunk['data'] = bytearray()
+                    cut_pending = False
+                elif after_gap:
+                    chunk['offsets'].append((chunk['duration_ms'], position_ms))
+                after_gap = False
+                
+                if chunk_file is not None:
+                    chunk_file.write(frame)
+                elif mapped:
+                    if spans and spans[-1][1] == offset:
+                        spans[-1][1] = offset + header.length
+                    else:
+                        spans.append([offset, offset + header.length])
+                else:
+                    chunk['data'] += frame
+                chunk['size'] += header.length
+                chunk['duration_ms'] += frame_ms
+                position_ms += frame_ms
             
-            # Log the actual size of the exported chunk
-            chunk_size = os.path.getsize(chunk_path) / (1024 * 1024)
-            logging.info(f"Chunk {i+1} size: {chunk_size:.2f}MB")
-        
-        logging.info(f"Successfully split {file_path} into {num_chunks} parts")
+            if chunk is None:
+                raise ValueError("No MPEG audio frames found")
+            yield finish_chunk()
+    finally:
+        if chunk_file is not None and not chunk_file.closed:
+            chunk_file.close()
+
+def split_mp3(file_path, target_size_mb=TARGET_SIZE_MB, output_dir=None,
+              silence_aware=SILENCE_AWARE_SPLIT, cut_points=None, preprocess=PREPROCESS_AUDIO, vad=VAD_TRIM):
+    """
+    Split an MP3 file into chunks sized for the transcription API (and of at
+    most target_size_mb each if it is set).
+    Chunks are cut on frame boundaries and copied byte for byte, so the
+    audio is never decoded or re-encoded unless preprocess asks for a
+    speech encoding ('mp3' or 'opus'). With silence_aware, cuts are moved
+    to nearby quiet stretches; cut_points (in ms) overrides the plan. vad
+    leaves out long stretches without speech.
+    Returns a list of chunk dicts.
+    """
+    file_size = os.path.getsize(file_path) / (1024 * 1024)
+    logging.info(f"Processing file: {file_path} (size: {file_size:.2f}MB)")
+    
+    try:
+        chunks = list(iter_chunks(file_path, target_size_mb, output_dir, silence_aware, cut_points, preprocess, vad))
+        logging.info(f"Successfully split {file_path} into {len(chunks)} parts")
+        return chunks
         
     except Exception as e:
         logging.error(f"Error processing {file_path}: {str(e)}")
@@ -0,0 +1,270 @@
+import asyncio
+import logging
+import time
+import aiohttp
+from config import API_KEY, API_BASE, SUMMARY_MODEL, SUMMARY_SECTION_TOKENS, SUMMARY_MAX_WORKERS, SUMMARY_MAX_TOKENS
+from assembly import format_timestamp
+from cache import chunk_key
+from engines import RETRYABLE_STATUSES
+from metrics import METRICS
+from scheduler import TranscriptionScheduler, parse_retry_after
+
+# Configuration
+CONFIG = {
+    'API_KEY': API_KEY,
+    'API_BASE': API_BASE,
+    'MODEL': SUMMARY_MODEL,
+}
+
+SYSTEM_PROMPT = "You are a helpful assistant that summarizes content."
+
+# Map stage: every section is summarized on its own, keeping everything the final summary may need
+SECTION_PROMPT = """Summarize this part of a podcast transcript. Keep all key points, quotes, \
+anecdotes, examples, statistics and names of speakers, in the order they appear. \
+Do not change the language of the content.
+
+Transcript part {number} ({start} - {end}):
+{text}"""
+
+# Reduce stage for intermediate levels, when partial summaries are still too long for one request
+MERGE_PROMPT = """Merge these consecutive partial summaries of a podcast into one summary. \
+Keep all key points, quotes and names, and do not change the language.
+
+{text}"""
+
+# Final prompt, matching the one used by backend/podcast-summary/process.php
+FINAL_PROMPT = """Summarize the following podcast transcript in a detailed yet concise manner:
+
+1. Create a clear heading based on the main subject/theme of the podcast
+2. Do not change the language of the content after summarizing
+3. Use headings, subheadings, and markdown for clear formatting
+4. Ensure all key points, quotes, and important discussions remain intact
+5. Preserve significant anecdotes, examples, and expert insights
+6. Use bullet points where appropriate
+7. Highlight key concepts and memorable quotes with bold text
+8. Explain details comprehensively while avoiding repetition
+9. Structure the summary for easy reading with clear topic transitions
+10. Include any relevant statistics, data, or research mentioned
+11. Note any significant guest speakers or expert contributors
+12. If the content is in Persian, summarize it in Persian
+13. If the content is in English, summarize it in English
+
+The summary should capture the essence of the discussion while maintaining the natural flow of conversation and key takeaways.
+
+The content below consists of summaries of consecutive sections of the podcast."""
+
+
+class SummaryError(Exception):
+    """A failed chat-completion request; `retryable` marks rate limits and transient errors."""
+
+    def __init__(self, message, retryable=False, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+async def iter_list(items):
+    for item in items:
+        yield item
+
+
+def make_section(segments):
+    return {
+        'start': segments[0].get('start', 0),
+        'end': segments[-1].get('end', 0),
+        'text': " ".join(segment['text'].strip() for segment in segments),
+    }
+
+
+async def stream_sections(segments, budget=SUMMARY_SECTION_TOKENS):
+    """
+    Group transcript segments into sections of at most `budget` estimated tokens,
+    breaking only between segments. segments is a list or an async iterator;
+    each section is yielded as soon as it is full.
+    """
+    if not hasattr(segments, '__aiter__'):
+        segments = iter_list(segments)
+    current = []
+    tokens = 0
+    async for segment in segments:
+        segment_tokens = estimate_tokens(segment['text'])
+        if current and tokens + segment_tokens > budget:
+            yield make_section(current)
+            current, tokens = [], 0
+        current.append(segment)
+        tokens += segment_tokens
+    if current:
+        yield make_section(current)
+
+
+def segments_from_text(text):
+    """Fallback segments for plain text transcripts: one per paragraph, without timestamps."""
+    return [{'start': 0, 'end': 0, 'text': part} for part in text.split("\n") if part.strip()]
+
+
+class Summarizer:
+    """
+    Map-reduce summarizer: sections are summarized concurrently with a bounded
+    worker pool, then the partial summaries are reduced into the final summary.
+    Section summaries are cached, so a different final prompt reuses the map stage.
+    """
+
+    def __init__(self, session, cache=None, max_workers=SUMMARY_MAX_WORKERS, section_tokens=SUMMARY_SECTION_TOKENS):
+        self.session = session
+        self.cache = cache
+        self.section_tokens = section_tokens
+        self.scheduler = TranscriptionScheduler(max_in_flight=max_workers, rate=0)
+        self.stats = {}
+
+    def record(self, stage, latency, usage):
+        entry = self.stats.setdefault(stage, {'requests': 0, 'seconds': 0.0, 'prompt_tokens': 0, 'completion_tokens': 0})
+        entry['requests'] += 1
+        entry['seconds'] += latency
+        entry['prompt_tokens'] += usage.get('prompt_tokens', 0)
+        entry['completion_tokens'] += usage.get('completion_tokens', 0)
+
+    async def complete(self, prompt, stage):
+        """Send one chat-completion request and return the message content."""
+        payload = {
+            'model': CONFIG['MODEL'],
+            'messages': [
+                {'role': 'system', 'content': SYSTEM_PROMPT},
+                {'role': 'user', 'content': prompt},
+            ],
+            'max_tokens': SUMMARY_MAX_TOKENS,
+            'temperature': 0.7,
+        }
+        started = time.perf_counter()
+        try:
+            async with self.session.post(
+                f"{CONFIG['API_BASE']}/chat/completions",
+                json=payload,
+                headers={'Authorization': f'Bearer {CONFIG["API_KEY"]}'}
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise SummaryError(
+                        f"Summary API error ({response.status}): {error_text}",
+                        retryable=response.status in RETRYABLE_STATUSES,
+                        retry_after=parse_retry_after(response.headers.get('Retry-After'))
+                    )
+                result = await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise SummaryError(f"Network error calling summary API: {str(e)}", retryable=True)
+
+        finished = time.perf_counter()
+        usage = result.get('usage') or {}
+        self.record(stage, finished - started, usage)
+        METRICS.record_span('summary_api', started, finished, stage=stage, tokens=usage.get('total_tokens', 0))
+        return result['choices'][0]['message']['content'].strip()
+
+    async def run_stage(self, prompts, stage):
+        """Run prompts concurrently through the worker pool; returns contents in order."""
+        results = await self.scheduler.run(
+            list(enumerate(prompts)),
+            lambda item: self.complete(item[1], stage),
+            key=lambda item: (stage, item[0])
+        )
+        contents = []
+        for index in range(len(prompts)):
+            entry = results[(stage, index)]
+            if entry['state'] != 'done':
+                raise SummaryError(f"{stage} request {index + 1} failed: {entry['error']}")
+            contents.append(entry['result'])
+        self.scheduler.results.clear()
+        return contents
+
+    async def map_section(self, number, section):
+        """Summarize one section, or return its cached summary; returns (summary, cached)."""
+        prompt = SECTION_PROMPT.format(
+            number=number, start=format_timestamp(section['start']), end=format_timestamp(section['end']),
+            text=section['text']
+        )
+        key = None
+        if self.cache is not None:
+            key = chunk_key(prompt.encode('utf-8'), CONFIG['MODEL'], {'stage': 'section'})
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached['summary'], True
+
+        entry = await self.scheduler.submit(
+            (number, prompt), lambda item: self.complete(item[1], 'map'), key=lambda item: ('map', item[0])
+        )
+        if entry['state'] != 'done':
+            raise SummaryError(f"map request {number} failed: {entry['error']}")
+        if key is not None:
+            self.cache.put(key, {'summary': entry['result']})
+        return entry['result'], False
+
+    async def map_sections(self, sections):
+        """
+        Summarize every section, reusing cached section summaries. sections is
+        a list or an async iterator; each section is sent as soon as it arrives.
+        """
+        if not hasattr(sections, '__aiter__'):
+            sections = iter_list(sections)
+        tasks = []
+        try:
+            async for section in sections:
+                tasks.append(asyncio.create_task(self.map_section(len(tasks) + 1, section)))
+            results = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.scheduler.results.clear()
+
+        cached = sum(1 for _, hit in results if hit)
+        logging.info(f"Summarized {len(results) - cached} of {len(results)} sections ({cached} cached)")
+        return [summary for summary, _ in results]
+
+    async def reduce(self, summaries, final_prompt):
+        """Merge partial summaries level by level until they fit into one final request."""
+        level = 0
+        while len(summaries) > 1 and estimate_tokens("\n\n".join(summaries)) > self.section_tokens:
+            level += 1
+            groups = []
+            current, tokens = [], 0
+            for summary in summaries:
+                summary_tokens = estimate_tokens(summary)
+                if current and tokens + summary_tokens > self.section_tokens:
+                    groups.append(current)
+                    current, tokens = [], 0
+                current.append(summary)
+                tokens += summary_tokens
+            groups.append(current)
+            if len(groups) == len(summaries):
+                break
+            logging.info(f"Reduce level {level}: merging {len(summaries)} summaries into {len(groups)}")
+            summaries = await self.run_stage(
+                [MERGE_PROMPT.format(text="\n\n".join(group)) for group in groups], f"reduce-{level}"
+            )
+
+        content = "\n\n".join(f"Section {i + 1}:\n{summary}" for i, summary in enumerate(summaries))
+        return (await self.run_stage([f"{final_prompt}\n\nContent:\n{content}"], 'final'))[0]
+
+    async def summarize(self, segments, prompt=None):
+        """
+        Summarize transcript segments; prompt is appended to the final instructions
+        like the web backend does. segments may be an async iterator such as
+        TranscriptWriter.segments(), so sections are summarized while the rest
+        of the episode is still being transcribed. Returns None if there is
+        nothing to summarize.
+        """
+        started = time.perf_counter()
+        final_prompt = FINAL_PROMPT + (f"\n\n{prompt}" if prompt else "")
+        summaries = await self.map_sections(stream_sections(segments, self.section_tokens))
+        if not summaries:
+            logging.warning("Transcript has no text to summarize")
+            return None
+        summary = await self.reduce(summaries, final_prompt)
+
+        for stage, entry in self.stats.items():
+            logging.info(f"Summary {stage}: {entry['requests']} request(s), {entry['seconds']:.2f}s, "
+                         f"{entry['prompt_tokens']} prompt / {entry['completion_tokens']} completion tokens")
+        logging.info(f"Summary of {len(summaries)} sections took {time.perf_counter() - started:.2f}s")
+        return summary
@@ -1,61 +1,87 @@
-import os
-import time
 import asyncio
-import aiohttp
 import aiofiles
-import openai
 import logging
 from pathlib import Path
 import subprocess
-from datetime import datetime
-from config import API_KEY, API_BASE
+from config import API_KEY, API_BASE, TRANSCRIPTION_ENGINE
+from scheduler import TranscriptionScheduler
+from cache import TranscriptCache, chunk_key
+from engines import TranscriptionError, create_engine
+from upload import chunk_source
+from assembly import assemble, chunks_from_files, write_transcript
+from httpclient import HttpClient
+from metrics import METRICS
 
 # Configuration
 CONFIG = {
     'API_KEY': API_KEY,
     'API_BASE': API_BASE,
+    'MODEL': 'whisper-1',
+    # verbose_json returns timed segments alongside the text
+    'RESPONSE_FORMAT': 'verbose_json',
+    'ENGINE': TRANSCRIPTION_ENGINE,
 }
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Engines created so far, by name; the local engine keeps its worker processes
+ENGINES = {}
+
 logger = logging.getLogger(__name__)
 
-# Configure OpenAI
-openai.api_key = CONFIG['API_KEY']
-openai.api_base = CONFIG['API_BASE']
+def get_engine(name=None):
+    """The transcription engine called name (CONFIG['ENGINE'] by default), created once per process."""
+    name = name or CONFIG['ENGINE']
+    if name not in ENGINES:
+        ENGINES[name] = create_engine(name, CONFIG)
+    return ENGINES[name]
 
-async def transcribe_audio(session, file_path):
-    """Transcribe audio file using OpenAI API."""
-    try:
-        logger.info(f"Starting transcription of {file_path.name}")
-        
-        form_data = aiohttp.FormData()
-        form_data.add_field('file', 
-                           open(file_path, 'rb'),
-                           filename=file_path.name,
-                           content_type='audio/mpeg')
-        form_data.add_field('model', 'whisper-1')
-        
-        async with session.post(
-            f"{CONFIG['API_BASE']}/audio/transcriptions",
-            data=form_data,
-            headers={'Authorization': f'Bearer {CONFIG["API_KEY"]}'}
-        ) as response:
-            if response.status == 200:
-                result = await response.json()
-                logger.info(f"Successfully transcribed {file_path.name}")
-                return file_path, result.get('text', '')
-            else:
-                error_text = await response.text()
-                logger.error(f"API error for {file_path.name}: {error_text}")
-                return file_path, None
-                
-    except Exception as e:
-        logger.error(f"Error processing {file_path.name}: {str(e)}")
-        return file_path, None
+def close_engines():
+    """Close every engine created so far, which stops the local engine's workers and frees their models."""
+    while ENGINES:
+        _, engine = ENGINES.popitem()
+        engine.close()
+
+async def cached_transcription(chunk, cache, engine=None):
+    """
+    Look a chunk up in the cache, without any network I/O. Returns (key,
+    result), with result None on a miss; the key goes on to transcribe_audio.
+    """
+    engine = engine or get_engine()
+    name, source = chunk_source(chunk)
+    # Hashing a chunk file or buffer takes a while; it runs in a worker thread, off the event loop
+    key = await asyncio.to_thread(chunk_key, source, engine.model, engine.params)
+    cached = cache.get(key)
+    METRICS.count('cache_lookups', result='hit' if cached is not None else 'miss')
+    if cached is not None:
+        logger.info(f"Cache hit for {name}")
+    return key, cached
+
+async def transcribe_audio(session, chunk, cache=None, engine=None, key=None):
+    """
+    Transcribe audio with the configured engine (the API by default). Raises
+    on failure; TranscriptionError marks retryable API errors.
+    chunk is a file path or a splitter chunk dict, which may hold its audio in
+    memory. Returns (chunk, {'text', 'segments'}) with segment times relative
+    to the chunk. With a cache, previously seen audio is answered without any
+    network I/O; pass the key of a chunk already looked up to skip the lookup.
+    """
+    engine = engine or get_engine()
+    name, source = chunk_source(chunk)
+    if cache is not None and key is None:
+        key, cached = await cached_transcription(chunk, cache, engine)
+        if cached is not None:
+            return chunk, cached
+    
+    # Chunks the engine cannot take fail for good; retrying cannot help
+    limit_error = engine.check(chunk)
+    if limit_error:
+        raise TranscriptionError(limit_error)
+    
+    logger.info(f"Starting transcription of {name}")
+    transcript = await engine.transcribe(session, chunk)
+    logger.info(f"Successfully transcribed {name}")
+    if cache is not None:
+        cache.put(key, transcript)
+    return chunk, transcript
 
 async def save_transcript(transcript, output_path):
     """Save transcript to a text file."""
@@ -71,15 +97,38 @@ async def save_transcript(transcript, output_path):
         logger.error(f"Error saving transcript: {str(e)}")
         return False
 
-async def process_and_save(session, mp3_file, splitted_dir):
-    """Process single file and save its transcript."""
-    file_path, transcript = await transcribe_audio(session, mp3_file)
-    if transcript:
-        output_file = splitted_dir / f"{file_path.stem}.txt"
-        if await save_transcript(transcript, output_file):
-            return file_path.stem, transcript
+async def save_result(chunk, result, splitted_dir):
+    """Save the transcript of one chunk; returns (name, result), or (None, None) if nothing was saved."""
+    if result['text']:
+        stem = Path(chunk_source(chunk)[0]).stem
+        output_file = splitted_dir / f"{stem}.txt"
+        if await save_transcript(result['text'], output_file):
+            return stem, result
     return None, None
 
+async def process_and_save(session, mp3_file, splitted_dir, cache=None, key=None):
+    """
+    Process single file (path or chunk dict) and save its transcript.
+    Returns (name, transcription result), or (None, None) if nothing was saved.
+    """
+    chunk, result = await transcribe_audio(session, mp3_file, cache, key=key)
+    return await save_result(chunk, result, splitted_dir)
+
+async def schedule_chunk(scheduler, session, chunk, splitted_dir, cache=None, key=None):
+    """
+    process_and_save through the scheduler, which keeps its entry under
+    key(chunk). Chunks found in the cache are saved at once and take no slot
+    or rate-limit token; only misses are submitted. Returns the result entry.
+    """
+    cache_key = None
+    if cache is not None:
+        cache_key, cached = await cached_transcription(chunk, cache)
+        if cached is not None:
+            return scheduler.complete(chunk, await save_result(chunk, cached, splitted_dir), key)
+    return await scheduler.submit(
+        chunk, lambda c: process_and_save(session, c, splitted_dir, cache, cache_key), key=key
+    )
+
 async def main():
     # Get current script directory
     script_dir = Path(__file__).parent.resolve()
@@ -93,53 +142,60 @@ async def main():
     splitted_dir.mkdir(parents=True, exist_ok=True)
     transcript_dir.mkdir(parents=True, exist_ok=True)
     
-    # Find MP3 files
-    mp3_files = list(input_dir.glob("*.mp3"))
-    if not mp3_files:
+    # Find MP3 files, ordered by chunk index rather than filesystem order
+    chunks = chunks_from_files(input_dir.glob("*.mp3"))
+    if not chunks:
         logger.error(f"No MP3 files found in {input_dir}")
         return
     
-    logger.info(f"Found {len(mp3_files)} MP3 files to process")
+    logger.info(f"Found {len(chunks)} MP3 files to process")
     
-    # Process all files concurrently
-    async with aiohttp.ClientSession() as session:
-        # Create tasks for all files
-        tasks = [
-            process_and_save(session, mp3_file, splitted_dir)
-            for mp3_file in mp3_files
-        ]
-        
-        # Wait for all tasks to complete
-        results = await asyncio.gather(*tasks)
-        
-        # Filter out failed transcriptions
-        successful_results = [(name, transcript) for name, transcript in results if name and transcript]
-        
-    # Create combined transcript if we have any successful transcriptions
-    if successful_results:
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        combined_content = "\n\n" + "\n\n".join(
-        #combined_content = "\n\n" + "="*50 + "\n\n".join(
-            #f"File: {filename}\n{transcript}" 
-            f"\n{transcript}" 
-            for filename, transcript in successful_results
-        )
-        
-        combined_file = transcript_dir / f"transcript_{timestamp}.txt"
+    # Process files with a bounded number of in-flight requests
+    scheduler = TranscriptionScheduler()
+    with TranscriptCache() as cache:
+        cache.evict()
+        try:
+            async with HttpClient() as client:
+                await asyncio.gather(*(
+                    schedule_chunk(scheduler, client.session, chunk, splitted_dir, cache, key=lambda c: c['index'])
+                    for chunk in chunks
+                ))
+                results = scheduler.report()
+        finally:
+            await asyncio.to_thread(close_engines)
+        logger.info(f"Transcript cache: {cache.hits} hits, {cache.misses} misses")
+    
+    # Failed chunks stay in the assembled transcript as visible gaps
+    chunk_results = []
+    for chunk in chunks:
+        entry = results[chunk['index']]
+        if entry['state'] == 'done' and entry['result'][1]:
+            chunk_results.append((chunk, entry['result'][1]))
+        else:
+            logger.error(f"Missing transcript for {chunk['name']}: {entry['error']}")
+            chunk_results.append((chunk, None))
+    
+    successful = sum(1 for _, result in chunk_results if result is not None)
+    if successful:
+        json_file, combined_file = write_transcript(assemble(chunk_results), transcript_dir)
+        logger.info(f"Created combined transcript: {combined_file}")
+        try:
+            subprocess.Popen(['notepad.exe', str(combined_file)])
+            logger.info("Opened combined transcript in Notepad")
+        except Exception as e:
+            logger.error(f"Failed to open Notepad: {str(e)}")
         
-        if await save_transcript(combined_content, combined_file):
-            logger.info(f"Created combined transcript: {combined_file}")
-            try:
-                subprocess.Popen(['notepad.exe', str(combined_file)])
-                logger.info("Opened combined transcript in Notepad")
-            except Exception as e:
-                logger.error(f"Failed to open Notepad: {str(e)}")
-                
-        logger.info(f"Successfully processed {len(successful_results)} out of {len(mp3_files)} files")
+        logger.info(f"Successfully processed {successful} out of {len(chunks)} files")
+        return json_file
     else:
         logger.warning("No successful transcriptions to combine")
 
 if __name__ == "__main__":
+    # Logging is set up by the entry point, never on import
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -0,0 +1,274 @@
+import argparse
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from config import TRANSCRIPT_INDEX, SEARCH_LIMIT
+
+# Kept next to the scripts, outside the run directories removed by workspace cleanup
+STORE_PATH = Path(__file__).parent.resolve() / "index" / "transcripts.sqlite"
+
+
+def quote_terms(query):
+    """The query as plain words for FTS5, for input that is not valid query syntax."""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+class TranscriptStore:
+    """
+    Episodes and transcript segments in SQLite with an FTS5 index of the
+    segment text. Safe to share between threads (the job server's API and
+    workers); several processes may use the same file.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS episodes ("
+            " id TEXT PRIMARY KEY, title TEXT, source TEXT, run_id TEXT,"
+            " created REAL NOT NULL, updated REAL NOT NULL, duration REAL NOT NULL DEFAULT 0,"
+            " complete INTEGER NOT NULL DEFAULT 0)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            " id INTEGER PRIMARY KEY, episode TEXT NOT NULL, chunk INTEGER NOT NULL,"
+            " start_seconds REAL NOT NULL, end_seconds REAL NOT NULL, text TEXT NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS segments_episode ON segments (episode, chunk)")
+        # External content table: the index holds only the tokens, the text stays in segments
+        self.db.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5("
+            " text, content='segments', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        )
+        self.db.execute(
+            "CREATE TRIGGER IF NOT EXISTS segments_insert AFTER INSERT ON segments BEGIN"
+            " INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text); END"
+        )
+        self.db.execute(
+            "CREATE TRIGGER IF NOT EXISTS segments_delete AFTER DELETE ON segments BEGIN"
+            " INSERT INTO segments_fts (segments_fts, rowid, text) VALUES ('delete', old.id, old.text); END"
+        )
+        self.db.commit()
+
+    def begin_episode(self, source, title=None, run_id=None, episode=None):
+        """
+        Start (or restart) indexing the episode from source and return its id,
+        which is batch.episode_id(source) unless given. Segments indexed by an
+        earlier run of the same episode are replaced.
+        """
+        from batch import episode_id
+
+        episode = episode or episode_id(source)
+        now = time.time()
+        with self.lock:
+            self.db.execute("DELETE FROM segments WHERE episode = ?", (episode,))
+            self.db.execute(
+                "INSERT INTO episodes (id, title, source, run_id, created, updated) VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (id) DO UPDATE SET title = excluded.title, source = COALESCE(excluded.source, source),"
+                " run_id = excluded.run_id,"
+                " updated = excluded.updated, duration = 0, complete = 0",
+                (episode, title, source, run_id, now, now)
+            )
+            self.db.commit()
+        return episode
+
+    def add_chunk(self, episode, record, segments, text):
+        """
+        Index one transcribed chunk: its record, segments and text as made by
+        assembly.chunk_transcript. Chunks without timed segments are indexed
+        line by line at the chunk's start. Missing chunks are skipped.
+        """
+        if record['status'] != 'transcribed':
+            return 0
+        end = record['start'] + record['duration']
+        if not segments:
+            segments = [{'start': record['start'], 'end': end, 'text': part.strip()}
+                        for part in text.split("\n") if part.strip()]
+        rows = [(episode, record['index'], segment['start'], segment['end'], segment['text'])
+                for segment in segments if segment['text']]
+        with self.lock:
+            self.db.execute("DELETE FROM segments WHERE episode = ? AND chunk = ?", (episode, record['index']))
+            self.db.executemany(
+                "INSERT INTO segments (episode, chunk, start_seconds, end_seconds, text) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self.db.execute(
+                "UPDATE episodes SET updated = ?, duration = MAX(duration, ?) WHERE id = ?", (time.time(), end, episode)
+            )
+            self.db.commit()
+        return len(rows)
+
+    def finish_episode(self, episode):
+        with self.lock:
+            self.db.execute("UPDATE episodes SET complete = 1, updated = ? WHERE id = ?", (time.time(), episode))
+            self.db.commit()
+
+    def index_transcript(self, source, transcript, title=None, run_id=None, episode=None):
+        """Index an assembled transcript (the JSON written by assembly) in one go; returns the episode id."""
+        episode = self.begin_episode(source, title or transcript.get('episode'), run_id, episode)
+        by_chunk = {}
+        for segment in transcript.get('segments', []):
+            by_chunk.setdefault(segment.get('chunk'), []).append(segment)
+        chunks = transcript.get('chunks', [])
+        # The text holds one part per chunk (see assembly.text_part), for chunks without timed segments
+        parts = transcript.get('text', "").split("\n\n\n")[1:]
+        if len(parts) != len(chunks):
+            parts = [""] * len(chunks)
+        for record, text in zip(chunks, parts):
+            self.add_chunk(episode, record, by_chunk.get(record['index'], []), text)
+        self.finish_episode(episode)
+        return episode
+
+    def search(self, query, limit=SEARCH_LIMIT, episode=None):
+        """
+        Best matching segments for an FTS5 query ('word', '"a phrase"',
+        'a OR b', 'prefix*'), most relevant first. Input that is not valid
+        query syntax is searched as plain words; a query without any words
+        finds nothing.
+        """
+        # assembly imports this module, so it is imported here rather than at the top
+        from assembly import format_timestamp
+
+        words = quote_terms(query)
+        if not words:
+            return []
+        if episode:
+            sql = (
+                "SELECT s.episode, e.title, e.source, s.start_seconds, s.end_seconds,"
+                " snippet(segments_fts, 0, '[', ']', '...', 16) AS snippet, segments_fts.rank AS score"
+                " FROM segments_fts JOIN segments s ON s.id = segments_fts.rowid JOIN episodes e ON e.id = s.episode"
+                " WHERE segments_fts MATCH ? AND s.episode = ? ORDER BY score LIMIT ?"
+            )
+        else:
+            # FTS5 keeps only the best `limit` matches while ranking; rows are looked up for those alone
+            sql = (
+                "SELECT s.episode, e.title, e.source, s.start_seconds, s.end_seconds, hits.snippet, hits.rank AS score"
+                " FROM (SELECT rowid, rank, snippet(segments_fts, 0, '[', ']', '...', 16) AS snippet"
+                " FROM segments_fts WHERE segments_fts MATCH ? ORDER BY rank LIMIT ?) AS hits"
+                " JOIN segments s ON s.id = hits.rowid JOIN episodes e ON e.id = s.episode ORDER BY hits.rank"
+            )
+        params = (episode, limit) if episode else (limit,)
+        with self.lock:
+            try:
+                rows = self.db.execute(sql, (query, *params)).fetchall()
+            except sqlite3.OperationalError:
+                try:
+                    rows = self.db.execute(sql, (words, *params)).fetchall()
+                except sqlite3.OperationalError as e:
+                    logging.warning(f"Cannot search for {query!r}: {str(e)}")
+                    rows = []
+        return [
+            {
+                'episode': row['episode'],
+                'title': row['title'],
+                'source': row['source'],
+                'start': row['start_seconds'],
+                'end': row['end_seconds'],
+                'timestamp': format_timestamp(row['start_seconds']),
+                'text': row['snippet'],
+                'score': round(row['score'], 3),
+            }
+            for row in rows
+        ]
+
+    def counts(self):
+        with self.lock:
+            episodes = self.db.execute("SELECT COUNT(*) FROM episodes").fetchone()[0]
+            segments = self.db.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        return {'episodes': episodes, 'segments': segments}
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_store(path=STORE_PATH):
+    """The transcript index, or None if TRANSCRIPT_INDEX is off or it cannot be opened (e.g. SQLite without FTS5)."""
+    if not TRANSCRIPT_INDEX:
+        return None
+    try:
+        return TranscriptStore(path)
+    except sqlite3.Error as e:
+        logging.warning(f"Transcript index unavailable, transcripts are not indexed: {str(e)}")
+        return None
+
+
+def try_index(method, *args, **kwargs):
+    """
+    Call a TranscriptStore method for a pipeline that is writing a transcript;
+    its files do not depend on the index, so errors are logged, not raised.
+    """
+    try:
+        return method(*args, **kwargs)
+    except Exception as e:
+        logging.error(f"Error indexing transcript: {str(e)}")
+        return None
+
+
+def index_directory(store, directory):
+    """
+    Index the transcripts of a run directory (src/runs/<run-id>) or batch
+    episode directory (src/workspace/<episode-id>), e.g. from before the index
+    existed. Returns the ids of the indexed episodes.
+    """
+    directory = Path(directory)
+    # Batch episode directories are named by episode id; runs record their input in the manifest
+    source, run_id, episode = None, None, directory.name
+    manifest_path = directory / "manifest.json"
+    if manifest_path.exists():
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        source, run_id, episode = manifest.get('input'), manifest.get('run_id'), None
+    episodes = []
+    for json_path in sorted((directory / "transcript").glob("transcript_*.json")):
+        with open(json_path, 'r', encoding='utf-8') as f:
+            transcript = json.load(f)
+        episodes.append(store.index_transcript(source, transcript, run_id=run_id, episode=episode))
+    return episodes
+
+
+def print_hits(hits):
+    if not hits:
+        print("No matches")
+    for hit in hits:
+        print(f"{hit['episode']} [{hit['timestamp']}] {hit['title'] or ''}\n    {hit['text']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search and index transcripts")
+    commands = parser.add_subparsers(dest='command', required=True)
+    search = commands.add_parser('search', help="find episodes and timestamps matching a query")
+    search.add_argument('query')
+    search.add_argument('--limit', type=int, default=SEARCH_LIMIT)
+    search.add_argument('--episode', help="only search this episode id")
+    search.add_argument('--json', action='store_true', help="print the hits as JSON")
+    index = commands.add_parser('index', help="index the transcripts of existing run or episode directories")
+    index.add_argument('directories', nargs='+')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    with TranscriptStore() as store:
+        if args.command == 'search':
+            started = time.perf_counter()
+            hits = store.search(args.query, args.limit, args.episode)
+            if args.json:
+                print(json.dumps(hits, ensure_ascii=False, indent=2))
+            else:
+                print_hits(hits)
+                print(f"\n{len(hits)} hit(s) in {(time.perf_counter() - started) * 1000:.1f}ms")
+        else:
+            for directory in args.directories:
+                for episode in index_directory(store, directory):
+                    print(f"Indexed {episode} from {directory}")
+            print(store.counts())
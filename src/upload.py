@@ -0,0 +1,104 @@
+import logging
+import os
+import time
+import aiofiles
+import aiohttp
+from aiohttp import payload
+from metrics import METRICS
+
+# Bytes read from disk or memory per write to the connection
+UPLOAD_BLOCK_SIZE = 256 * 1024
+
+# Content types of the chunk formats the splitter produces
+CONTENT_TYPES = {
+    '.mp3': 'audio/mpeg',
+    '.ogg': 'audio/ogg',
+}
+
+
+def chunk_source(chunk):
+    """
+    Return (name, source) for a chunk given as a file path or a splitter chunk
+    dict. source is a path on disk or an in-memory bytes-like buffer.
+    """
+    if isinstance(chunk, dict):
+        if chunk.get('data') is not None:
+            return chunk['name'], chunk['data']
+        return os.path.basename(chunk['path']), chunk['path']
+    return os.path.basename(chunk), chunk
+
+
+class ChunkPayload(payload.Payload):
+    """
+    Multipart file part that streams an audio chunk in bounded-size reads,
+    from disk (opened and closed per upload) or from an in-memory buffer.
+    """
+
+    def __init__(self, source, filename, block_size=UPLOAD_BLOCK_SIZE, content_type='audio/mpeg'):
+        in_memory = isinstance(source, (bytes, bytearray, memoryview))
+        super().__init__(source, filename=filename, content_type=content_type)
+        self._size = len(source) if in_memory else os.path.getsize(source)
+        self.in_memory = in_memory
+        self.block_size = block_size
+        self.bytes_sent = 0
+        self.started = None
+        self.finished = None
+
+    async def write(self, writer):
+        self.bytes_sent = 0
+        self.started = time.perf_counter()
+        if self.in_memory:
+            view = memoryview(self._value)
+            for offset in range(0, len(view), self.block_size):
+                block = view[offset:offset + self.block_size]
+                await writer.write(block)
+                self.bytes_sent += len(block)
+        else:
+            async with aiofiles.open(self._value, 'rb') as f:
+                while True:
+                    block = await f.read(self.block_size)
+                    if not block:
+                        break
+                    await writer.write(block)
+                    self.bytes_sent += len(block)
+        self.finished = time.perf_counter()
+
+    def decode(self, encoding='utf-8', errors='strict'):
+        raise TypeError("Audio chunk payloads are streamed and cannot be decoded to text")
+
+
+def build_upload_form(chunk, fields):
+    """
+    Build a multipart/form-data body with the chunk as its 'file' part.
+    Returns (writer, file_payload) so upload statistics can be read afterwards.
+    """
+    name, source = chunk_source(chunk)
+    form = aiohttp.MultipartWriter('form-data')
+    for key, value in fields.items():
+        part = form.append(str(value))
+        part.set_content_disposition('form-data', name=key)
+
+    content_type = CONTENT_TYPES.get(os.path.splitext(name)[1].lower(), 'audio/mpeg')
+    file_payload = ChunkPayload(source, name, content_type=content_type)
+    file_payload.set_content_disposition('form-data', name='file', filename=name)
+    form.append_payload(file_payload)
+    return form, file_payload
+
+
+def log_upload_stats(name, file_payload, response_at):
+    """Log upload throughput and time to first byte of the response."""
+    if file_payload.started is None or file_payload.finished is None:
+        return None
+    upload_seconds = max(file_payload.finished - file_payload.started, 1e-9)
+    stats = {
+        'bytes': file_payload.bytes_sent,
+        'upload_seconds': upload_seconds,
+        'bytes_per_second': file_payload.bytes_sent / upload_seconds,
+        'ttfb_seconds': max(0.0, response_at - file_payload.finished),
+    }
+    METRICS.record_span('upload', file_payload.started, file_payload.finished, chunk=name, bytes=stats['bytes'])
+    METRICS.record_span('api_wait', file_payload.finished, max(response_at, file_payload.finished), chunk=name)
+    METRICS.count('upload_bytes', stats['bytes'])
+    logging.info(f"Uploaded {name}: {stats['bytes'] / (1024 * 1024):.2f}MB at "
+                 f"{stats['bytes_per_second'] / (1024 * 1024):.2f}MB/s, TTFB {stats['ttfb_seconds']:.2f}s")
+    return stats
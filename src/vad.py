@@ -0,0 +1,154 @@
+import logging
+import numpy as np
+from config import VAD_MIN_SKIP_SECONDS, VAD_PADDING_SECONDS
+from metrics import METRICS
+from silence import ANALYSIS_SAMPLE_RATE, FRAME_MS, frame_rms, iter_pcm_frames
+
+# Frames per classification window; speech is judged on one-second windows
+WINDOW_FRAMES = 1000 // FRAME_MS
+# Frames below this RMS (about -50 dBFS) are silent regardless of the episode's level
+SILENCE_RMS = 0.003
+# Frames below this multiple of the episode's noise floor count as silent too
+NOISE_FLOOR_FACTOR = 2.0
+NOISE_FLOOR_PERCENTILE = 10
+# A window that is mostly silent frames is dead air
+SILENT_WINDOW_RATIO = 0.9
+# Speech alternates syllables and short pauses, and voiced and unvoiced sounds.
+# A window is speech if enough of its frames are well below its mean energy
+# (low short-time energy ratio) or well above its mean zero-crossing rate
+# (high zero-crossing rate ratio); sustained music and tones have neither.
+LOW_ENERGY_FACTOR = 0.5
+LOW_ENERGY_RATIO = 0.15
+HIGH_ZCR_FACTOR = 1.5
+HIGH_ZCR_RATIO = 0.15
+
+
+def frame_features(file_path, sample_rate=ANALYSIS_SAMPLE_RATE, frame_ms=FRAME_MS):
+    """
+    Decode a file in streamed windows and return the RMS energy and the
+    zero-crossing rate of every frame_ms frame, as two float32 arrays.
+    """
+    rms_parts = []
+    zcr_parts = []
+
+    for frames in iter_pcm_frames(file_path, sample_rate, frame_ms):
+        rms_parts.append(frame_rms(frames))
+        signs = np.signbit(frames)
+        zcr_parts.append(np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1).astype(np.float32) / frames.shape[1])
+
+    if not rms_parts:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+    return np.concatenate(rms_parts), np.concatenate(zcr_parts)
+
+
+def speech_windows(rms, zcr, window_frames=WINDOW_FRAMES):
+    """Classify consecutive windows of window_frames frames; returns a bool array, True for speech."""
+    count = len(rms) // window_frames
+    if count == 0:
+        return np.ones(1 if len(rms) else 0, dtype=bool)
+    # A trailing partial window goes with the last full one
+    rms_w = rms[:count * window_frames].reshape(count, window_frames)
+    zcr_w = zcr[:count * window_frames].reshape(count, window_frames)
+
+    floor = max(SILENCE_RMS, np.percentile(rms, NOISE_FLOOR_PERCENTILE) * NOISE_FLOOR_FACTOR)
+    silent = np.mean(rms_w < floor, axis=1) >= SILENT_WINDOW_RATIO
+
+    mean_rms = np.mean(rms_w, axis=1, keepdims=True)
+    mean_zcr = np.mean(zcr_w, axis=1, keepdims=True)
+    low_energy = np.mean(rms_w < LOW_ENERGY_FACTOR * mean_rms, axis=1)
+    high_zcr = np.mean(zcr_w > HIGH_ZCR_FACTOR * mean_zcr, axis=1)
+    return ~silent & ((low_energy >= LOW_ENERGY_RATIO) | (high_zcr >= HIGH_ZCR_RATIO))
+
+
+def skip_regions(speech, duration_ms, window_ms=WINDOW_FRAMES * FRAME_MS,
+                 min_skip_seconds=VAD_MIN_SKIP_SECONDS, padding_seconds=VAD_PADDING_SECONDS):
+    """
+    Turn per-window speech flags into (start_ms, end_ms) stretches to skip:
+    runs of non-speech of at least min_skip_seconds, less padding_seconds on
+    each side that borders speech, so words at the edges are never clipped.
+    """
+    regions = []
+    padding_ms = padding_seconds * 1000
+    # Pad with speech on both sides so every non-speech run has a start and an end
+    edges = np.diff(np.concatenate(([True], speech, [True])).astype(np.int8))
+    starts = np.flatnonzero(edges == -1)
+    ends = np.flatnonzero(edges == 1)
+    for start, end in zip(starts, ends):
+        start_ms = start * window_ms + (padding_ms if start > 0 else 0)
+        end_ms = end * window_ms - padding_ms if end < len(speech) else duration_ms
+        if end_ms - start_ms >= min_skip_seconds * 1000:
+            regions.append((float(start_ms), float(end_ms)))
+    return regions
+
+
+def detect_non_speech(file_path, features=None):
+    """
+    Find the stretches of an episode without speech (intros, music beds,
+    dead air) that can be left out of transcription. features is the
+    (rms, zcr) of frame_features, if already computed. Returns a list of
+    (start_ms, end_ms) in the episode's timeline.
+    """
+    if features is None:
+        with METRICS.span('decode'):
+            features = frame_features(file_path)
+    rms, zcr = features
+    duration_ms = len(rms) * FRAME_MS
+    with METRICS.span('vad', audio_seconds=round(duration_ms / 1000)):
+        regions = skip_regions(speech_windows(rms, zcr), duration_ms)
+    skipped = sum(end - start for start, end in regions) / 1000
+    logging.info(f"Voice activity: {len(regions)} non-speech stretch(es), {skipped:.0f}s of "
+                 f"{duration_ms / 1000:.0f}s can be skipped")
+    return regions
+
+
+def trimmed_ms(position_ms, regions):
+    """Map a position in the episode onto the audio that is left once regions are skipped."""
+    removed = 0.0
+    for start, end in regions:
+        if position_ms <= start:
+            break
+        removed += min(position_ms, end) - start
+    return position_ms - removed
+
+
+def episode_ms(trimmed_position_ms, regions):
+    """Map a position in the trimmed audio back onto the episode; the inverse of trimmed_ms."""
+    position = trimmed_position_ms
+    for start, end in regions:
+        if position < start:
+            break
+        position += end - start
+    return position
+
+
+def trim_envelope(envelope, regions, frame_ms=FRAME_MS):
+    """Drop the envelope frames that fall into skipped regions."""
+    keep = np.ones(len(envelope), dtype=bool)
+    for start, end in regions:
+        keep[int(start // frame_ms):int(end // frame_ms)] = False
+    return envelope[keep]
+
+
+def episode_offsets(start_ms, end_ms, regions):
+    """
+    Offset map of a chunk covering [start_ms, end_ms) of the trimmed audio:
+    (chunk_ms, episode_ms) pairs marking where each kept stretch of the chunk
+    begins in the chunk and in the episode.
+    """
+    offsets = []
+    removed = 0.0
+    position = 0.0
+    for start, end in list(regions) + [(float('inf'), None)]:
+        # The kept stretch [position, start) of the episode, in trimmed time
+        trimmed_start = position - removed
+        trimmed_end = start - removed
+        if trimmed_start >= end_ms:
+            break
+        if trimmed_end > start_ms:
+            chunk_ms = max(trimmed_start, start_ms) - start_ms
+            offsets.append((chunk_ms, start_ms + chunk_ms + removed))
+        if end is None:
+            break
+        removed += end - start
+        position = end
+    return offsets
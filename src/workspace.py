@@ -0,0 +1,217 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from config import WORKSPACE_MAX_MB, WORKSPACE_MAX_AGE_DAYS, WORKSPACE_RESUMABLE_MAX_AGE_DAYS
+from manifest import RUNS_DIR
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+# Batch episodes get their own working directory here
+WORKSPACE_DIR = Path(__file__).parent.resolve() / "workspace"
+
+# Log files of every entry point
+LOGS_DIR = Path(__file__).parent.resolve() / "logs"
+
+LOCK_NAME = ".lock"
+
+
+def try_lock(f):
+    """Take a non-blocking exclusive lock on an open file; returns whether it was taken."""
+    try:
+        if os.name == 'nt':
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+class RunLock:
+    """
+    Marks a run directory as live for as long as it is held. The lock is
+    released by the OS if the process dies, so crashed runs become resumable
+    instead of staying live forever.
+    """
+
+    def __init__(self, run_dir):
+        self.path = Path(run_dir) / LOCK_NAME
+        self.file = None
+
+    def acquire(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, 'a+')
+        if not try_lock(self.file):
+            self.file.close()
+            self.file = None
+            raise RuntimeError(f"Run directory is in use by another process: {self.path.parent}")
+        return self
+
+    def release(self):
+        if self.file is not None:
+            # Closing the file releases the lock
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def is_live(run_dir):
+    """Whether a run currently holds the lock of run_dir."""
+    path = Path(run_dir) / LOCK_NAME
+    if not path.exists():
+        return False
+    try:
+        with open(path, 'a+') as f:
+            return not try_lock(f)
+    except OSError:
+        return True
+
+
+def read_manifest(run_dir):
+    try:
+        with open(Path(run_dir) / "manifest.json", 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        # Unreadable manifests are kept; they may be mid-write
+        return {}
+
+
+def directory_usage(directory):
+    """Total bytes of the files under directory and the latest modification time among them."""
+    size = 0
+    last_used = 0.0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            size += stat.st_size
+            last_used = max(last_used, stat.st_mtime)
+    return size, last_used or os.stat(directory).st_mtime
+
+
+def scan(roots=(RUNS_DIR, WORKSPACE_DIR), logs_dir=LOGS_DIR):
+    """
+    List every run directory and loose log file under the workspace with its
+    size, last use and whether it must be kept. Returns a list of dicts.
+    """
+    entries = []
+    attached = set()
+    for root in roots:
+        if not Path(root).is_dir():
+            continue
+        for run_dir in Path(root).iterdir():
+            if not run_dir.is_dir():
+                continue
+            manifest = read_manifest(run_dir)
+            artifacts = [Path(p) for p in (manifest or {}).get('artifacts', [])]
+            attached.update(artifacts)
+            size, last_used = directory_usage(run_dir)
+            for artifact in artifacts:
+                if artifact.is_file():
+                    size += artifact.stat().st_size
+            if is_live(run_dir):
+                keep = 'live'
+            elif manifest is not None and not manifest.get('finished'):
+                keep = 'resumable'
+            else:
+                keep = None
+            entries.append({'path': run_dir, 'artifacts': artifacts, 'size': size, 'last_used': last_used, 'keep': keep})
+
+    # Logs this process is still writing are kept as well
+    open_logs = {Path(handler.baseFilename) for handler in logging.getLogger().handlers
+                 if isinstance(handler, logging.FileHandler)}
+    if Path(logs_dir).is_dir():
+        for log_file in Path(logs_dir).glob('*.log'):
+            if log_file in attached or log_file in open_logs:
+                continue
+            stat = log_file.stat()
+            entries.append({'path': log_file, 'artifacts': [], 'size': stat.st_size, 'last_used': stat.st_mtime, 'keep': None})
+    return entries
+
+
+def remove(entry):
+    try:
+        if entry['path'].is_dir():
+            shutil.rmtree(entry['path'])
+        else:
+            entry['path'].unlink()
+        for artifact in entry['artifacts']:
+            if artifact.is_file():
+                artifact.unlink()
+        return True
+    except OSError as e:
+        # Open log files cannot be removed on Windows; they go in a later cleanup
+        logging.warning(f"Could not remove {entry['path']}: {str(e)}")
+        return False
+
+
+def collect_garbage(max_mb=WORKSPACE_MAX_MB, max_age_days=WORKSPACE_MAX_AGE_DAYS,
+                    roots=(RUNS_DIR, WORKSPACE_DIR), logs_dir=LOGS_DIR,
+                    resumable_max_age_days=WORKSPACE_RESUMABLE_MAX_AGE_DAYS):
+    """
+    Remove finished runs and loose logs older than max_age_days, then the
+    least recently used ones until everything fits in max_mb. Resumable runs
+    only expire after resumable_max_age_days; live runs are never removed.
+    Returns a summary dict.
+    """
+    entries = scan(roots, logs_dir)
+    total = sum(entry['size'] for entry in entries)
+    candidates = sorted((entry for entry in entries if entry['keep'] != 'live'), key=lambda entry: entry['last_used'])
+    cutoff = time.time() - max_age_days * 86400 if max_age_days is not None else None
+    resumable_cutoff = (time.time() - resumable_max_age_days * 86400
+                        if resumable_max_age_days is not None else None)
+    limit = max_mb * 1024 * 1024 if max_mb is not None else None
+
+    removed = 0
+    freed = 0
+    for entry in candidates:
+        if entry['keep'] == 'resumable':
+            # Not removed to make room, only once abandoned
+            expired = resumable_cutoff is not None and entry['last_used'] < resumable_cutoff
+            over_limit = False
+        else:
+            expired = cutoff is not None and entry['last_used'] < cutoff
+            over_limit = limit is not None and total - freed > limit
+        if not (expired or over_limit):
+            continue
+        if entry['path'].is_dir() and is_live(entry['path']):
+            # Picked up again since the scan
+            continue
+        if remove(entry):
+            removed += 1
+            freed += entry['size']
+
+    kept = sum(1 for entry in entries if entry['keep'] and entry['path'].exists())
+    logging.info(f"Workspace cleanup: removed {removed} item(s), freed {freed / 1024 / 1024:.1f}MB, "
+                 f"{(total - freed) / 1024 / 1024:.1f}MB in use, {kept} live or resumable run(s) kept")
+    return {'removed': removed, 'freed_bytes': freed, 'used_bytes': total - freed, 'kept': kept}
+
+
+def start_collection(**kwargs):
+    """Run collect_garbage in a background thread so startup does not wait for it."""
+    def run():
+        try:
+            collect_garbage(**kwargs)
+        except Exception as e:
+            logging.error(f"Workspace cleanup failed: {str(e)}")
+
+    thread = threading.Thread(target=run, name='workspace-gc', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# The scripts in src import each other as top-level modules; the stub servers live in tools
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "src"))
+sys.path.insert(0, str(ROOT_DIR / "tools"))
@@ -0,0 +1,102 @@
+import asyncio
+import json
+from assembly import TranscriptWriter, assemble
+
+
+def make_chunk(index, seconds=60):
+    return {'index': index, 'name': f"episode-{index}.mp3", 'start_ms': (index - 1) * seconds * 1000,
+            'duration_ms': seconds * 1000}
+
+
+def make_result(index):
+    return {'text': f"chunk {index}", 'segments': [{'start': 1.0, 'end': 2.5, 'text': f" chunk {index} "}]}
+
+
+def test_writer_appends_chunks_in_order_as_they_arrive(tmp_path):
+    writer = TranscriptWriter(tmp_path, episode="Episode")
+    writer.add(make_chunk(2), make_result(2))
+    # Chunk 2 waits for chunk 1
+    assert writer.text_path.read_text(encoding='utf-8') == ""
+
+    writer.add(make_chunk(1), make_result(1))
+    assert writer.text_path.read_text(encoding='utf-8') == "\n\n\nchunk 1\n\n\nchunk 2"
+
+    writer.add(make_chunk(4), make_result(4))
+    writer.add(make_chunk(3), None)
+    json_path, text_path = writer.close()
+
+    text = text_path.read_text(encoding='utf-8')
+    assert text.endswith("[missing transcript 00:02:00 - 00:03:00]\n\n\nchunk 4")
+    transcript = json.loads(json_path.read_text(encoding='utf-8'))
+    assert transcript['episode'] == "Episode"
+    assert [chunk['status'] for chunk in transcript['chunks']] == ['transcribed', 'transcribed', 'missing',
+                                                                     'transcribed']
+    assert [segment['start'] for segment in transcript['segments']] == [1.0, 61.0, 181.0]
+
+
+def test_writer_matches_the_batch_assembly(tmp_path):
+    chunk_results = [(make_chunk(index), make_result(index) if index != 2 else None) for index in (3, 1, 2)]
+    writer = TranscriptWriter(tmp_path)
+    for chunk, result in chunk_results:
+        writer.add(chunk, result)
+    json_path, _ = writer.close()
+
+    streamed = json.loads(json_path.read_text(encoding='utf-8'))
+    batch = assemble(chunk_results)
+    for field in ('chunks', 'segments', 'text'):
+        assert streamed[field] == batch[field]
+
+
+def test_close_writes_chunks_held_back_by_a_gap(tmp_path):
+    writer = TranscriptWriter(tmp_path)
+    writer.add(make_chunk(1), make_result(1))
+    # Chunk 2 never arrives
+    writer.add(make_chunk(3), make_result(3))
+    _, text_path = writer.close()
+    assert text_path.read_text(encoding='utf-8') == "\n\n\nchunk 1\n\n\nchunk 3"
+
+
+def test_segments_are_streamed_in_order_until_close(tmp_path):
+    async def run():
+        writer = TranscriptWriter(tmp_path)
+        received = []
+
+        async def consume():
+            async for segment in writer.segments():
+                received.append((segment['chunk'], segment['text']))
+
+        consumer = asyncio.create_task(consume())
+        writer.add(make_chunk(2), make_result(2))
+        await asyncio.sleep(0)
+        assert received == []
+
+        writer.add(make_chunk(1), make_result(1))
+        await asyncio.sleep(0)
+        assert received == [(1, "chunk 1"), (2, "chunk 2")]
+
+        # A chunk transcribed without timed segments is streamed as its text
+        writer.add(make_chunk(3), {'text': "line one\nline two", 'segments': []})
+        writer.close()
+        await asyncio.wait_for(consumer, 1)
+        return received
+
+    received = asyncio.run(run())
+    assert received[2:] == [(3, "line one"), (3, "line two")]
+
+
+def test_discard_removes_the_partial_transcript(tmp_path):
+    async def run():
+        writer = TranscriptWriter(tmp_path)
+        writer.add(make_chunk(1), make_result(1))
+        consumer = asyncio.create_task(collect(writer.segments()))
+        await asyncio.sleep(0)
+        writer.discard()
+        return writer, await asyncio.wait_for(consumer, 1)
+
+    async def collect(iterator):
+        return [segment async for segment in iterator]
+
+    writer, segments = asyncio.run(run())
+    assert len(segments) == 1
+    assert not writer.text_path.exists()
+    assert not writer.json_path.exists()
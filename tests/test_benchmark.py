@@ -0,0 +1,65 @@
+import json
+import pytest
+from benchmark import compare_results, synthetic_mp3
+from mp3frames import iter_frames
+
+
+def write_results(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def record(run_id, stage, wall_seconds, peak_rss_mb=100.0, **case):
+    return {'run_id': run_id, 'revision': run_id, 'stage': stage, 'case': case,
+            'wall_seconds': wall_seconds, 'cpu_seconds': wall_seconds, 'peak_rss_mb': peak_rss_mb}
+
+
+def test_synthetic_frames_have_the_requested_duration_and_bitrate(tmp_path):
+    path = tmp_path / "synthetic.mp3"
+    synthetic_mp3(path, 60, 128)
+
+    with open(path, 'rb') as f:
+        headers = [header for header, _ in iter_frames(f)]
+    assert len(headers) == int(60 * 44100 / 1152)
+    assert {header.bitrate for header in headers} == {128}
+    # Padding slots keep the file within one frame of the exact constant bitrate size
+    exact = len(headers) * 144 * 128 * 1000 / 44100
+    assert abs(path.stat().st_size - exact) < 1
+
+
+def test_compare_flags_stages_that_grew_past_the_threshold(tmp_path):
+    path = tmp_path / "results.jsonl"
+    write_results(path, [
+        record('run1', 'split', 10.0, minutes=10),
+        record('run1', 'transcribe', 20.0, minutes=10),
+        record('run2', 'split', 10.5, minutes=10),
+        record('run2', 'transcribe', 25.0, peak_rss_mb=150.0, minutes=10),
+    ])
+
+    comparison = {entry['stage']: entry for entry in compare_results(path, threshold=0.10)}
+    assert comparison['split']['regressions'] == []
+    assert comparison['split']['changes']['wall_seconds'] == pytest.approx(0.05)
+    assert comparison['transcribe']['regressions'] == ['wall_seconds', 'cpu_seconds', 'peak_rss_mb']
+    assert comparison['transcribe']['previous'] == {'run_id': 'run1', 'revision': 'run1'}
+
+
+def test_compare_only_reports_cases_of_the_latest_run(tmp_path):
+    path = tmp_path / "results.jsonl"
+    write_results(path, [
+        record('run1', 'split', 10.0, minutes=10),
+        record('run1', 'split', 60.0, minutes=60),
+        record('run2', 'split', 30.0, minutes=10),
+        # Only measured once, so there is nothing to compare with
+        record('run2', 'split', 5.0, minutes=1),
+    ])
+
+    comparison = compare_results(path)
+    assert [entry['case'] for entry in comparison] == [{'minutes': 10}]
+    assert comparison[0]['regressions'] == ['wall_seconds', 'cpu_seconds']
+
+
+def test_compare_without_results_is_empty(tmp_path):
+    path = tmp_path / "results.jsonl"
+    path.write_text("", encoding='utf-8')
+    assert compare_results(path) == []
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import threading
+import time
+import aiohttp
+import transcript
+from cache import TranscriptCache
+from scheduler import TranscriptionScheduler
+from stubserver import StubServer
+
+
+def make_chunks(count, size=4096):
+    return [{'index': i + 1, 'name': f"chunk-{i + 1}.mp3", 'data': os.urandom(size), 'start_ms': 0}
+            for i in range(count)]
+
+
+async def schedule_all(chunks, scheduler, splitted_dir, cache):
+    async with aiohttp.ClientSession() as session:
+        return await asyncio.gather(*(
+            transcript.schedule_chunk(scheduler, session, chunk, splitted_dir, cache, key=lambda c: c['index'])
+            for chunk in chunks
+        ))
+
+
+def test_cached_chunks_skip_the_scheduler(monkeypatch, tmp_path):
+    chunks = make_chunks(20)
+    with StubServer() as server, TranscriptCache(tmp_path / "cache.sqlite") as cache:
+        monkeypatch.setitem(transcript.CONFIG, 'API_BASE', server.base_url)
+        asyncio.run(schedule_all(chunks, TranscriptionScheduler(rate=0), tmp_path / "first", cache))
+        sent = server.stats['transcribed']
+
+        # Paced at 2 requests a second, 20 requests would take about 9s
+        scheduler = TranscriptionScheduler(rate=2, max_in_flight=1)
+        started = time.perf_counter()
+        entries = asyncio.run(schedule_all(chunks, scheduler, tmp_path / "second", cache))
+        elapsed = time.perf_counter() - started
+        resent = server.stats['transcribed'] - sent
+
+    assert sent == 20
+    assert resent == 0
+    assert scheduler.stats['requests'] == 0
+    # Well below the paced time, with room for a slow machine
+    assert elapsed < 5
+    assert all(entry['state'] == 'done' and entry['result'][1]['text'] for entry in entries)
+    assert sorted(scheduler.results) == list(range(1, 21))
+    assert len(list((tmp_path / "second").glob("*.txt"))) == 20
+
+
+def test_misses_are_transcribed_once_and_cached(monkeypatch, tmp_path):
+    chunks = make_chunks(3)
+    with StubServer() as server, TranscriptCache(tmp_path / "cache.sqlite") as cache:
+        monkeypatch.setitem(transcript.CONFIG, 'API_BASE', server.base_url)
+        scheduler = TranscriptionScheduler(rate=0)
+        asyncio.run(schedule_all(chunks, scheduler, tmp_path, cache))
+        hits, misses = cache.hits, cache.misses
+
+    assert scheduler.stats['requests'] == 3
+    # Each miss is looked up once, before it is scheduled
+    assert (hits, misses) == (0, 3)
+
+
+def test_chunks_are_hashed_off_the_event_loop(monkeypatch, tmp_path):
+    threads = []
+
+    def chunk_key(source, model, params=None):
+        threads.append(threading.current_thread())
+        return "key"
+
+    monkeypatch.setattr(transcript, 'chunk_key', chunk_key)
+    with TranscriptCache(tmp_path / "cache.sqlite") as cache:
+        key, cached = asyncio.run(transcript.cached_transcription(make_chunks(1)[0], cache))
+
+    assert (key, cached) == ("key", None)
+    assert threads and threads[0] is not threading.main_thread()
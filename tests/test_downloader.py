@@ -0,0 +1,125 @@
+import json
+import os
+import downloader
+from stubserver import FileServer
+
+SIZE = 8 * 1024 * 1024 + 12345
+
+
+def episode(tmp_path):
+    path = tmp_path / "episode.mp3"
+    path.write_bytes(os.urandom(SIZE))
+    return path
+
+
+def test_parallel_ranges_download_the_exact_file(tmp_path):
+    source = episode(tmp_path)
+    destination = tmp_path / "copy.mp3"
+    with FileServer(str(source)) as server:
+        assert downloader.download_file(server.url, str(destination), segments=4)
+        stats = server.stats
+
+    assert destination.read_bytes() == source.read_bytes()
+    # The probe plus one request per segment
+    assert stats['range_requests'] == 5
+    assert not os.path.exists(f"{destination}.part")
+    assert not os.path.exists(f"{destination}.part.json")
+
+
+def test_falls_back_to_one_stream_without_ranges(tmp_path):
+    source = episode(tmp_path)
+    destination = tmp_path / "copy.mp3"
+    with FileServer(str(source), ranges=False) as server:
+        assert downloader.download_file(server.url, str(destination), segments=4)
+        stats = server.stats
+
+    assert destination.read_bytes() == source.read_bytes()
+    assert stats['range_requests'] == 0
+
+
+def test_interrupted_download_resumes_from_the_part_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(downloader, 'DOWNLOAD_RETRIES', 0)
+    source = episode(tmp_path)
+    destination = tmp_path / "copy.mp3"
+    with FileServer(str(source), fail_after=SIZE // 2) as server:
+        assert not downloader.download_file(server.url, str(destination), segments=4)
+
+    assert not destination.exists()
+    with open(f"{destination}.part.json", 'r', encoding='utf-8') as f:
+        saved = sum(segment['done'] for segment in json.load(f)['segments'])
+    assert 0 < saved < SIZE
+
+    with FileServer(str(source)) as server:
+        assert downloader.download_file(server.url, str(destination), segments=4)
+        refetched = server.stats['bytes_sent']
+
+    assert destination.read_bytes() == source.read_bytes()
+    # Only what was missing is fetched again, plus the one-byte probe
+    assert refetched == SIZE - saved + 1
+
+
+def test_changed_file_is_downloaded_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(downloader, 'DOWNLOAD_RETRIES', 0)
+    source = episode(tmp_path)
+    destination = tmp_path / "copy.mp3"
+    with FileServer(str(source), fail_after=SIZE // 2) as server:
+        assert not downloader.download_file(server.url, str(destination), segments=4)
+
+    # Same size, new content and modification time: the ETag changes
+    source.write_bytes(os.urandom(SIZE))
+    os.utime(source, (os.path.getatime(source), os.path.getmtime(source) + 10))
+    with FileServer(str(source)) as server:
+        assert downloader.download_file(server.url, str(destination), segments=4)
+        refetched = server.stats['bytes_sent']
+
+    assert destination.read_bytes() == source.read_bytes()
+    assert refetched == SIZE + 1
+
+
+def test_saved_offsets_only_cover_bytes_on_disk(tmp_path, monkeypatch):
+    monkeypatch.setattr(downloader, 'STATE_SAVE_INTERVAL', 256 * 1024)
+    source = episode(tmp_path)
+    content = source.read_bytes()
+    destination = tmp_path / "copy.mp3"
+    checked = []
+    write_json = downloader.atomic_write_json
+
+    def save_state(path, state):
+        with open(f"{destination}.part", 'rb') as f:
+            # Other segments keep advancing while the state is checked, so each offset is read once
+            offsets = [(segment['start'], segment['done']) for segment in state['segments']]
+            for start, done in offsets:
+                f.seek(start)
+                assert f.read(done) == content[start:start + done]
+        checked.append(sum(done for _, done in offsets))
+        write_json(path, state)
+
+    monkeypatch.setattr(downloader, 'atomic_write_json', save_state)
+    with FileServer(str(source)) as server:
+        assert downloader.download_file(server.url, str(destination), segments=4)
+
+    assert destination.read_bytes() == content
+    assert len(checked) > 4
+    assert checked[-1] == SIZE
+
+
+def test_download_is_checked_against_the_announced_digest(tmp_path):
+    source = episode(tmp_path)
+    for ranges in (True, False):
+        destination = tmp_path / f"copy-{ranges}.mp3"
+        with FileServer(str(source), ranges=ranges, digest=True) as server:
+            assert downloader.download_file(server.url, str(destination), segments=4)
+        assert destination.read_bytes() == source.read_bytes()
+
+
+def test_digest_mismatch_fails_and_discards_the_download(tmp_path):
+    source = episode(tmp_path)
+    destination = tmp_path / "copy.mp3"
+    with FileServer(str(source), digest=True) as server:
+        # Same size and ETag, different bytes: only the digest tells them apart
+        source.write_bytes(os.urandom(SIZE))
+        assert not downloader.download_file(server.url, str(destination), segments=4)
+
+    assert not destination.exists()
+    assert not os.path.exists(f"{destination}.part")
+    assert not os.path.exists(f"{destination}.part.json")
@@ -0,0 +1,110 @@
+import asyncio
+import aiohttp
+import pytest
+import engines
+import transcript
+from engines import HttpEngine, LocalEngine, TranscriptionError, create_engine
+from stubserver import StubServer
+
+
+def config(api_base="http://127.0.0.1:9"):
+    return {'API_KEY': 'key', 'API_BASE': api_base, 'MODEL': 'whisper-1', 'RESPONSE_FORMAT': 'verbose_json'}
+
+
+async def transcribe_chunk(engine):
+    async with aiohttp.ClientSession() as session:
+        return await engine.transcribe(session, {'index': 1, 'name': 'chunk-1.mp3', 'data': b"\0" * 1024})
+
+
+class FakeEngine:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_http_engine_is_the_default():
+    settings = config()
+    engine = create_engine('http', settings)
+    assert isinstance(engine, HttpEngine)
+    assert (engine.model, engine.params) == ('whisper-1', {'response_format': 'verbose_json'})
+
+    # The config is read on every request, so runtime changes apply
+    settings['MODEL'] = 'whisper-2'
+    assert engine.model == 'whisper-2'
+
+
+def test_local_engine_falls_back_to_the_api_without_faster_whisper(monkeypatch):
+    monkeypatch.setattr(LocalEngine, 'available', classmethod(lambda cls: False))
+    assert isinstance(create_engine('local', config()), HttpEngine)
+
+
+def test_local_engine_starts_no_workers_until_used(monkeypatch):
+    monkeypatch.setattr(LocalEngine, 'available', classmethod(lambda cls: True))
+    engine = create_engine('local', config())
+    assert isinstance(engine, LocalEngine)
+    assert engine.pool is None
+    # Local transcripts are cached apart from the API's
+    assert engine.model.startswith('faster-whisper-')
+    engine.close()
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError, match="Unknown transcription engine"):
+        create_engine('cloud', config())
+
+
+def test_engines_are_created_once_and_closed_together(monkeypatch):
+    created = []
+
+    def fake_create(name, settings):
+        created.append(FakeEngine(name))
+        return created[-1]
+
+    monkeypatch.setattr(transcript, 'ENGINES', {})
+    monkeypatch.setattr(transcript, 'create_engine', fake_create)
+    monkeypatch.setitem(transcript.CONFIG, 'ENGINE', 'http')
+
+    assert transcript.get_engine() is transcript.get_engine('http')
+    local = transcript.get_engine('local')
+    assert [engine.name for engine in created] == ['http', 'local']
+
+    transcript.close_engines()
+    assert transcript.ENGINES == {}
+    assert all(engine.closed for engine in created)
+    # A closed engine is created again on next use
+    assert transcript.get_engine('local') is not local
+
+
+def test_http_engine_transcribes_with_chunk_relative_segments():
+    with StubServer() as server:
+        result = asyncio.run(transcribe_chunk(HttpEngine(config(server.base_url))))
+    assert result['text'] == "transcript of chunk-1.mp3"
+    assert [(segment['start'], segment['end']) for segment in result['segments']] == [(0.0, 2.5), (2.5, 5.0)]
+
+
+def test_http_engine_marks_rate_limits_retryable():
+    with StubServer(error_rate=1.0, retry_after=3) as server:
+        with pytest.raises(TranscriptionError) as error:
+            asyncio.run(transcribe_chunk(HttpEngine(config(server.base_url))))
+    assert (error.value.status, error.value.retryable, error.value.retry_after) == (429, True, 3)
+
+
+def test_worker_results_are_plain_segments(monkeypatch):
+    class Segment:
+        def __init__(self, start, end, text):
+            self.start, self.end, self.text = start, end, text
+
+    class Model:
+        def transcribe(self, source, language=None, beam_size=None):
+            assert source.read() == b"audio"
+            return iter([Segment(0.0, 1.23456, " Hello"), Segment(1.23456, 2.0, " world.")]), None
+
+    monkeypatch.setattr(engines, 'worker_model', Model())
+    result = engines.transcribe_in_worker(b"audio", 'en', 5)
+    assert result == {'text': "Hello world.", 'segments': [
+        {'start': 0.0, 'end': 1.235, 'text': " Hello"},
+        {'start': 1.235, 'end': 2.0, 'text': " world."},
+    ]}
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import pytest
+
+pytest.importorskip('pyftpdlib')
+
+from ftphandler import FtpUploader, content_name
+from stubserver import FtpServer
+
+
+def make_file(path, size):
+    path.write_bytes(os.urandom(size))
+    return path
+
+
+def uploader_for(server, pool_size=1):
+    return FtpUploader(server.host, server.user, server.password, '/', pool_size, server.port)
+
+
+def test_identical_file_is_not_uploaded_again(tmp_path):
+    local = make_file(tmp_path / "transcript.txt", 64 * 1024)
+    root = tmp_path / "remote"
+    root.mkdir()
+    with FtpServer(root) as server:
+        uploader = uploader_for(server)
+        url = uploader.upload_sync(str(local))
+        uploader.upload_sync(str(local))
+        uploader.close()
+        stored = server.stats['stored']
+
+    name = content_name(str(local))
+    assert url.endswith(name)
+    assert (root / name).read_bytes() == local.read_bytes()
+    assert stored == 1
+    assert uploader.stats['uploaded'] == 1
+    assert uploader.stats['skipped'] == 1
+
+
+@pytest.mark.parametrize('rest', [True, False])
+def test_partial_upload_is_resumed(tmp_path, rest):
+    local = make_file(tmp_path / "episode.ogg", 1024 * 1024)
+    name = content_name(str(local))
+    root = tmp_path / "remote"
+    root.mkdir()
+    saved = 300 * 1024
+    (root / name).write_bytes(local.read_bytes()[:saved])
+    with FtpServer(root, rest=rest) as server:
+        uploader = uploader_for(server)
+        uploader.upload_sync(str(local))
+        uploader.close()
+        appended = server.stats['appended']
+
+    assert (root / name).read_bytes() == local.read_bytes()
+    assert uploader.stats['resumed'] == 1
+    assert uploader.stats['bytes'] == local.stat().st_size - saved
+    # Servers without REST get the rest of the file through APPE
+    assert appended == (0 if rest else 1)
+
+
+def test_server_without_size_gets_full_uploads(tmp_path):
+    local = make_file(tmp_path / "transcript.txt", 64 * 1024)
+    root = tmp_path / "remote"
+    root.mkdir()
+    with FtpServer(root, size=False) as server:
+        uploader = uploader_for(server)
+        uploader.upload_sync(str(local))
+        uploader.upload_sync(str(local))
+        uploader.close()
+        stored = server.stats['stored']
+
+    assert (root / content_name(str(local))).read_bytes() == local.read_bytes()
+    assert stored == 2
+    assert uploader.stats['uploaded'] == 2
+
+
+def test_consecutive_uploads_share_one_login(tmp_path):
+    first = make_file(tmp_path / "first.txt", 16 * 1024)
+    second = make_file(tmp_path / "second.txt", 16 * 1024)
+    root = tmp_path / "remote"
+    root.mkdir()
+    with FtpServer(root) as server:
+        uploader = uploader_for(server, pool_size=2)
+        uploader.upload_sync(str(first))
+        uploader.upload_sync(str(second))
+        uploader.close()
+        logins = server.stats['logins']
+
+    assert logins == 1
+    assert uploader.stats['uploaded'] == 2
+
+
+def test_sessions_are_reused(tmp_path):
+    paths = [make_file(tmp_path / f"transcript-{i}.txt", 16 * 1024) for i in range(12)]
+    root = tmp_path / "remote"
+    root.mkdir()
+
+    async def upload_all(uploader):
+        return await asyncio.gather(*(uploader.upload(str(path)) for path in paths))
+
+    with FtpServer(root) as server:
+        uploader = uploader_for(server, pool_size=3)
+        asyncio.run(upload_all(uploader))
+        uploader.close()
+        logins = server.stats['logins']
+
+    assert 1 <= logins <= 3
+    assert sorted(p.name for p in root.iterdir()) == sorted(content_name(str(path)) for path in paths)
@@ -0,0 +1,65 @@
+import subprocess
+import sys
+from pathlib import Path
+import main
+from benchmark import synthetic_mp3
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+# Modules the pipeline stages need, which --version and --dry-run must not load
+HEAVY_MODULES = ('aiohttp', 'requests', 'numpy', 'engines', 'transcript')
+
+
+def run_main(*args, input=None):
+    return subprocess.run([sys.executable, *args], cwd=SRC_DIR, input=input, capture_output=True, text=True,
+                          timeout=60)
+
+
+def test_audio_input_is_unquoted(monkeypatch, capsys):
+    # Windows "Copy as path" and drag and drop add quotes, terminals add spaces
+    monkeypatch.setattr('builtins.input', lambda: '  "C:\\Podcasts\\episode 12.mp3" ')
+    assert main.read_audio_input() == "C:\\Podcasts\\episode 12.mp3"
+    assert "MP3 file" in capsys.readouterr().out
+
+
+def test_dry_run_plans_local_episodes_without_writing(tmp_path, capsys):
+    episode = tmp_path / "episode.mp3"
+    synthetic_mp3(episode, 10 * 60, 64)
+
+    main.dry_run([f' "{episode}" ', "https://example.com/feed/episode.mp3"])
+
+    out = capsys.readouterr().out
+    assert "Engine: " in out
+    assert f"{episode}\n  output: " in out
+    assert "10.0 min at 64 kbps, 4 chunk(s) of at most" in out
+    assert "https://example.com/feed/episode.mp3\n" in out
+    assert "chunk plan not known yet" in out
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["episode.mp3"]
+
+
+def test_dry_run_reports_unplannable_files(tmp_path, capsys):
+    notes = tmp_path / "notes.mp3"
+    notes.write_text("not audio", encoding='utf-8')
+    main.dry_run([str(notes)])
+    assert "cannot plan chunks: No MPEG audio frames found" in capsys.readouterr().out
+
+
+def test_version_starts_without_the_pipeline():
+    result = run_main("main.py", "--version")
+    assert result.returncode == 0
+    assert result.stdout.strip() == f"main.py {main.VERSION}"
+
+    result = run_main("-c", f"import sys, main; print(sorted(set({HEAVY_MODULES!r}) & set(sys.modules)))")
+    assert result.stdout.strip() == "[]"
+
+
+def test_dry_run_reads_the_prompted_path_without_the_pipeline(tmp_path):
+    episode = tmp_path / "episode.mp3"
+    synthetic_mp3(episode, 60, 64)
+    check = (f"import sys, main; main.dry_run([main.read_audio_input()]); "
+             f"print(sorted(set({HEAVY_MODULES!r}) & set(sys.modules)))")
+
+    result = run_main("-c", check, input=f' "{episode}"\n')
+    assert result.returncode == 0, result.stderr
+    assert "1.0 min at 64 kbps" in result.stdout
+    assert result.stdout.strip().endswith("[]")
@@ -0,0 +1,87 @@
+import json
+import time
+import urllib.error
+import urllib.request
+import pytest
+import metrics
+from metrics import Metrics
+
+
+def test_spans_are_bounded_but_totals_count_every_span():
+    registry = Metrics(max_spans=3)
+    start = time.perf_counter()
+    for i in range(10):
+        registry.record_span('split', start, start + (i + 1) / 10, chunk=i)
+
+    spans = registry.snapshot()['spans']
+    assert [span['chunk'] for span in spans] == [7, 8, 9]
+    total = registry.summary()['split']
+    assert total['count'] == 10
+    assert total['seconds'] == pytest.approx(5.5)
+    assert total['max_seconds'] == pytest.approx(1.0)
+
+
+def test_failed_spans_are_labelled():
+    registry = Metrics()
+    with pytest.raises(RuntimeError):
+        with registry.span('upload', chunk=1) as labels:
+            labels['bytes'] = 10
+            raise RuntimeError("boom")
+
+    span, = registry.snapshot()['spans']
+    assert span['name'] == 'upload'
+    assert (span['chunk'], span['bytes'], span['status']) == (1, 10, 'error')
+
+
+def test_worker_snapshots_are_merged_with_labels():
+    registry = Metrics()
+    worker = Metrics()
+    start = time.perf_counter()
+    worker.record_span('split', start, start + 2)
+    worker.count('chunks', 4)
+    registry.record_span('split', start, start + 1)
+    registry.count('chunks', 1)
+
+    registry.merge(worker.snapshot(), episode='ep-1')
+
+    assert registry.summary()['split'] == {'count': 2, 'seconds': pytest.approx(3.0), 'max_seconds': pytest.approx(2.0)}
+    assert registry.snapshot()['counters'] == {('chunks', ()): 5}
+    merged = registry.snapshot()['spans'][-1]
+    assert merged['episode'] == 'ep-1'
+    # Offsets are shifted onto the registry's own clock origin
+    assert merged['start'] == pytest.approx(start - registry.origin)
+
+
+def test_export_writes_jsonl_and_prometheus(tmp_path):
+    registry = Metrics()
+    start = time.perf_counter()
+    registry.record_span('transcribe', start, start + 0.5, chunk=3)
+    registry.count('requests', 2)
+    registry.count('cache_lookups', result='hit')
+
+    jsonl_path, prom_path = registry.export(tmp_path)
+
+    records = [json.loads(line) for line in jsonl_path.read_text(encoding='utf-8').splitlines()]
+    assert {'type': 'counter', 'name': 'cache_lookups', 'value': 1, 'result': 'hit'} in records
+    assert any(record['type'] == 'span' and record['chunk'] == 3 for record in records)
+    prom = prom_path.read_text(encoding='utf-8')
+    assert 'podcast_span_seconds_count{span="transcribe"} 1' in prom
+    assert 'podcast_requests_total 2' in prom
+    assert 'podcast_cache_lookups_total{result="hit"} 1' in prom
+
+
+def test_metrics_are_served_over_http():
+    registry = Metrics()
+    registry.count('jobs', state='done')
+    server = metrics.serve(0, registry)
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(f"{base}/metrics") as response:
+            body = response.read().decode('utf-8')
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{base}/other")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert 'podcast_jobs_total{state="done"} 1' in body
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import time
+from email.utils import formatdate
+import aiohttp
+import transcript
+from scheduler import TranscriptionScheduler, parse_retry_after
+from stubserver import StubServer
+
+
+class Flaky(Exception):
+    retryable = True
+
+    def __init__(self, retry_after=None):
+        super().__init__("flaky")
+        self.retry_after = retry_after
+
+
+def make_chunks(count, size=4096):
+    return [{'index': i + 1, 'name': f"chunk-{i + 1}.mp3", 'data': os.urandom(size), 'start_ms': 0}
+            for i in range(count)]
+
+
+async def transcribe_all(chunks, scheduler):
+    async with aiohttp.ClientSession() as session:
+        return await scheduler.run(
+            chunks, lambda chunk: transcript.transcribe_audio(session, chunk), key=lambda chunk: chunk['index']
+        )
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert 50 <= parse_retry_after(formatdate(time.time() + 60, usegmt=True)) <= 60
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+
+
+def test_retryable_errors_are_retried_until_success():
+    attempts = []
+
+    async def job(item):
+        attempts.append(item)
+        if len(attempts) < 3:
+            raise Flaky()
+        return "done"
+
+    scheduler = TranscriptionScheduler(max_in_flight=1, rate=0, max_retries=5, backoff=0.01)
+    results = asyncio.run(scheduler.run(['a'], job))
+    assert results['a']['state'] == 'done'
+    assert results['a']['attempts'] == 3
+    assert scheduler.stats['retries'] == 2
+
+
+def test_gives_up_after_max_retries_and_on_permanent_errors():
+    async def flaky(item):
+        raise Flaky()
+
+    async def broken(item):
+        raise ValueError("bad request")
+
+    scheduler = TranscriptionScheduler(max_in_flight=2, rate=0, max_retries=2, backoff=0.01)
+    results = asyncio.run(scheduler.run(['a'], flaky))
+    assert results['a']['state'] == 'failed'
+    assert results['a']['attempts'] == 3
+
+    scheduler = TranscriptionScheduler(max_in_flight=2, rate=0, max_retries=2, backoff=0.01)
+    results = asyncio.run(scheduler.run(['b'], broken))
+    assert results['b']['state'] == 'failed'
+    assert results['b']['attempts'] == 1
+    assert results['b']['error'] == "bad request"
+
+
+def test_retry_after_pauses_every_new_request():
+    started = {}
+
+    async def job(item):
+        started.setdefault(item, []).append(time.monotonic())
+        if item == 'limited' and len(started[item]) == 1:
+            raise Flaky(retry_after=0.5)
+        return item
+
+    async def run():
+        scheduler = TranscriptionScheduler(max_in_flight=1, rate=0, backoff=0.001, backoff_max=0.001)
+        first = asyncio.create_task(scheduler.submit('limited', job))
+        await asyncio.sleep(0.05)
+        # Submitted after the 429: must wait for the Retry-After as well
+        second = await scheduler.submit('other', job)
+        return (await first), second, scheduler.stats
+
+    begin = time.monotonic()
+    first, second, stats = asyncio.run(run())
+    assert first['state'] == second['state'] == 'done'
+    assert started['limited'][1] - started['limited'][0] >= 0.45
+    assert started['other'][0] - begin >= 0.45
+    assert stats['rate_limited'] == 1
+
+
+def test_stub_rate_limits_are_retried(monkeypatch):
+    chunks = make_chunks(12)
+    with StubServer(latency=0.05, max_in_flight=2, retry_after=0) as server:
+        monkeypatch.setitem(transcript.CONFIG, 'API_BASE', server.base_url)
+        scheduler = TranscriptionScheduler(max_in_flight=4, rate=0, max_retries=20, backoff=0.01, backoff_max=0.05)
+        results = asyncio.run(transcribe_all(chunks, scheduler))
+        stats = server.stats
+
+    assert all(entry['state'] == 'done' for entry in results.values())
+    assert stats['transcribed'] == len(chunks)
+    assert stats['rate_limited'] > 0
+    assert scheduler.stats['retries'] == stats['rate_limited']
+    assert scheduler.stats['rate_limited'] == stats['rate_limited']
+
+
+def test_stub_sees_at_most_the_concurrency_cap(monkeypatch):
+    chunks = make_chunks(10)
+    with StubServer(latency=0.1) as server:
+        monkeypatch.setitem(transcript.CONFIG, 'API_BASE', server.base_url)
+        scheduler = TranscriptionScheduler(max_in_flight=3, rate=0)
+        results = asyncio.run(transcribe_all(chunks, scheduler))
+        stats = server.stats
+
+    assert all(entry['state'] == 'done' for entry in results.values())
+    assert results[1]['result'][1]['text'] == "transcript of chunk-1.mp3"
+    assert stats['max_in_flight'] == 3
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+import silence
+from silence import FRAME_MS, frame_rms, iter_pcm_frames, plan_cuts, plan_silence_cuts
+
+
+def speech_envelope(frames, gaps=(), seed=1):
+    """RMS envelope of speech-like noise, with silent frames at each (start, end) frame range in gaps."""
+    envelope = np.random.default_rng(seed).uniform(0.5, 1.5, frames).astype(np.float32)
+    for start, end in gaps:
+        envelope[start:end] = 0.0
+    return envelope
+
+
+def chunk_lengths(cuts, total_ms):
+    edges = [0] + list(cuts) + [total_ms]
+    return [b - a for a, b in zip(edges, edges[1:])]
+
+
+def test_cuts_land_in_the_pause_before_the_limit():
+    # 60s of speech with pauses at 18.0-18.4s and 37.0-37.4s
+    envelope = speech_envelope(3000, gaps=[(900, 920), (1850, 1870)])
+    cuts = plan_cuts(envelope, max_chunk_ms=20000, tolerance_ms=5000)
+
+    assert cuts[0] == pytest.approx(910 * FRAME_MS, abs=3 * FRAME_MS)
+    assert cuts[1] == pytest.approx(1860 * FRAME_MS, abs=3 * FRAME_MS)
+    assert max(chunk_lengths(cuts, 3000 * FRAME_MS)) <= 20000
+
+
+def test_cuts_never_exceed_the_chunk_limit():
+    envelope = speech_envelope(10000, seed=2)
+    cuts = plan_cuts(envelope, max_chunk_ms=15000, tolerance_ms=3000)
+
+    assert cuts == sorted(set(cuts))
+    lengths = chunk_lengths(cuts, 10000 * FRAME_MS)
+    assert max(lengths) <= 15000
+    # Cuts only move back within the tolerance
+    assert min(lengths[:-1]) >= 15000 - 3000 - FRAME_MS
+
+
+def test_short_audio_is_not_cut():
+    assert plan_cuts(speech_envelope(500), max_chunk_ms=20000, tolerance_ms=5000) == []
+    assert plan_silence_cuts("unused.mp3", 20000, 5000, envelope=np.zeros(0, dtype=np.float32)) == []
+
+
+def test_silence_cuts_leave_size_headroom():
+    envelope = speech_envelope(3000, gaps=[(990, 1000)])
+    cuts = plan_silence_cuts("unused.mp3", chunk_ms=20000, tolerance_ms=0, envelope=envelope)
+    assert cuts[0] <= 20000 * silence.SIZE_HEADROOM
+
+
+def test_pcm_frames_carry_samples_across_windows(monkeypatch):
+    samples = np.arange(1000, dtype=np.float32)
+    # Windows that do not line up with 160-sample frames
+    windows = [samples[:250], samples[250:700], samples[700:]]
+    monkeypatch.setattr(silence, 'iter_pcm_windows', lambda file_path, sample_rate: iter(windows))
+
+    blocks = list(iter_pcm_frames("episode.mp3", sample_rate=8000, frame_ms=20))
+    assert [block.shape for block in blocks] == [(1, 160), (3, 160), (2, 160), (1, 40)]
+    assert np.array_equal(np.concatenate([block.ravel() for block in blocks]), samples)
+
+
+def test_pcm_frames_of_empty_audio(monkeypatch):
+    monkeypatch.setattr(silence, 'iter_pcm_windows', lambda file_path, sample_rate: iter([]))
+    assert list(iter_pcm_frames("empty.mp3")) == []
+
+
+def test_frame_rms():
+    frames = np.array([[0.0, 0.0, 0.0, 0.0], [0.5, -0.5, 0.5, -0.5], [1.0, 0.0, -1.0, 0.0]], dtype=np.float32)
+    assert frame_rms(frames) == pytest.approx([0.0, 0.5, np.sqrt(0.5)])
@@ -0,0 +1,82 @@
+import math
+import pytest
+import sizing
+from benchmark import synthetic_mp3
+from sizing import chunk_limit_error, max_chunk_bytes, plan_chunks, probe_mp3
+
+
+@pytest.fixture(scope='module')
+def episode(tmp_path_factory):
+    """A 30 minute 64 kbps episode, about 14MB."""
+    path = tmp_path_factory.mktemp("sizing") / "episode.mp3"
+    synthetic_mp3(path, 30 * 60, 64)
+    return path
+
+
+def assert_covers(plan, episode):
+    audio_bytes = probe_mp3(episode)['audio_bytes']
+    assert plan['chunks'] * plan['target_bytes'] >= audio_bytes
+
+
+def test_probe_reads_duration_and_bitrate_from_frames(episode):
+    probe = probe_mp3(episode)
+    assert probe['duration_seconds'] == pytest.approx(30 * 60, abs=0.1)
+    assert probe['bitrate_kbps'] == pytest.approx(64, rel=0.01)
+
+
+def test_plan_stays_within_the_upload_limit(episode, monkeypatch):
+    monkeypatch.setattr(sizing, 'API_MAX_UPLOAD_MB', 5)
+    plan = plan_chunks(episode, target_size_mb=None, workers=4)
+
+    assert plan['target_bytes'] <= max_chunk_bytes(None) < 5 * 1024 * 1024
+    assert plan['chunks'] >= math.ceil(episode.stat().st_size / (5 * 1024 * 1024))
+    assert_covers(plan, episode)
+
+
+def test_target_size_caps_the_chunks(episode, monkeypatch):
+    monkeypatch.setattr(sizing, 'API_MAX_UPLOAD_MB', 25)
+    plan = plan_chunks(episode, target_size_mb=1, workers=4)
+
+    assert plan['target_bytes'] <= 1024 * 1024
+    assert plan['chunks'] >= 14
+    assert_covers(plan, episode)
+
+
+def test_plan_stays_within_the_duration_limit(episode, monkeypatch):
+    monkeypatch.setattr(sizing, 'API_MAX_CHUNK_SECONDS', 300)
+    plan = plan_chunks(episode, target_size_mb=None, workers=4)
+
+    assert plan['chunk_ms'] <= 300 * 1000
+    assert plan['chunks'] >= 6
+    assert_covers(plan, episode)
+
+
+def test_more_workers_split_into_more_chunks(episode):
+    # Without a binding limit, extra chunks only pay off while they keep idle workers busy
+    single = plan_chunks(episode, target_size_mb=None, workers=1)
+    parallel = plan_chunks(episode, target_size_mb=None, workers=4)
+    assert single['chunks'] == 1
+    assert parallel['chunks'] == 4
+    assert parallel['estimated_seconds'] < single['estimated_seconds']
+
+
+def test_skipped_audio_shrinks_the_plan(episode):
+    full = plan_chunks(episode, target_size_mb=1, workers=4)
+    trimmed = plan_chunks(episode, target_size_mb=1, workers=4, skipped_seconds=15 * 60)
+    assert trimmed['duration_seconds'] == pytest.approx(full['duration_seconds'] - 15 * 60)
+    assert trimmed['chunks'] < full['chunks']
+
+
+def test_chunk_limit_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(sizing, 'API_MAX_UPLOAD_MB', 1)
+    monkeypatch.setattr(sizing, 'API_MAX_CHUNK_SECONDS', 600)
+    small = tmp_path / "small.mp3"
+    small.write_bytes(b"\0" * 1024)
+    large = tmp_path / "large.mp3"
+    large.write_bytes(b"\0" * (2 * 1024 * 1024))
+
+    assert chunk_limit_error(str(small)) is None
+    assert "upload limit" in chunk_limit_error(str(large))
+    assert "upload limit" in chunk_limit_error({'name': 'chunk_000', 'data': b"\0" * (2 * 1024 * 1024)})
+    assert "duration limit" in chunk_limit_error({'name': 'chunk_001', 'path': str(small), 'duration_ms': 601000})
+    assert chunk_limit_error({'name': 'chunk_002', 'path': str(small), 'duration_ms': 600000}) is None
@@ -0,0 +1,80 @@
+import mmap
+from pathlib import Path
+import pytest
+from benchmark import synthetic_mp3
+from mp3frames import iter_frames
+from splitter import iter_frame_chunks, map_range, split_mp3
+
+# Duration of one MPEG-1 Layer III frame at 44.1kHz
+FRAME_MS = 1152 * 1000 / 44100
+
+
+@pytest.fixture
+def episode(tmp_path):
+    """A two minute 128 kbps episode, about 1.9MB."""
+    path = tmp_path / "episode.mp3"
+    synthetic_mp3(path, 120, 128)
+    return path
+
+
+def test_mapped_chunks_are_views_of_the_file(episode):
+    chunks = list(iter_frame_chunks(str(episode), 256 * 1024))
+
+    assert all(isinstance(chunk['data'], memoryview) for chunk in chunks)
+    assert all(len(chunk['data']) == chunk['size'] <= 256 * 1024 for chunk in chunks)
+    assert b"".join(chunk['data'] for chunk in chunks) == episode.read_bytes()
+    # Chunks follow each other without gaps in the episode's timeline
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk['start_ms'] == pytest.approx(previous['start_ms'] + previous['duration_ms'])
+
+
+def test_written_chunks_match_the_mapped_ones(episode, tmp_path):
+    output_dir = tmp_path / "chunks"
+    output_dir.mkdir()
+    written = split_mp3(str(episode), target_size_mb=0.5, output_dir=str(output_dir), silence_aware=False,
+                        preprocess=None, vad=False)
+    mapped = split_mp3(str(episode), target_size_mb=0.5, silence_aware=False, preprocess=None, vad=False)
+
+    assert [chunk['name'] for chunk in written] == [f"episode-{i}.mp3" for i in range(1, len(written) + 1)]
+    assert [Path(chunk['path']).read_bytes() for chunk in written] == [bytes(chunk['data']) for chunk in mapped]
+
+
+def test_cut_points_start_new_chunks(episode):
+    chunks = list(iter_frame_chunks(str(episode), 10 * 1024 * 1024, cut_points=[30000, 90000]))
+
+    assert len(chunks) == 3
+    assert [round(chunk['start_ms'] / 1000) for chunk in chunks] == [0, 30, 90]
+    assert b"".join(chunk['data'] for chunk in chunks) == episode.read_bytes()
+
+
+def test_chunks_spanning_skipped_audio_are_joined(episode):
+    chunks = list(iter_frame_chunks(str(episode), 10 * 1024 * 1024, skips=[(30000.0, 60000.0)]))
+
+    assert len(chunks) == 1
+    chunk = chunks[0]
+    assert isinstance(chunk['data'], bytes)
+    with open(episode, 'rb') as f:
+        kept = [frame for i, (_, frame) in enumerate(iter_frames(f)) if not 30000 <= i * FRAME_MS < 60000]
+    assert chunk['data'] == b"".join(kept)
+    assert chunk['duration_ms'] == pytest.approx(len(kept) * FRAME_MS)
+    # The chunk's timeline jumps over the skipped stretch
+    assert chunk['offsets'][0] == (0.0, 0.0)
+    assert chunk['offsets'][1][0] == pytest.approx(30000, abs=FRAME_MS)
+    assert chunk['offsets'][1][1] == pytest.approx(60000, abs=FRAME_MS)
+
+
+def test_map_range_handles_unaligned_offsets(tmp_path):
+    path = tmp_path / "data.bin"
+    data = bytes(range(256)) * (3 * mmap.ALLOCATIONGRANULARITY // 256)
+    path.write_bytes(data)
+    start = mmap.ALLOCATIONGRANULARITY + 123
+    with open(path, 'rb') as f:
+        view = map_range(f, start, start + 1000)
+    assert bytes(view) == data[start:start + 1000]
+
+
+def test_files_without_frames_are_rejected(tmp_path):
+    path = tmp_path / "notes.mp3"
+    path.write_bytes(b"not audio" * 100)
+    with pytest.raises(ValueError, match="No MPEG audio frames"):
+        list(iter_frame_chunks(str(path), 1024 * 1024))
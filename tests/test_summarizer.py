@@ -0,0 +1,97 @@
+import asyncio
+import random
+import aiohttp
+import summarizer
+from cache import TranscriptCache
+from stubserver import StubServer
+from summarizer import Summarizer
+
+
+def transcript_segments(count, words=60):
+    return [{'start': i * 15, 'end': (i + 1) * 15, 'text': " ".join(f"word{i}-{j}" for j in range(words))}
+            for i in range(count)]
+
+
+async def summarize(segments, cache=None, prompt=None, section_tokens=1000):
+    async with aiohttp.ClientSession() as session:
+        summary_maker = Summarizer(session, cache, max_workers=4, section_tokens=section_tokens)
+        summary = await summary_maker.summarize(segments, prompt)
+        return summary, summary_maker.stats
+
+
+def test_sections_are_mapped_then_reduced_once(monkeypatch):
+    segments = transcript_segments(40)
+    with StubServer() as server:
+        monkeypatch.setitem(summarizer.CONFIG, 'API_BASE', server.base_url)
+        summary, stats = asyncio.run(summarize(segments))
+        requests = server.stats['chat_completions']
+
+    sections = asyncio.run(collect(summarizer.stream_sections(segments, 1000)))
+    assert len(sections) > 1
+    assert stats['map']['requests'] == len(sections)
+    assert stats['final']['requests'] == 1
+    assert requests == len(sections) + 1
+    assert summary.startswith("Summary of")
+
+
+def test_long_summaries_are_merged_level_by_level(monkeypatch):
+    with StubServer() as server:
+        monkeypatch.setitem(summarizer.CONFIG, 'API_BASE', server.base_url)
+        _, stats = asyncio.run(summarize(transcript_segments(60), section_tokens=150))
+
+    assert stats['reduce-1']['requests'] >= 1
+    assert stats['final']['requests'] == 1
+
+
+def test_cached_sections_are_reused_for_a_new_prompt(monkeypatch, tmp_path):
+    segments = transcript_segments(20)
+    with StubServer() as server, TranscriptCache(tmp_path / "cache.sqlite") as cache:
+        monkeypatch.setitem(summarizer.CONFIG, 'API_BASE', server.base_url)
+        asyncio.run(summarize(segments, cache))
+        first = server.stats['chat_completions']
+        summary, stats = asyncio.run(summarize(segments, cache, prompt="Focus on the guests."))
+        second = server.stats['chat_completions'] - first
+
+    assert 'map' not in stats
+    assert second == 1
+    assert summary.startswith("Summary of")
+
+
+def test_streamed_segments_are_summarized(monkeypatch):
+    async def stream():
+        for segment in transcript_segments(30):
+            await asyncio.sleep(0)
+            yield segment
+
+    with StubServer() as server:
+        monkeypatch.setitem(summarizer.CONFIG, 'API_BASE', server.base_url)
+        summary, stats = asyncio.run(summarize(stream()))
+
+    assert summary
+    assert stats['map']['requests'] > 1
+
+
+def test_empty_transcript_sends_nothing(monkeypatch):
+    with StubServer() as server:
+        monkeypatch.setitem(summarizer.CONFIG, 'API_BASE', server.base_url)
+        summary, _ = asyncio.run(summarize([]))
+        requests = server.stats['chat_completions']
+
+    assert summary is None
+    assert requests == 0
+
+
+def test_stage_results_keep_prompt_order(monkeypatch):
+    async def complete(self, prompt, stage):
+        # Finish in a random order
+        await asyncio.sleep(random.random() / 50)
+        return f"done {prompt}"
+
+    monkeypatch.setattr(Summarizer, 'complete', complete)
+    prompts = [f"prompt {i}" for i in range(20)]
+    contents = asyncio.run(Summarizer(None, max_workers=8).run_stage(prompts, 'merge'))
+    assert contents == [f"done {prompt}" for prompt in prompts]
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
@@ -0,0 +1,97 @@
+import json
+import pytest
+from assembly import TranscriptWriter, assemble
+from transcriptstore import TranscriptStore, index_directory, try_index
+
+
+def make_transcript(*texts, chunk_seconds=600):
+    """An assembled transcript with one timed segment per text, every chunk_seconds."""
+    chunk_results = [
+        ({'index': i + 1, 'name': f"episode-{i + 1}.mp3", 'start_ms': i * chunk_seconds * 1000,
+          'duration_ms': chunk_seconds * 1000},
+         {'text': text, 'segments': [{'start': 30.0, 'end': 40.0, 'text': text}]} if text is not None else None)
+        for i, text in enumerate(texts)
+    ]
+    return assemble(chunk_results)
+
+
+@pytest.fixture
+def store(tmp_path):
+    with TranscriptStore(tmp_path / "index" / "transcripts.sqlite") as store:
+        yield store
+
+
+def test_search_finds_episodes_and_timestamps(store):
+    episode = store.index_transcript("https://example.com/ep1.mp3", make_transcript(
+        "Welcome to the show", "Today we talk about the café on the corner", "Thanks for listening"
+    ), title="Episode 1")
+
+    hits = store.search("cafe")
+    assert len(hits) == 1
+    assert hits[0]['episode'] == episode
+    assert hits[0]['title'] == "Episode 1"
+    assert (hits[0]['start'], hits[0]['timestamp']) == (630.0, "00:10:30")
+    assert "[café]" in hits[0]['text']
+
+    assert [hit['timestamp'] for hit in store.search('"thanks for listening"')] == ["00:20:30"]
+    assert len(store.search("talk*")) == 1
+    assert store.counts() == {'episodes': 1, 'segments': 3}
+
+
+def test_search_within_one_episode(store):
+    first = store.index_transcript("ep1.mp3", make_transcript("news about rust"))
+    second = store.index_transcript("ep2.mp3", make_transcript("more rust news"))
+
+    assert {hit['episode'] for hit in store.search("rust")} == {first, second}
+    assert [hit['episode'] for hit in store.search("rust", episode=second)] == [second]
+    assert store.search("rust", limit=1)[0]['episode'] in (first, second)
+
+
+def test_invalid_query_syntax_is_searched_as_plain_words(store):
+    store.index_transcript("ep1.mp3", make_transcript("don't stop the music"))
+
+    assert len(store.search("don't (stop")) == 1
+    assert store.search("") == []
+    assert store.search("   ") == []
+
+
+def test_reindexing_an_episode_replaces_its_segments(store):
+    episode = store.index_transcript("ep1.mp3", make_transcript("first draft"))
+    assert store.index_transcript("ep1.mp3", make_transcript("second take")) == episode
+
+    assert store.search("draft") == []
+    assert len(store.search("take")) == 1
+    assert store.counts() == {'episodes': 1, 'segments': 1}
+
+
+def test_missing_and_untimed_chunks(store):
+    transcript = make_transcript("timed words", None)
+    transcript['segments'] = []
+    transcript['chunks'].append({'index': 3, 'name': "episode-3.mp3", 'start': 1200.0, 'duration': 600.0,
+                                 'status': 'transcribed'})
+    transcript['text'] += "\n\n\nfirst line\nsecond line"
+    store.index_transcript("ep1.mp3", transcript)
+
+    # Without timed segments, each line is found at the start of its chunk
+    assert [hit['start'] for hit in store.search("timed")] == [0.0]
+    assert [hit['start'] for hit in store.search("second")] == [1200.0]
+    assert store.search("missing") == []
+    assert store.counts()['segments'] == 3
+
+
+def test_writer_indexes_chunks_as_they_are_written(store, tmp_path):
+    writer = TranscriptWriter(tmp_path / "transcript", episode="Episode 7", store=store, source="ep7.mp3")
+    writer.add({'index': 1, 'name': "ep7-1.mp3", 'start_ms': 0, 'duration_ms': 60000},
+               {'text': "hello there", 'segments': [{'start': 5.0, 'end': 6.0, 'text': "hello there"}]})
+    assert [hit['title'] for hit in store.search("hello")] == ["Episode 7"]
+    writer.close()
+
+    # A run directory is indexed again from its JSON transcript, under the episode of its input
+    (tmp_path / "manifest.json").write_text(json.dumps({'run_id': "run1", 'input': "ep7.mp3"}), encoding='utf-8')
+    assert index_directory(store, tmp_path) == [writer.episode_id]
+    assert store.counts() == {'episodes': 1, 'segments': 1}
+
+
+def test_index_errors_do_not_stop_the_pipeline(store):
+    store.close()
+    assert try_index(store.begin_episode, "ep1.mp3") is None
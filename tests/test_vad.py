@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from silence import FRAME_MS
+from vad import (
+    WINDOW_FRAMES, detect_non_speech, episode_ms, episode_offsets, skip_regions, trim_envelope, trimmed_ms
+)
+
+# 10-20s and 50-60s of the episode are skipped
+REGIONS = [(10000.0, 20000.0), (50000.0, 60000.0)]
+
+
+def speech_features(seconds, seed=1):
+    """Frame RMS and zero-crossing rate of speech: syllables, pauses and unvoiced sounds."""
+    rng = np.random.default_rng(seed)
+    frames = seconds * WINDOW_FRAMES
+    rms = rng.choice([0.2, 0.02], frames).astype(np.float32)
+    zcr = rng.choice([0.05, 0.4], frames, p=[0.7, 0.3]).astype(np.float32)
+    return rms, zcr
+
+
+def constant_features(seconds, rms, zcr):
+    frames = seconds * WINDOW_FRAMES
+    return np.full(frames, rms, dtype=np.float32), np.full(frames, zcr, dtype=np.float32)
+
+
+def join(*parts):
+    return np.concatenate([rms for rms, _ in parts]), np.concatenate([zcr for _, zcr in parts])
+
+
+def test_trimmed_and_episode_positions_map_both_ways():
+    assert trimmed_ms(5000, REGIONS) == 5000
+    assert trimmed_ms(15000, REGIONS) == 10000
+    assert trimmed_ms(30000, REGIONS) == 20000
+    assert trimmed_ms(70000, REGIONS) == 50000
+
+    for position in (0, 5000, 20000, 30000, 49999, 60000, 90000):
+        assert episode_ms(trimmed_ms(position, REGIONS), REGIONS) == position
+
+
+def test_episode_offsets_split_chunks_at_skipped_regions():
+    # The first 30s of trimmed audio are episode 0-10s and 20-40s
+    assert episode_offsets(0, 30000, REGIONS) == [(0, 0), (10000, 20000)]
+    # The next 30s are episode 40-50s and 60-80s
+    assert episode_offsets(30000, 60000, REGIONS) == [(0, 40000), (10000, 60000)]
+    assert episode_offsets(0, 30000, []) == [(0, 0)]
+
+
+def test_trim_envelope_drops_skipped_frames():
+    envelope = np.arange(4000, dtype=np.float32)
+    trimmed = trim_envelope(envelope, REGIONS)
+    assert len(trimmed) == 4000 - 2 * 10000 // FRAME_MS
+    assert trimmed[500] == 1000
+
+
+def test_skip_regions_keep_padding_next_to_speech():
+    speech = np.array([True] + [False] * 8 + [True] + [False] * 2 + [True])
+    regions = skip_regions(speech, 13000, window_ms=1000, min_skip_seconds=5, padding_seconds=0.5)
+    # The two-second run is too short to skip
+    assert regions == [(1500.0, 8500.0)]
+
+
+def test_skip_regions_at_the_edges_are_not_padded():
+    speech = np.array([False] * 6 + [True] * 4 + [False] * 6)
+    regions = skip_regions(speech, 15800, window_ms=1000, min_skip_seconds=5, padding_seconds=0.5)
+    assert regions == [(0.0, 5500.0), (10500.0, 15800.0)]
+
+
+def test_detect_non_speech_finds_dead_air_and_music():
+    features = join(
+        speech_features(20, seed=1),
+        constant_features(20, rms=0.0001, zcr=0.0),
+        speech_features(20, seed=2),
+        constant_features(20, rms=0.2, zcr=0.1),
+        speech_features(20, seed=3),
+    )
+
+    assert detect_non_speech("episode.mp3", features) == [(20500.0, 39500.0), (60500.0, 79500.0)]
+
+
+def test_detect_non_speech_keeps_an_all_speech_episode():
+    assert detect_non_speech("episode.mp3", speech_features(60)) == []
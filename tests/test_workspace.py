@@ -0,0 +1,56 @@
+import os
+import time
+import workspace
+from manifest import RunManifest
+from workspace import RunLock, collect_garbage
+
+
+def make_run(runs_dir, source, state=None, size=1024, age_days=0):
+    manifest = RunManifest.create(source, runs_dir)
+    (manifest.run_dir / "audio.mp3").write_bytes(b"\0" * size)
+    if state:
+        manifest.finish(state)
+    used = time.time() - age_days * 86400
+    for path in manifest.run_dir.iterdir():
+        os.utime(path, (used, used))
+    return manifest.run_dir
+
+
+def collect(tmp_path, **kwargs):
+    return collect_garbage(roots=(tmp_path / "runs",), logs_dir=tmp_path / "logs", **kwargs)
+
+
+def test_failed_runs_are_removed_to_make_room(tmp_path):
+    runs = tmp_path / "runs"
+    failed = make_run(runs, "/audio/failed.mp3", state='failed', size=2 * 1024 * 1024)
+    resumable = make_run(runs, "/audio/partial.mp3", size=2 * 1024 * 1024)
+
+    result = collect(tmp_path, max_mb=1, max_age_days=None, resumable_max_age_days=30)
+
+    assert not failed.exists()
+    # Resumable runs are not removed for space, only once abandoned
+    assert resumable.exists()
+    assert result['removed'] == 1
+    assert result['kept'] == 1
+
+
+def test_abandoned_resumable_runs_expire(tmp_path):
+    runs = tmp_path / "runs"
+    recent = make_run(runs, "/audio/recent.mp3", age_days=3)
+    abandoned = make_run(runs, "/audio/abandoned.mp3", age_days=40)
+    finished = make_run(runs, "/audio/finished.mp3", state='done', age_days=20)
+
+    collect(tmp_path, max_mb=None, max_age_days=14, resumable_max_age_days=30)
+
+    assert recent.exists()
+    assert not abandoned.exists()
+    assert not finished.exists()
+
+
+def test_live_runs_are_kept(tmp_path):
+    runs = tmp_path / "runs"
+    live = make_run(runs, "/audio/live.mp3", state='done', age_days=100)
+    with RunLock(live):
+        collect(tmp_path, max_mb=0, max_age_days=1, resumable_max_age_days=1)
+        assert live.exists()
+    assert workspace.is_live(live) is False
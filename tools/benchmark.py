@@ -0,0 +1,1206 @@
+"""
+Benchmarks for the podcast processing stages.
+
+Usage:
+    python benchmark.py boundaries <file.mp3> [--reference transcript.txt]
+    python benchmark.py scheduler [--concurrency 1 2 4 8] [--latency 0.3] [--error-rate 0.1]
+    python benchmark.py download <file.mp3> [--segments 1 4 8] [--bandwidth-mb 2]
+    python benchmark.py connections [--chunks 100] [--concurrency 4]
+    python benchmark.py ftp [--files 20] [--pool-sizes 1 2 4]
+    python benchmark.py summary [--hours 3] [--workers 1 4] [--latency 0.5]
+    python benchmark.py suite [--durations 10 60] [--bitrates 64 128] [--target-sizes 1 5]
+    python benchmark.py preprocess [file.mp3] [--modes original mp3 opus]
+    python benchmark.py sizing [--durations 10 60 180] [--bitrates 64 128]
+    python benchmark.py engines [file.mp3] [--engines http local] [--minutes 5]
+    python benchmark.py startup [--runs 10] [--modules main batch]
+    python benchmark.py local-input [file.mp3] [--minutes 60] [--bitrate 128]
+    python benchmark.py search [--episodes 2000] [--minutes 60]
+    python benchmark.py compare [--threshold 0.1]
+"""
+import argparse
+import asyncio
+import difflib
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+
+# The pipeline scripts in src import each other as top-level modules
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from config import TARGET_SIZE_MB, SPLIT_TOLERANCE_SECONDS
+from silence import FRAME_MS, SIZE_HEADROOM, SILENCE_PERCENTILE, rms_envelope, plan_cuts
+from sizing import plan_chunks
+from splitter import split_mp3
+from scheduler import TranscriptionScheduler
+
+
+def fixed_cut_points(file_path, duration_ms, target_bytes):
+    """Cut points of the original fixed-interval split (ceil(size / target) equal parts)."""
+    num_chunks = math.ceil(os.path.getsize(file_path) / target_bytes)
+    ms_per_chunk = duration_ms // num_chunks
+    return [i * ms_per_chunk for i in range(1, num_chunks)]
+
+
+def seam_energy(envelope, cuts):
+    """Return the share of cuts that land in quiet frames and their mean relative energy."""
+    if not cuts:
+        return 0.0, 0.0
+    threshold = np.percentile(envelope, SILENCE_PERCENTILE)
+    speech_level = np.median(envelope) or 1.0
+    frames = np.minimum(np.array(cuts) // FRAME_MS, len(envelope) - 1).astype(int)
+    levels = envelope[frames]
+    return float(np.mean(levels <= threshold)), float(np.mean(levels) / speech_level)
+
+
+def seam_word_error_rate(reference_words, chunk_transcripts, window=10):
+    """
+    Word-error rate of the reference words within `window` words of each
+    chunk seam, after aligning the concatenated chunk transcripts to the reference.
+    """
+    hypothesis = []
+    seams = []
+    for text in chunk_transcripts:
+        if hypothesis:
+            seams.append(len(hypothesis))
+        hypothesis.extend(text.lower().split())
+
+    matcher = difflib.SequenceMatcher(None, reference_words, hypothesis, autojunk=False)
+    errors = np.zeros(len(reference_words) + 1, dtype=np.int32)
+    ref_at_hyp = np.zeros(len(hypothesis) + 1, dtype=np.int32)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        ref_at_hyp[j1:j2 + 1] = np.linspace(i1, i2, j2 - j1 + 1).astype(np.int32)
+        # Substitutions and deletions count per reference word, extra inserted words at their position
+        if tag in ('replace', 'delete'):
+            errors[i1:i2] += 1
+        if tag in ('replace', 'insert'):
+            errors[i1] += max(0, (j2 - j1) - (i2 - i1))
+
+    counted = np.zeros(len(reference_words) + 1, dtype=bool)
+    for seam in seams:
+        center = ref_at_hyp[seam]
+        counted[max(0, center - window):center + window] = True
+
+    words = int(counted[:len(reference_words)].sum())
+    return float(errors[counted].sum() / words) if words else 0.0
+
+
+async def transcribe_chunks(chunks):
+    """Transcribe split chunks through the scheduler and return their texts in order."""
+    import aiohttp
+    from transcript import transcribe_audio
+
+    scheduler = TranscriptionScheduler()
+    async with aiohttp.ClientSession() as session:
+        results = await scheduler.run(
+            chunks,
+            lambda chunk: transcribe_audio(session, chunk),
+            key=lambda chunk: chunk['index']
+        )
+    return [entry['result'][1]['text'] if entry['state'] == 'done' else '' for entry in results.values()]
+
+
+def bench_boundaries(file_path, target_size_mb=TARGET_SIZE_MB, reference=None):
+    """Compare silence-aware boundary planning with the fixed-interval split."""
+    target_bytes = plan_chunks(file_path, target_size_mb)['target_bytes']
+
+    start = time.perf_counter()
+    envelope = rms_envelope(file_path)
+    envelope_seconds = time.perf_counter() - start
+
+    duration_ms = len(envelope) * FRAME_MS
+    hours = duration_ms / 3_600_000
+    byte_rate = os.path.getsize(file_path) / duration_ms
+
+    start = time.perf_counter()
+    silence_cuts = plan_cuts(envelope, target_bytes / byte_rate * SIZE_HEADROOM, SPLIT_TOLERANCE_SECONDS * 1000)
+    planning_seconds = time.perf_counter() - start
+
+    strategies = {
+        'fixed': fixed_cut_points(file_path, duration_ms, target_bytes),
+        'silence': silence_cuts,
+    }
+
+    results = {
+        'file': str(file_path),
+        'audio_hours': round(hours, 3),
+        'envelope_seconds_per_hour': round(envelope_seconds / hours, 3),
+        'planning_seconds_per_hour': round(planning_seconds / hours, 4),
+    }
+
+    reference_words = None
+    if reference:
+        reference_words = Path(reference).read_text(encoding='utf-8').lower().split()
+
+    for name, cuts in strategies.items():
+        quiet_share, relative_energy = seam_energy(envelope, cuts)
+        entry = {
+            'cuts': len(cuts),
+            'cuts_in_silence': round(quiet_share, 3),
+            'seam_energy_vs_median': round(relative_energy, 3),
+        }
+        if reference_words is not None:
+            with tempfile.TemporaryDirectory() as output_dir:
+                chunks = split_mp3(file_path, target_size_mb, output_dir, cut_points=cuts)
+                transcripts = asyncio.run(transcribe_chunks(chunks))
+            entry['seam_wer'] = round(seam_word_error_rate(reference_words, transcripts), 4)
+        results[name] = entry
+
+    return results
+
+
+async def run_scheduler_once(chunk_paths, concurrency):
+    import aiohttp
+    from transcript import transcribe_audio
+
+    scheduler = TranscriptionScheduler(max_in_flight=concurrency, rate=0, backoff=0.1, backoff_max=2)
+    start = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        results = await scheduler.run(chunk_paths, lambda path: transcribe_audio(session, path))
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for entry in results.values() if entry['state'] != 'done')
+    return elapsed, failed, scheduler.stats
+
+
+def bench_scheduler(chunks=40, concurrency=(1, 2, 4, 8), latency=0.3, error_rate=0.1,
+                    server_max_in_flight=0, chunk_kb=64):
+    """Measure transcription throughput against the local stub API for several concurrency caps."""
+    import transcript
+    from stubserver import StubServer
+
+    results = {'chunks': chunks, 'latency': latency, 'error_rate': error_rate, 'runs': []}
+    with tempfile.TemporaryDirectory() as chunk_dir:
+        chunk_paths = []
+        for i in range(chunks):
+            path = Path(chunk_dir) / f"bench-{i + 1}.mp3"
+            path.write_bytes(os.urandom(chunk_kb * 1024))
+            chunk_paths.append(path)
+
+        for limit in concurrency:
+            with StubServer(latency=latency, error_rate=error_rate, retry_after=0,
+                            max_in_flight=server_max_in_flight) as server:
+                transcript.CONFIG['API_BASE'] = server.base_url
+                elapsed, failed, stats = asyncio.run(run_scheduler_once(chunk_paths, limit))
+                results['runs'].append({
+                    'concurrency': limit,
+                    'wall_seconds': round(elapsed, 3),
+                    'chunks_per_second': round(chunks / elapsed, 2),
+                    'failed': failed,
+                    'retries': stats['retries'],
+                    'server_429s': server.stats['rate_limited'],
+                })
+    return results
+
+
+def bench_download(file_path, segments=(1, 4, 8), bandwidth_mb=2.0):
+    """
+    Download file_path from a local throttled server with and without Range
+    support, then interrupt and resume a ranged download. Correctness is
+    covered by tests/test_downloader.py; this only measures.
+    """
+    import downloader
+    from stubserver import FileServer
+
+    size = os.path.getsize(file_path)
+    bandwidth = int(bandwidth_mb * 1024 * 1024) if bandwidth_mb else None
+    results = {'file': str(file_path), 'size_mb': round(size / (1024 * 1024), 2),
+               'bandwidth_mb_per_connection': bandwidth_mb, 'runs': []}
+
+    with tempfile.TemporaryDirectory() as download_dir:
+        destination = os.path.join(download_dir, 'episode.mp3')
+        for ranges in (True, False):
+            for count in segments:
+                with FileServer(file_path, ranges=ranges, bandwidth=bandwidth) as server:
+                    start = time.perf_counter()
+                    downloader.download_file(server.url, destination, segments=count)
+                    elapsed = time.perf_counter() - start
+                    results['runs'].append({
+                        'ranges': ranges,
+                        'segments': count,
+                        'seconds': round(elapsed, 3),
+                        'mb_per_second': round(size / (1024 * 1024) / elapsed, 2),
+                        'requests': server.stats['requests'],
+                    })
+                os.remove(destination)
+                if not ranges:
+                    break
+
+        # Interrupt a ranged download halfway, then resume it from the .part file
+        retries = downloader.DOWNLOAD_RETRIES
+        downloader.DOWNLOAD_RETRIES = 0
+        try:
+            with FileServer(file_path, bandwidth=bandwidth, fail_after=size // 2) as server:
+                downloader.download_file(server.url, destination, segments=max(segments))
+        finally:
+            downloader.DOWNLOAD_RETRIES = retries
+        with FileServer(file_path, bandwidth=bandwidth) as server:
+            downloader.download_file(server.url, destination, segments=max(segments))
+            results['resume'] = {
+                'refetched_share': round(server.stats['bytes_sent'] / size, 3),
+            }
+    return results
+
+
+def self_signed_certificate(directory):
+    """Create a localhost certificate with the openssl CLI; returns its path or None."""
+    import shutil
+    import subprocess
+
+    if not shutil.which('openssl'):
+        return None
+    certfile = os.path.join(directory, 'stub.pem')
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=127.0.0.1',
+         '-addext', 'subjectAltName=IP:127.0.0.1', '-keyout', certfile, '-out', certfile],
+        check=True, capture_output=True
+    )
+    return certfile
+
+
+async def run_connections_once(chunks, concurrency, pooled, ssl_context):
+    """Transcribe in-memory chunks with one shared pooled client, or a new session per request."""
+    import aiohttp
+    from httpclient import ConnectionStats, HttpClient, trace_config
+    from transcript import transcribe_audio
+
+    scheduler = TranscriptionScheduler(max_in_flight=concurrency, rate=0)
+    start = time.perf_counter()
+    if pooled:
+        async with HttpClient(ssl=ssl_context) as client:
+            await scheduler.run(chunks, lambda chunk: transcribe_audio(client.session, chunk),
+                                key=lambda chunk: chunk['index'])
+        report = client.report()['api']
+    else:
+        stats = ConnectionStats()
+
+        async def fresh_session(chunk):
+            connector = aiohttp.TCPConnector(ssl=ssl_context)
+            async with aiohttp.ClientSession(connector=connector, trace_configs=[trace_config(stats)]) as session:
+                return await transcribe_audio(session, chunk)
+
+        await scheduler.run(chunks, fresh_session, key=lambda chunk: chunk['index'])
+        report = stats.report()
+    return time.perf_counter() - start, report
+
+
+def bench_connections(chunks=100, concurrency=4, latency=0.05, chunk_kb=64):
+    """
+    Per-chunk connection overhead: a new session per request against one
+    pooled client for the whole run, over HTTP and (with openssl) HTTPS.
+    """
+    import ssl
+    import transcript
+    from stubserver import StubServer
+
+    records = [
+        {'index': i + 1, 'name': f"bench-{i + 1}.mp3", 'data': os.urandom(chunk_kb * 1024), 'start_ms': 0}
+        for i in range(chunks)
+    ]
+    results = {'chunks': chunks, 'concurrency': concurrency, 'latency': latency, 'runs': []}
+    with tempfile.TemporaryDirectory() as cert_dir:
+        certfile = self_signed_certificate(cert_dir)
+        schemes = [('http', None, None)]
+        if certfile:
+            schemes.append(('https', certfile, ssl.create_default_context(cafile=certfile)))
+
+        for scheme, server_cert, ssl_context in schemes:
+            for pooled in (False, True):
+                with StubServer(latency=latency, certfile=server_cert) as server:
+                    transcript.CONFIG['API_BASE'] = server.base_url
+                    elapsed, report = asyncio.run(run_connections_once(records, concurrency, pooled, ssl_context))
+                    results['runs'].append({
+                        'scheme': scheme,
+                        'mode': 'pooled' if pooled else 'session per request',
+                        'wall_seconds': round(elapsed, 3),
+                        'chunks_per_second': round(chunks / elapsed, 2),
+                        'server_connections': server.stats['connections'],
+                        'connections': report,
+                    })
+    return results
+
+
+async def upload_all(uploader, paths):
+    start = time.perf_counter()
+    await asyncio.gather(*(uploader.upload(str(path)) for path in paths))
+    return time.perf_counter() - start
+
+
+def bench_ftp(files=20, size_kb=256, pool_sizes=(1, 2, 4), resume_mb=8):
+    """
+    FTP uploads against an in-process pyftpdlib server: one login per file
+    against the pooled async uploader, repeat uploads of identical files, and
+    resuming a partial upload with REST and with APPE. Correctness is
+    covered by tests/test_ftphandler.py; this only measures.
+    """
+    import ftphandler
+    from stubserver import FtpServer
+
+    results = {'files': files, 'size_kb': size_kb, 'runs': []}
+    with tempfile.TemporaryDirectory() as work_dir:
+        local_dir = Path(work_dir) / "local"
+        local_dir.mkdir()
+        paths = []
+        for i in range(files):
+            path = local_dir / f"transcript-{i + 1}.txt"
+            path.write_bytes(os.urandom(size_kb * 1024))
+            paths.append(path)
+
+        # Previous behaviour: a fresh login for every file, one after another
+        root = Path(work_dir) / "login-per-file"
+        root.mkdir()
+        with FtpServer(root) as server:
+            start = time.perf_counter()
+            for path in paths:
+                uploader = ftphandler.FtpUploader(server.host, server.user, server.password, '/', 1, server.port)
+                uploader.upload_sync(str(path))
+                uploader.close()
+            results['login_per_file'] = {
+                'seconds': round(time.perf_counter() - start, 3),
+                'logins': server.stats['logins'],
+            }
+
+        for size in pool_sizes:
+            root = Path(work_dir) / f"pool-{size}"
+            root.mkdir()
+            with FtpServer(root) as server:
+                uploader = ftphandler.FtpUploader(server.host, server.user, server.password, '/', size, server.port)
+                first = asyncio.run(upload_all(uploader, paths))
+                repeat = asyncio.run(upload_all(uploader, paths))
+                uploader.close()
+                results['runs'].append({
+                    'pool_size': size,
+                    'seconds': round(first, 3),
+                    'repeat_seconds': round(repeat, 3),
+                    'logins': server.stats['logins'],
+                    'stored': server.stats['stored'],
+                    'uploader': uploader.stats,
+                })
+
+        # A dropped upload leaves the first half of the file on the server
+        large = local_dir / "large.txt"
+        large.write_bytes(os.urandom(resume_mb * 1024 * 1024))
+        name = ftphandler.content_name(str(large))
+        results['resume'] = {}
+        for rest in (True, False):
+            root = Path(work_dir) / f"resume-{'rest' if rest else 'appe'}"
+            root.mkdir()
+            (root / name).write_bytes(large.read_bytes()[:resume_mb * 512 * 1024])
+            with FtpServer(root, rest=rest) as server:
+                uploader = ftphandler.FtpUploader(server.host, server.user, server.password, '/', 1, server.port)
+                uploader.upload_sync(str(large))
+                uploader.close()
+                results['resume']['rest' if rest else 'appe'] = {
+                    'sent_share': round(uploader.stats['bytes'] / large.stat().st_size, 3),
+                    'appended': server.stats['appended'],
+                }
+    return results
+
+
+def synthetic_segments(hours, words_per_segment=40, segment_seconds=15):
+    """Transcript segments of filler speech covering `hours` of audio."""
+    vocabulary = "the podcast guest talked about research data growth markets music history science".split()
+    count = int(hours * 3600 / segment_seconds)
+    return [
+        {
+            'start': i * segment_seconds,
+            'end': (i + 1) * segment_seconds,
+            'text': " ".join(vocabulary[(i + j) % len(vocabulary)] for j in range(words_per_segment)),
+        }
+        for i in range(count)
+    ]
+
+
+async def run_summary_once(segments, cache, prompt, workers, section_tokens):
+    import aiohttp
+    from summarizer import Summarizer
+
+    async with aiohttp.ClientSession() as session:
+        summarizer = Summarizer(session, cache, max_workers=workers, section_tokens=section_tokens)
+        start = time.perf_counter()
+        await summarizer.summarize(segments, prompt)
+        return time.perf_counter() - start, summarizer.stats
+
+
+def bench_summary(hours=3.0, workers=(1, 4), latency=0.5, latency_per_token=0.0001, section_tokens=6000):
+    """
+    Map-reduce summary latency and token counts against the local stub API,
+    plus a second run with a different final prompt that reuses cached sections.
+    """
+    import summarizer
+    from cache import TranscriptCache
+    from stubserver import StubServer
+
+    segments = synthetic_segments(hours)
+    results = {'audio_hours': hours, 'segments': len(segments), 'runs': []}
+    with tempfile.TemporaryDirectory() as cache_dir, \
+            StubServer(latency=latency, latency_per_token=latency_per_token) as server:
+        summarizer.CONFIG['API_BASE'] = server.base_url
+
+        # Baseline: the whole transcript in one request, as the web backend does
+        elapsed, stats = asyncio.run(run_summary_once(segments, None, None, 1, 10 ** 9))
+        results['single_request'] = {'seconds': round(elapsed, 3), 'stages': stats}
+
+        for count in workers:
+            with TranscriptCache(os.path.join(cache_dir, f"workers-{count}.sqlite")) as cache:
+                elapsed, stats = asyncio.run(run_summary_once(segments, cache, None, count, section_tokens))
+                rerun, rerun_stats = asyncio.run(
+                    run_summary_once(segments, cache, "Focus on the guests.", count, section_tokens)
+                )
+            results['runs'].append({
+                'workers': count,
+                'seconds': round(elapsed, 3),
+                'stages': stats,
+                'new_prompt_seconds': round(rerun, 3),
+                'new_prompt_stages': rerun_stats,
+            })
+    return results
+
+
+# Synthetic episodes and stage runs for the reproducible benchmark suite
+SUITE_RESULTS = Path(__file__).parent.resolve() / "benchmarks" / "results.jsonl"
+# Share a stage may get slower, or grow in memory, before compare flags it
+REGRESSION_THRESHOLD = 0.10
+
+
+def synthetic_mp3(path, duration_seconds, bitrate_kbps, generator='frames', seed=1):
+    """
+    Write a synthetic MP3 of the given duration and constant bitrate.
+    'ffmpeg' encodes pink noise with a one-second pause every eight seconds,
+    so silence analysis has real gaps to find; 'frames' writes valid MPEG-1
+    Layer III frames with seeded random payload and needs no encoder.
+    """
+    import subprocess
+
+    if generator == 'ffmpeg':
+        subprocess.run(
+            ['ffmpeg', '-v', 'error', '-y', '-f', 'lavfi',
+             '-i', f"anoisesrc=d={duration_seconds}:c=pink:a=0.3:seed={seed}",
+             '-af', "volume='if(lt(mod(t,8),7),1,0)':eval=frame",
+             '-ac', '1', '-ar', '44100', '-codec:a', 'libmp3lame', '-b:a', f"{bitrate_kbps}k", str(path)],
+            check=True
+        )
+        return
+
+    from mp3frames import BITRATES
+
+    bitrate_index = BITRATES[(1, 3)].index(bitrate_kbps)
+    sample_rate = 44100
+    frames = int(duration_seconds * sample_rate / 1152)
+    rng = np.random.default_rng(seed)
+    payload = rng.integers(0, 256, size=144 * 320 * 1000 // sample_rate + 1, dtype=np.uint8).tobytes()
+    exact = 144 * bitrate_kbps * 1000 / sample_rate
+    written = 0.0
+    with open(path, 'wb') as f:
+        for i in range(frames):
+            # Padding slots keep the average frame length at the exact bitrate
+            padding = int(exact * (i + 1) - written >= int(exact) + 1)
+            length = int(exact) + padding
+            written += length
+            f.write(bytes([0xFF, 0xFB, bitrate_index << 4 | padding << 1, 0xC0]) + payload[:length - 4])
+
+
+def measured(function, *args):
+    """Run function(*args) and return its result with wall time, CPU time and peak RSS of this process."""
+    try:
+        import resource
+    except ImportError:
+        resource = None
+
+    def rss_mb():
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return round(peak / (1024 * 1024 if os.uname().sysname == 'Darwin' else 1024), 1)
+
+    baseline = rss_mb()
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    result = function(*args)
+    return {
+        'result': result,
+        'wall_seconds': round(time.perf_counter() - start, 3),
+        'cpu_seconds': round(time.process_time() - cpu_start, 3),
+        'baseline_rss_mb': baseline,
+        'peak_rss_mb': rss_mb(),
+    }
+
+
+def preload(modules):
+    import importlib
+
+    for module in modules:
+        importlib.import_module(module)
+
+
+def run_isolated(function, *args, imports=()):
+    """
+    Run measured(function, *args) in a fresh process, so peak RSS belongs to
+    this stage alone. imports are loaded first and count towards the baseline.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        pool.submit(preload, imports).result()
+        return pool.submit(measured, function, *args).result()
+
+
+def suite_split(audio_path, chunk_dir, target_size_mb, silence_aware):
+    """Split stage: split_mp3 to disk; returns the number of chunks."""
+    import logging
+
+    logging.disable(logging.INFO)
+    return len(split_mp3(audio_path, target_size_mb, chunk_dir, silence_aware=silence_aware))
+
+
+def suite_transcribe(chunk_dir, base_url, concurrency):
+    """Transcription stage as in transcript.main: chunk files through the scheduler to the API."""
+    import logging
+    import transcript
+    from assembly import chunks_from_files
+    from httpclient import HttpClient
+
+    logging.disable(logging.WARNING)
+    transcript.CONFIG['API_BASE'] = base_url
+    chunks = chunks_from_files(Path(chunk_dir).glob("*.mp3"))
+
+    async def run():
+        scheduler = TranscriptionScheduler(max_in_flight=concurrency, rate=0, backoff=0.1, backoff_max=2)
+        with tempfile.TemporaryDirectory() as splitted_dir:
+            async with HttpClient() as client:
+                results = await scheduler.run(
+                    chunks,
+                    lambda chunk: transcript.process_and_save(client.session, chunk, Path(splitted_dir)),
+                    key=lambda chunk: chunk['index']
+                )
+        return sum(1 for entry in results.values() if entry['state'] == 'done'), scheduler.stats['retries']
+
+    done, retries = asyncio.run(run())
+    return {'chunks': len(chunks), 'transcribed': done, 'retries': retries}
+
+
+def git_revision():
+    import subprocess
+
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_suite(durations=(10, 60), bitrates=(64, 128), target_sizes=(TARGET_SIZE_MB,), latency=0.2,
+                error_rate=0.05, concurrency=4, generator=None, silence_aware=None, results_path=SUITE_RESULTS,
+                startup_runs=10):
+    """
+    Split and transcription throughput for every combination of episode
+    duration (minutes), bitrate (kbps) and target chunk size, and the startup
+    time of main.py (see bench_startup). Each stage runs in its own process; every measurement is appended to results_path as one
+    JSON line, keyed by case and stage, so runs of different revisions compare.
+    """
+    import platform
+    import shutil
+    from datetime import datetime
+    from stubserver import StubServer
+
+    has_ffmpeg = shutil.which('ffmpeg') is not None
+    generator = generator or ('ffmpeg' if has_ffmpeg else 'frames')
+    silence_aware = has_ffmpeg if silence_aware is None else silence_aware
+    run = {
+        'run_id': datetime.now().strftime('%Y%m%d_%H%M%S'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+    records = []
+    results_path = Path(results_path)
+    results_path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory() as work_dir:
+        for minutes in durations:
+            for bitrate in bitrates:
+                audio_path = Path(work_dir) / f"synthetic-{minutes}m-{bitrate}k.mp3"
+                synthetic_mp3(audio_path, minutes * 60, bitrate, generator)
+                audio_mb = audio_path.stat().st_size / (1024 * 1024)
+
+                for target_size_mb in target_sizes:
+                    chunk_dir = Path(work_dir) / f"chunks-{minutes}-{bitrate}-{target_size_mb or 'auto'}"
+                    chunk_dir.mkdir()
+                    case = {
+                        'duration_minutes': minutes, 'bitrate_kbps': bitrate, 'target_size_mb': target_size_mb,
+                        'generator': generator, 'silence_aware': silence_aware,
+                        'latency': latency, 'error_rate': error_rate, 'concurrency': concurrency,
+                    }
+
+                    split = run_isolated(suite_split, str(audio_path), str(chunk_dir), target_size_mb, silence_aware)
+                    chunks = split.pop('result')
+                    records.append({**run, 'stage': 'split', 'case': case, **split, 'chunks': chunks,
+                                    'chunks_per_second': round(chunks / max(split['wall_seconds'], 1e-9), 2),
+                                    'mb_per_second': round(audio_mb / max(split['wall_seconds'], 1e-9), 2)})
+
+                    with StubServer(latency=latency, error_rate=error_rate, retry_after=0, seed=1) as server:
+                        transcribed = run_isolated(suite_transcribe, str(chunk_dir), server.base_url, concurrency,
+                                                   imports=('transcript', 'httpclient', 'assembly'))
+                    outcome = transcribed.pop('result')
+                    records.append({**run, 'stage': 'transcribe', 'case': case, **transcribed, **outcome,
+                                    'chunks_per_second': round(outcome['chunks'] / max(transcribed['wall_seconds'], 1e-9), 2)})
+                    shutil.rmtree(chunk_dir)
+
+    # Startup is tracked like the stages: a slow import shows up as a wall time regression
+    startup = bench_startup(startup_runs)
+    records.append({**run, 'stage': 'startup', 'case': {'command': 'main.py --version'},
+                    'wall_seconds': startup['version_seconds']['median']})
+    records.append({**run, 'stage': 'startup', 'case': {'command': 'import main'},
+                    'wall_seconds': startup['imports']['main']['import_ms'] / 1000,
+                    'slowest': startup['imports']['main']['slowest']})
+
+    with open(results_path, 'a', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    return {'results_file': str(results_path), 'records': records, 'comparison': compare_results(results_path)}
+
+
+def compare_results(results_path=SUITE_RESULTS, threshold=REGRESSION_THRESHOLD):
+    """
+    Compare the latest run in results_path with the previous run of each
+    case and stage. Wall time, CPU time or peak RSS growing by more than
+    threshold is reported as a regression.
+    """
+    with open(results_path, 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if not records:
+        return []
+
+    latest_run = records[-1]['run_id']
+    history = {}
+    for record in records:
+        key = (record['stage'], json.dumps(record['case'], sort_keys=True))
+        history.setdefault(key, []).append(record)
+
+    comparison = []
+    for (stage, case), runs in history.items():
+        if runs[-1]['run_id'] != latest_run or len(runs) < 2:
+            continue
+        previous, current = runs[-2], runs[-1]
+        changes = {}
+        regressions = []
+        for metric in ('wall_seconds', 'cpu_seconds', 'peak_rss_mb'):
+            if not previous.get(metric) or current.get(metric) is None:
+                continue
+            change = current[metric] / previous[metric] - 1
+            changes[metric] = round(change, 3)
+            if change > threshold:
+                regressions.append(metric)
+        comparison.append({
+            'stage': stage,
+            'case': json.loads(case),
+            'previous': {'run_id': previous['run_id'], 'revision': previous.get('revision')},
+            'changes': changes,
+            'regressions': regressions,
+        })
+    return comparison
+
+
+def bench_sizing(durations=(10, 60, 180), bitrates=(64, 128), legacy_size_mb=1, workers=4):
+    """
+    Compare the chunk sizing plan with the old fixed target size on synthetic
+    episodes: chunk counts, largest chunk, probe time and estimated wall time.
+    """
+    from sizing import estimate_wall_seconds
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for minutes in durations:
+            for bitrate in bitrates:
+                audio_path = Path(work_dir) / f"episode-{minutes}-{bitrate}.mp3"
+                synthetic_mp3(audio_path, minutes * 60, bitrate)
+                legacy_chunks = math.ceil(os.path.getsize(audio_path) / (legacy_size_mb * 1024 * 1024))
+
+                start = time.perf_counter()
+                plan = plan_chunks(str(audio_path), workers=workers)
+                plan_seconds = time.perf_counter() - start
+
+                chunk_dir = Path(work_dir) / f"chunks-{minutes}-{bitrate}"
+                chunk_dir.mkdir()
+                chunks = split_mp3(str(audio_path), output_dir=str(chunk_dir), silence_aware=False)
+                results.append({
+                    'duration_minutes': minutes,
+                    'bitrate_kbps': bitrate,
+                    'legacy_chunks': legacy_chunks,
+                    'legacy_estimated_seconds': round(estimate_wall_seconds(legacy_chunks, minutes * 60, workers), 1),
+                    'planned_chunks': plan['chunks'],
+                    'split_chunks': len(chunks),
+                    'largest_chunk_mb': round(max(chunk['size'] for chunk in chunks) / (1024 * 1024), 2),
+                    'estimated_seconds': plan['estimated_seconds'],
+                    'plan_seconds': round(plan_seconds, 3),
+                })
+    return results
+
+
+def bench_preprocess(file_path=None, minutes=10, bitrate=128, modes=(None, 'mp3', 'opus'), latency=0.2,
+                     upload_mb=1.0, concurrency=4):
+    """
+    Upload bytes and end-to-end time with and without speech preprocessing.
+    Each mode splits the episode in memory and transcribes it against the
+    stub API, which reads uploads at upload_mb MB/s per connection.
+    """
+    import shutil
+    import transcript
+    from httpclient import HttpClient
+    from preprocess import resolve_mode
+    from splitter import iter_chunks
+    from stubserver import StubServer
+
+    async def transcribe(chunks):
+        scheduler = TranscriptionScheduler(max_in_flight=concurrency, rate=0)
+        async with HttpClient() as client:
+            results = await scheduler.run(
+                chunks, lambda chunk: transcript.transcribe_audio(client.session, chunk),
+                key=lambda chunk: chunk['index']
+            )
+        return sum(1 for entry in results.values() if entry['state'] == 'done')
+
+    results = {'latency': latency, 'upload_mb_per_second': upload_mb, 'concurrency': concurrency, 'runs': []}
+    with tempfile.TemporaryDirectory() as work_dir:
+        if file_path is None:
+            file_path = Path(work_dir) / f"synthetic-{minutes}m-{bitrate}k.mp3"
+            synthetic_mp3(file_path, minutes * 60, bitrate, 'ffmpeg' if shutil.which('ffmpeg') else 'frames')
+        results['source_mb'] = round(os.path.getsize(file_path) / (1024 * 1024), 2)
+
+        for mode in modes:
+            if mode and resolve_mode(mode) is None:
+                results['runs'].append({'mode': mode, 'skipped': "ffmpeg not available"})
+                continue
+            with StubServer(latency=latency, upload_bandwidth=upload_mb * 1024 * 1024) as server:
+                transcript.CONFIG['API_BASE'] = server.base_url
+                start = time.perf_counter()
+                chunks = list(iter_chunks(str(file_path), silence_aware=False, preprocess=mode))
+                split_seconds = time.perf_counter() - start
+                transcribed = asyncio.run(transcribe(chunks))
+                total_seconds = time.perf_counter() - start
+                results['runs'].append({
+                    'mode': mode or 'original',
+                    'chunks': len(chunks),
+                    'transcribed': transcribed,
+                    'chunk_mb': round(sum(chunk['size'] for chunk in chunks) / (1024 * 1024), 2),
+                    'uploaded_mb': round(server.stats['bytes_received'] / (1024 * 1024), 2),
+                    'split_seconds': round(split_seconds, 2),
+                    'transcribe_seconds': round(total_seconds - split_seconds, 2),
+                    'total_seconds': round(total_seconds, 2),
+                })
+
+    original = next((run for run in results['runs'] if run['mode'] == 'original'), None)
+    for run in results['runs']:
+        if original and 'uploaded_mb' in run:
+            run['upload_reduction'] = round(original['uploaded_mb'] / max(run['uploaded_mb'], 1e-9), 2)
+    return results
+
+
+def bench_engines(file_path=None, minutes=5, bitrate=64, engines=('http', 'local'), latency=0.5,
+                  concurrency=4):
+    """
+    Realtime factor of each transcription engine on the same in-memory chunks:
+    wall-clock seconds per second of audio, the speed (audio seconds per wall
+    second) and the speed per CPU core used. The HTTP engine runs against the
+    local stub API with a fixed latency per request; its cores are the CPU
+    time of this process over the wall time. The local engine's cores are its
+    worker processes times their threads, and its time includes loading the model.
+    """
+    import transcript
+    from engines import HttpEngine, LocalEngine
+    from httpclient import HttpClient
+    from splitter import iter_chunks
+    from stubserver import StubServer
+
+    async def transcribe(chunks, engine, in_flight):
+        scheduler = TranscriptionScheduler(max_in_flight=in_flight, rate=0)
+        async with HttpClient() as client:
+            results = await scheduler.run(
+                chunks, lambda chunk: transcript.transcribe_audio(client.session, chunk, engine=engine),
+                key=lambda chunk: chunk['index']
+            )
+        return sum(1 for entry in results.values() if entry['state'] == 'done')
+
+    results = {'latency': latency, 'concurrency': concurrency, 'runs': []}
+    with tempfile.TemporaryDirectory() as work_dir:
+        if file_path is None:
+            file_path = Path(work_dir) / f"synthetic-{minutes}m-{bitrate}k.mp3"
+            synthetic_mp3(file_path, minutes * 60, bitrate)
+        chunks = list(iter_chunks(str(file_path), silence_aware=False, vad=False))
+        audio_seconds = sum(chunk['duration_ms'] for chunk in chunks) / 1000
+        results['audio_seconds'] = round(audio_seconds, 1)
+        results['chunks'] = len(chunks)
+
+        for name in engines:
+            if name == 'local' and not LocalEngine.available():
+                results['runs'].append({'engine': name, 'skipped': "faster-whisper not installed"})
+                continue
+            with StubServer(latency=latency) as server:
+                transcript.CONFIG['API_BASE'] = server.base_url
+                engine = LocalEngine() if name == 'local' else HttpEngine(transcript.CONFIG)
+                in_flight = max(concurrency, getattr(engine, 'workers', 0))
+                cpu_start = time.process_time()
+                start = time.perf_counter()
+                transcribed = asyncio.run(transcribe(chunks, engine, in_flight))
+                wall = time.perf_counter() - start
+                cpu = time.process_time() - cpu_start
+                engine.close()
+
+            cores = engine.workers * engine.cpu_threads if name == 'local' else max(cpu / wall, 0.01)
+            speed = audio_seconds / wall
+            results['runs'].append({
+                'engine': name,
+                'model': engine.model,
+                'transcribed': transcribed,
+                'wall_seconds': round(wall, 2),
+                'client_cpu_seconds': round(cpu, 2),
+                'cores': round(cores, 2),
+                'realtime_factor': round(wall / audio_seconds, 4),
+                'speed': round(speed, 1),
+                'speed_per_core': round(speed / cores, 1),
+            })
+    return results
+
+
+def bench_search(episodes=2000, minutes=60, chunks=4, vocabulary=20000, repeats=20, seed=1):
+    """
+    Transcript index size, indexing time per chunk and query latency over
+    `episodes` synthetic episodes. Words follow a Zipf distribution over the
+    vocabulary, so queries range from a word in nearly every segment to one
+    in a handful; latency is the median and 95th percentile of repeats.
+    """
+    import random
+    import statistics
+    from transcriptstore import TranscriptStore
+
+    generator = random.Random(seed)
+    words = ["".join(generator.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(generator.randint(3, 9)))
+             for _ in range(vocabulary)]
+    weights = [1 / rank for rank in range(1, vocabulary + 1)]
+    segments = synthetic_segments(minutes / 60)
+    per_chunk = math.ceil(len(segments) / chunks)
+    chunk_seconds = minutes * 60 / chunks
+
+    results = {'episodes': episodes, 'segments': episodes * len(segments)}
+    with tempfile.TemporaryDirectory() as work_dir:
+        store = TranscriptStore(Path(work_dir) / "transcripts.sqlite")
+        index_seconds = 0.0
+        for number in range(episodes):
+            text = generator.choices(words, weights, k=len(segments) * 40)
+            start = time.perf_counter()
+            episode = store.begin_episode(f"https://example.com/episodes/{number}.mp3", title=f"Episode {number}")
+            for index in range(chunks):
+                chunk_segments = [
+                    {**segment, 'text': " ".join(text[i * 40:(i + 1) * 40])}
+                    for i, segment in enumerate(segments[index * per_chunk:(index + 1) * per_chunk], index * per_chunk)
+                ]
+                record = {'index': index + 1, 'start': index * chunk_seconds, 'duration': chunk_seconds,
+                          'status': 'transcribed'}
+                store.add_chunk(episode, record, chunk_segments, "")
+            store.finish_episode(episode)
+            index_seconds += time.perf_counter() - start
+        results['index_seconds'] = round(index_seconds, 2)
+        results['index_ms_per_chunk'] = round(index_seconds / (episodes * chunks) * 1000, 2)
+        results['store_mb'] = round(sum(p.stat().st_size for p in Path(work_dir).iterdir()) / (1024 * 1024), 1)
+
+        queries = {
+            'common word': words[0],
+            'frequent word': words[50],
+            'rare word': words[vocabulary // 2],
+            'two words': f"{words[200]} {words[300]}",
+            'phrase': f'"{words[0]} {words[1]}"',
+            'prefix': words[100][:3] + "*",
+        }
+        results['queries'] = {}
+        for name, query in queries.items():
+            times = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                hits = store.search(query)
+                times.append((time.perf_counter() - start) * 1000)
+            times.sort()
+            results['queries'][name] = {
+                'query': query,
+                'hits': len(hits),
+                'median_ms': round(statistics.median(times), 2),
+                'p95_ms': round(times[int(len(times) * 0.95) - 1], 2),
+            }
+        store.close()
+    return results
+
+
+def disk_bytes_written():
+    """Bytes this process has caused to be written to storage (Linux /proc/self/io), or None elsewhere."""
+    try:
+        with open('/proc/self/io', 'r') as f:
+            return int(next(line for line in f if line.startswith('write_bytes:')).split(':')[1])
+    except (OSError, StopIteration, ValueError):
+        return None
+
+
+def copied_chunks(file_path, target_bytes, work_dir):
+    """
+    Chunks the way local inputs used to be handled: the episode copied into
+    the run directory first, then every chunk's frames copied into bytes.
+    """
+    import shutil
+    from mp3frames import iter_frames
+
+    copy = Path(work_dir) / Path(file_path).name
+    shutil.copy2(file_path, copy)
+    chunk = bytearray()
+    with open(copy, 'rb') as f:
+        for header, frame in iter_frames(f):
+            if chunk and len(chunk) + header.length > target_bytes:
+                yield bytes(chunk)
+                chunk = bytearray()
+            chunk += frame
+    if chunk:
+        yield bytes(chunk)
+
+
+def local_input_episode(file_path, target_bytes, mode, work_dir):
+    """
+    Fetch and split one local episode in mode 'copy' or 'mmap', reading every
+    chunk once like the cache key and upload do. Returns the chunk count and
+    the disk bytes written.
+    """
+    import logging
+    from cache import chunk_key
+    from splitter import iter_frame_chunks
+
+    logging.disable(logging.INFO)
+    written = disk_bytes_written()
+    if mode == 'copy':
+        chunks = copied_chunks(file_path, target_bytes, work_dir)
+    else:
+        chunks = (chunk['data'] for chunk in iter_frame_chunks(file_path, target_bytes))
+    count = 0
+    for data in chunks:
+        chunk_key(data, 'whisper-1')
+        count += 1
+    return {'chunks': count, 'disk_bytes_written': disk_bytes_written() - written if written is not None else None}
+
+
+def bench_local_input(file_path=None, minutes=60, bitrate=128, target_size_mb=TARGET_SIZE_MB, modes=('copy', 'mmap')):
+    """
+    Peak RSS and disk bytes written per episode for local inputs: 'copy' is
+    the old path (shutil.copy2 into the run directory, chunks copied into
+    bytes), 'mmap' cuts memoryview chunks from the file in place. Each mode
+    runs in a fresh process; RSS includes the mapped file pages the chunks touch.
+    """
+    results = {'runs': []}
+    with tempfile.TemporaryDirectory() as work_dir:
+        if file_path is None:
+            file_path = Path(work_dir) / f"synthetic-{minutes}m-{bitrate}k.mp3"
+            synthetic_mp3(file_path, minutes * 60, bitrate)
+        results['file_mb'] = round(os.path.getsize(file_path) / (1024 * 1024), 1)
+        target_bytes = plan_chunks(str(file_path), target_size_mb)['target_bytes']
+        for mode in modes:
+            run_dir = Path(work_dir) / mode
+            run_dir.mkdir()
+            run = run_isolated(local_input_episode, str(file_path), target_bytes, mode, str(run_dir),
+                               imports=('cache', 'splitter', 'mp3frames'))
+            outcome = run.pop('result')
+            results['runs'].append({
+                'mode': mode,
+                **outcome,
+                'disk_mb_written': round(outcome['disk_bytes_written'] / (1024 * 1024), 1)
+                if outcome['disk_bytes_written'] is not None else None,
+                **run,
+                'rss_growth_mb': round(run['peak_rss_mb'] - run['baseline_rss_mb'], 1)
+                if run['peak_rss_mb'] is not None else None,
+            })
+    return results
+
+
+def parse_importtime(output):
+    """Entries of `python -X importtime` output after site: (name, depth, self us, cumulative us)."""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+        if name.strip() == 'site' and depth == 0:
+            # Everything before is interpreter startup, not the module
+            entries = []
+    return entries
+
+
+def bench_startup(runs=10, modules=('main',), top=8):
+    """
+    Startup cost in fresh interpreters: wall time of `python main.py --version`
+    (best and median of runs), and for each module the import time measured
+    by `python -X importtime` with the direct imports that cost the most.
+    """
+    import statistics
+    import subprocess
+
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, 'main.py', '--version'], cwd=SRC_DIR, capture_output=True, check=True)
+        times.append(time.perf_counter() - start)
+    results = {
+        'version_seconds': {'best': round(min(times), 4), 'median': round(statistics.median(times), 4)},
+        'imports': {},
+    }
+
+    for module in modules:
+        output = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                                cwd=SRC_DIR, capture_output=True, text=True, check=True).stderr
+        entries = parse_importtime(output)
+        total = next((cumulative for name, depth, _, cumulative in entries if name == module and depth == 0), None)
+        children = sorted((entry for entry in entries if entry[1] == 1), key=lambda entry: -entry[3])
+        results['imports'][module] = {
+            'import_ms': round(total / 1000, 1) if total is not None else None,
+            'slowest': [{'module': name, 'cumulative_ms': round(cumulative / 1000, 1)}
+                        for name, _, _, cumulative in children[:top]],
+        }
+    return results
+
+
+def target_size(value):
+    """argparse type for chunk sizes: a number of MB, or 'auto' (None) for the sizing plan."""
+    return None if value == 'auto' else float(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Podcast pipeline benchmarks")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    boundaries = commands.add_parser('boundaries', help="silence-aware vs fixed-interval chunk boundaries")
+    boundaries.add_argument('file', help="MP3 file to analyse")
+    boundaries.add_argument('--target-size-mb', type=target_size, default=TARGET_SIZE_MB, help="MB, or 'auto'")
+    boundaries.add_argument('--reference', help="reference transcript; enables seam WER (calls the transcription API)")
+
+    scheduler = commands.add_parser('scheduler', help="transcription throughput against a local stub API")
+    scheduler.add_argument('--chunks', type=int, default=40)
+    scheduler.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8])
+    scheduler.add_argument('--latency', type=float, default=0.3, help="stub response latency in seconds")
+    scheduler.add_argument('--error-rate', type=float, default=0.1, help="share of requests answered with 429")
+    scheduler.add_argument('--server-max-in-flight', type=int, default=0,
+                           help="answer 429 above this many concurrent requests (0 = unlimited)")
+
+    download = commands.add_parser('download', help="parallel range download vs single stream, and resume")
+    download.add_argument('file', help="file to serve from the local test server")
+    download.add_argument('--segments', type=int, nargs='+', default=[1, 4, 8])
+    download.add_argument('--bandwidth-mb', type=float, default=2.0, help="per-connection throttle in MB/s (0 = none)")
+
+    connections = commands.add_parser('connections', help="pooled client vs a new connection per request")
+    connections.add_argument('--chunks', type=int, default=100)
+    connections.add_argument('--concurrency', type=int, default=4)
+    connections.add_argument('--latency', type=float, default=0.05, help="stub response latency in seconds")
+
+    ftp = commands.add_parser('ftp', help="pooled async FTP uploads, deduplication and resume (needs pyftpdlib)")
+    ftp.add_argument('--files', type=int, default=20)
+    ftp.add_argument('--size-kb', type=int, default=256)
+    ftp.add_argument('--pool-sizes', type=int, nargs='+', default=[1, 2, 4])
+
+    summary = commands.add_parser('summary', help="map-reduce summary latency and tokens against a local stub API")
+    summary.add_argument('--hours', type=float, default=3.0, help="length of the synthetic transcript")
+    summary.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    summary.add_argument('--latency', type=float, default=0.5, help="stub base latency in seconds")
+    summary.add_argument('--latency-per-token', type=float, default=0.0001, help="extra stub latency per prompt token")
+    summary.add_argument('--section-tokens', type=int, default=6000)
+
+    suite = commands.add_parser('suite', help="split and transcribe throughput on synthetic episodes, saved as JSON lines")
+    suite.add_argument('--durations', type=float, nargs='+', default=[10, 60], help="episode lengths in minutes")
+    suite.add_argument('--bitrates', type=int, nargs='+', default=[64, 128], help="bitrates in kbps")
+    suite.add_argument('--target-sizes', type=target_size, nargs='+', default=[TARGET_SIZE_MB],
+                       help="chunk sizes in MB, or 'auto' for the sizing plan")
+    suite.add_argument('--latency', type=float, default=0.2, help="stub response latency in seconds")
+    suite.add_argument('--error-rate', type=float, default=0.05, help="share of requests answered with 429")
+    suite.add_argument('--concurrency', type=int, default=4)
+    suite.add_argument('--generator', choices=['ffmpeg', 'frames'], help="default: ffmpeg if installed")
+    suite.add_argument('--results', default=str(SUITE_RESULTS), help="JSON lines file the results are appended to")
+
+    preprocess = commands.add_parser('preprocess', help="upload bytes and time with speech preprocessing (needs ffmpeg)")
+    preprocess.add_argument('file', nargs='?', help="MP3 file; default: a synthetic episode")
+    preprocess.add_argument('--minutes', type=float, default=10, help="length of the synthetic episode")
+    preprocess.add_argument('--bitrate', type=int, default=128, help="bitrate of the synthetic episode in kbps")
+    preprocess.add_argument('--modes', nargs='+', default=['original', 'mp3', 'opus'])
+    preprocess.add_argument('--latency', type=float, default=0.2, help="stub response latency in seconds")
+    preprocess.add_argument('--upload-mb', type=float, default=1.0, help="stub upload bandwidth per connection in MB/s")
+    preprocess.add_argument('--concurrency', type=int, default=4)
+
+    sizing = commands.add_parser('sizing', help="chunk sizing plan vs the old fixed chunk size")
+    sizing.add_argument('--durations', type=float, nargs='+', default=[10, 60, 180], help="episode lengths in minutes")
+    sizing.add_argument('--bitrates', type=int, nargs='+', default=[64, 128], help="bitrates in kbps")
+    sizing.add_argument('--legacy-size-mb', type=float, default=1)
+    sizing.add_argument('--workers', type=int, default=4)
+
+    local_input = commands.add_parser('local-input', help="peak RSS and disk bytes written: copied vs memory-mapped local input")
+    local_input.add_argument('file', nargs='?', help="MP3 file; default: a synthetic episode")
+    local_input.add_argument('--minutes', type=float, default=60, help="length of the synthetic episode")
+    local_input.add_argument('--bitrate', type=int, default=128, help="bitrate of the synthetic episode in kbps")
+    local_input.add_argument('--target-size-mb', type=target_size, default=TARGET_SIZE_MB, help="MB, or 'auto'")
+
+    search = commands.add_parser('search', help="transcript index size, indexing time and query latency")
+    search.add_argument('--episodes', type=int, default=2000)
+    search.add_argument('--minutes', type=float, default=60, help="length of each synthetic episode")
+    search.add_argument('--repeats', type=int, default=20)
+
+    startup = commands.add_parser('startup', help="startup wall time and per-module import time (python -X importtime)")
+    startup.add_argument('--runs', type=int, default=10)
+    startup.add_argument('--modules', nargs='+', default=['main'], help="modules whose import is timed")
+
+    engines = commands.add_parser('engines', help="realtime factor per core of the HTTP and local engines")
+    engines.add_argument('file', nargs='?', help="MP3 file; default: a synthetic episode")
+    engines.add_argument('--minutes', type=float, default=5, help="length of the synthetic episode")
+    engines.add_argument('--bitrate', type=int, default=64, help="bitrate of the synthetic episode in kbps")
+    engines.add_argument('--engines', nargs='+', choices=['http', 'local'], default=['http', 'local'])
+    engines.add_argument('--latency', type=float, default=0.5, help="stub response latency in seconds")
+    engines.add_argument('--concurrency', type=int, default=4)
+
+    compare = commands.add_parser('compare', help="compare the latest suite run with the previous one")
+    compare.add_argument('--results', default=str(SUITE_RESULTS))
+    compare.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+
+    args = parser.parse_args()
+    if args.command == 'boundaries':
+        results = bench_boundaries(args.file, args.target_size_mb, args.reference)
+    elif args.command == 'scheduler':
+        results = bench_scheduler(args.chunks, args.concurrency, args.latency,
+                                  args.error_rate, args.server_max_in_flight)
+    elif args.command == 'download':
+        results = bench_download(args.file, args.segments, args.bandwidth_mb)
+    elif args.command == 'connections':
+        results = bench_connections(args.chunks, args.concurrency, args.latency)
+    elif args.command == 'ftp':
+        results = bench_ftp(args.files, args.size_kb, args.pool_sizes)
+    elif args.command == 'suite':
+        results = bench_suite(args.durations, args.bitrates, args.target_sizes, args.latency, args.error_rate,
+                              args.concurrency, args.generator, results_path=args.results)
+    elif args.command == 'preprocess':
+        modes = [None if mode == 'original' else mode for mode in args.modes]
+        results = bench_preprocess(args.file, args.minutes, args.bitrate, modes, args.latency, args.upload_mb,
+                                   args.concurrency)
+    elif args.command == 'sizing':
+        results = bench_sizing(args.durations, args.bitrates, args.legacy_size_mb, args.workers)
+    elif args.command == 'engines':
+        results = bench_engines(args.file, args.minutes, args.bitrate, args.engines, args.latency, args.concurrency)
+    elif args.command == 'local-input':
+        results = bench_local_input(args.file, args.minutes, args.bitrate, args.target_size_mb)
+    elif args.command == 'search':
+        results = bench_search(args.episodes, args.minutes, repeats=args.repeats)
+    elif args.command == 'startup':
+        results = bench_startup(args.runs, args.modules)
+    elif args.command == 'compare':
+        results = compare_results(args.results, args.threshold)
+    elif args.command == 'summary':
+        results = bench_summary(args.hours, args.workers, args.latency, args.latency_per_token, args.section_tokens)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""
+Local stub servers for the tests, benchmarks and manual testing.
+
+StubServer answers POST {base}/audio/transcriptions with a fake transcript and
+can inject latency and 429 rate-limit responses with a Retry-After header.
+Request bodies can be read at a limited bandwidth to model a slow uplink. It
+also answers OpenAI-style POST {base}/chat/completions with a fake summary, and
+serves HTTPS when given a certificate.
+FileServer serves one file over GET, with or without Range support and with
+optional per-connection bandwidth throttling. FtpServer runs pyftpdlib
+in-process for upload tests.
+"""
+import base64
+import hashlib
+import json
+import logging
+import random
+import os
+import re
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without TCP_NODELAY kept-alive
+    # connections would wait on delayed ACKs like no real API server does
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        # One handler per accepted connection; keep-alive requests reuse it
+        with self.server.lock:
+            self.server.stats['connections'] += 1
+        super().setup()
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        """Read the request body, throttled to the server's upload bandwidth if set."""
+        server = self.server
+        remaining = int(self.headers.get('Content-Length', 0))
+        parts = []
+        while remaining > 0:
+            data = self.rfile.read(min(remaining, 64 * 1024))
+            if not data:
+                break
+            parts.append(data)
+            remaining -= len(data)
+            if server.upload_bandwidth:
+                time.sleep(len(data) / server.upload_bandwidth)
+        body = b''.join(parts)
+        with server.lock:
+            server.stats['bytes_received'] += len(body)
+        return body
+
+    def do_POST(self):
+        server = self.server
+        body = self.read_body()
+
+        if self.path.endswith('/chat/completions'):
+            self.complete_chat(body)
+            return
+        if not self.path.endswith('/audio/transcriptions'):
+            self.send_json(404, {'error': {'message': 'not found'}})
+            return
+
+        with server.lock:
+            server.stats['requests'] += 1
+            server.in_flight += 1
+            server.stats['max_in_flight'] = max(server.stats['max_in_flight'], server.in_flight)
+            overloaded = server.max_in_flight and server.in_flight > server.max_in_flight
+        try:
+            if overloaded or server.random.random() < server.error_rate:
+                with server.lock:
+                    server.stats['rate_limited'] += 1
+                self.send_json(429, {'error': {'message': 'rate limited'}},
+                               {'Retry-After': str(server.retry_after)})
+                return
+
+            time.sleep(server.latency)
+            match = re.search(rb'filename="([^"]*)"', body)
+            name = match.group(1).decode('utf-8', errors='replace') if match else 'audio'
+            with server.lock:
+                server.stats['transcribed'] += 1
+            text = f"transcript of {name}"
+            if b'verbose_json' in body:
+                segments = [
+                    {'id': 0, 'start': 0.0, 'end': 2.5, 'text': f" {text}, part one"},
+                    {'id': 1, 'start': 2.5, 'end': 5.0, 'text': f" {text}, part two"},
+                ]
+                self.send_json(200, {'text': text, 'segments': segments})
+            else:
+                self.send_json(200, {'text': text})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def complete_chat(self, body):
+        """Answer an OpenAI-style chat completion with a short fake summary and token usage."""
+        server = self.server
+        request = json.loads(body or b'{}')
+        prompt = " ".join(message.get('content', '') for message in request.get('messages', []))
+        prompt_tokens = len(prompt) // 4 + 1
+        with server.lock:
+            server.stats['requests'] += 1
+            server.stats['chat_completions'] += 1
+        # Latency grows with the prompt, like a real model reading its input
+        time.sleep(server.latency + prompt_tokens * server.latency_per_token)
+        content = f"Summary of {prompt_tokens} prompt tokens: {prompt[-200:]}"
+        self.send_json(200, {
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': len(content) // 4 + 1,
+                'total_tokens': prompt_tokens + len(content) // 4 + 1,
+            },
+        })
+
+
+class StubServer:
+    """
+    Run the stub API in a background thread:
+
+        with StubServer(latency=0.2, error_rate=0.1) as server:
+            CONFIG['API_BASE'] = server.base_url
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, retry_after=1, max_in_flight=0, latency_per_token=0.0,
+                 certfile=None, seed=None, upload_bandwidth=None):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.scheme = 'http'
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile)
+            self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side=True)
+            self.scheme = 'https'
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.latency_per_token = latency_per_token
+        # Bytes per second each connection may upload, None for unlimited
+        self.httpd.upload_bandwidth = upload_bandwidth
+        self.httpd.error_rate = error_rate
+        # A seed makes the injected errors repeat from run to run
+        self.httpd.random = random.Random(seed)
+        self.httpd.retry_after = retry_after
+        self.httpd.max_in_flight = max_in_flight
+        self.httpd.in_flight = 0
+        self.httpd.lock = threading.Lock()
+        self.httpd.stats = {'requests': 0, 'transcribed': 0, 'rate_limited': 0, 'max_in_flight': 0, 'chat_completions': 0,
+                            'connections': 0, 'bytes_received': 0}
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address
+        return f"{self.scheme}://{host}:{port}/v1"
+
+    @property
+    def stats(self):
+        return dict(self.httpd.stats)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, f, length):
+        """Send length bytes from f, throttled to the server's bandwidth if set."""
+        server = self.server
+        block = 64 * 1024
+        while length > 0:
+            data = f.read(min(block, length))
+            if not data:
+                break
+            self.wfile.write(data)
+            length -= len(data)
+            with server.lock:
+                server.stats['bytes_sent'] += len(data)
+                interrupted = server.fail_after and server.stats['bytes_sent'] >= server.fail_after
+            if interrupted:
+                # Simulate a dropped connection in the middle of the body
+                self.close_connection = True
+                return
+            if server.bandwidth:
+                time.sleep(len(data) / server.bandwidth)
+
+    def do_GET(self):
+        server = self.server
+        size = os.path.getsize(server.file_path)
+        with server.lock:
+            server.stats['requests'] += 1
+
+        match = re.match(r'bytes=(\d+)-(\d*)$', self.headers.get('Range', ''))
+        if_range = self.headers.get('If-Range')
+        use_range = server.ranges and match and (not if_range or if_range == server.etag)
+
+        with open(server.file_path, 'rb') as f:
+            if use_range:
+                start = int(match.group(1))
+                end = min(int(match.group(2) or size - 1), size - 1)
+                with server.lock:
+                    server.stats['range_requests'] += 1
+                self.send_response(206)
+                self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+                length = end - start + 1
+                f.seek(start)
+            else:
+                self.send_response(200)
+                length = size
+            self.send_header('Content-Type', 'audio/mpeg')
+            self.send_header('Content-Length', str(length))
+            self.send_header('ETag', server.etag)
+            if server.digest:
+                self.send_header('Repr-Digest', f"sha-256=:{server.digest}:")
+            if server.ranges:
+                self.send_header('Accept-Ranges', 'bytes')
+            self.end_headers()
+            try:
+                self.send_body(f, length)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+
+class FileServer:
+    """
+    Serve file_path at {url} in a background thread:
+
+        with FileServer('episode.mp3', ranges=False, bandwidth=2 * 1024 * 1024) as server:
+            download_file(server.url, 'copy.mp3')
+
+    fail_after drops every response once that many bytes have been sent in total.
+    digest=True announces the SHA-256 of the file as it was when the server started.
+    """
+
+    def __init__(self, file_path, ranges=True, bandwidth=None, fail_after=None, digest=False):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), FileHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.file_path = file_path
+        self.httpd.ranges = ranges
+        self.httpd.bandwidth = bandwidth
+        self.httpd.fail_after = fail_after
+        self.httpd.etag = f'"{os.path.getsize(file_path)}-{int(os.path.getmtime(file_path))}"'
+        self.httpd.digest = None
+        if digest:
+            with open(file_path, 'rb') as f:
+                self.httpd.digest = base64.b64encode(hashlib.sha256(f.read()).digest()).decode('ascii')
+        self.httpd.lock = threading.Lock()
+        self.httpd.stats = {'requests': 0, 'range_requests': 0, 'bytes_sent': 0}
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}/{os.path.basename(self.httpd.file_path)}"
+
+    @property
+    def stats(self):
+        return dict(self.httpd.stats)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FtpServer:
+    """
+    In-process FTP server (requires pyftpdlib) with one user rooted at root_dir:
+
+        with FtpServer(root_dir) as server:
+            uploader = FtpUploader(server.host, server.user, server.password, '/', port=server.port)
+
+    rest=False answers REST with 502, like servers that only support APPE;
+    size=False does the same for SIZE, like servers without RFC 3659.
+    """
+
+    user = 'bench'
+    password = 'bench'
+
+    def __init__(self, root_dir, rest=True, size=True):
+        from pyftpdlib.authorizers import DummyAuthorizer
+        from pyftpdlib.handlers import FTPHandler
+        from pyftpdlib.servers import ThreadedFTPServer
+
+        stats = {'logins': 0, 'stored': 0, 'appended': 0}
+        lock = threading.Lock()
+
+        class Handler(FTPHandler):
+            def on_login(self, username):
+                with lock:
+                    stats['logins'] += 1
+
+            def ftp_REST(self, line):
+                if rest:
+                    return super().ftp_REST(line)
+                self.respond("502 REST not supported.")
+
+            def ftp_SIZE(self, path):
+                if size:
+                    return super().ftp_SIZE(path)
+                self.respond("502 SIZE not supported.")
+
+            def ftp_APPE(self, file):
+                with lock:
+                    stats['appended'] += 1
+                return super().ftp_APPE(file)
+
+            def on_file_received(self, file):
+                with lock:
+                    stats['stored'] += 1
+
+        authorizer = DummyAuthorizer()
+        authorizer.add_user(self.user, self.password, str(root_dir), perm='elradfmwMT')
+        Handler.authorizer = authorizer
+        # Keep pyftpdlib's per-command logging out of benchmark output
+        ftp_logger = logging.getLogger('pyftpdlib')
+        ftp_logger.setLevel(logging.WARNING)
+        if not ftp_logger.handlers:
+            ftp_logger.addHandler(logging.NullHandler())
+        ftp_logger.propagate = False
+
+        self.server = ThreadedFTPServer(('127.0.0.1', 0), Handler)
+        self.host, self.port = self.server.address[:2]
+        self.root_dir = root_dir
+        self.lock = lock
+        self._stats = stats
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={'handle_exit': False}, daemon=True)
+
+    @property
+    def stats(self):
+        with self.lock:
+            return dict(self._stats)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.close_all()